@@ -1,21 +1,79 @@
-from typing import Dict, List, Optional
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
 import os
+import secrets
+import time
 import pandas as pd
 
-from llama_index.llms.openai import OpenAI as OpenAI_LLAMA
 from llama_index.agent.openai import OpenAIAgent
 from llama_index.core import PromptTemplate
+from llama_index.core.chat_engine.types import AgentChatResponse
+from llama_index.core.llms import ChatMessage, MessageRole
+from llama_index.core.tools import ToolOutput
+from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall, Function
+from llama_index.core.callbacks import CallbackManager
 from llama_index.core.memory.chat_memory_buffer import ChatMemoryBuffer
 from llama_index.core.tools import FunctionTool
 
 from app.history.history_module import HistoryModule
 from app.templates.prompt_templates import SYSTEM_TEMPLATE
-from app.services.embeddings import EmbeddingService
-from app.vectorstore.supabase_vectorstore import SupabaseVectorStore
-from app.tools.date.date_tool import DateExtractionTool
+from app.services.embeddings import get_embedding_service
+from app.vectorstore.catalog import get_meeting_vector_store
+from app.vectorstore.supabase_vectorstore import SupabaseVectorStore, get_vector_store
+from app.tools.date.date_tool import DateExtractionTool, DateRangeExtractionTool
 from app.tools.organization.organization_tool import OrganizationValidationTool
-from app.tools.search.search_tools import SearchMeetingsTool, SearchMeetingsByOrganizationTool, SearchTravelPackagesTool
+from app.tools.search.search_tools import (
+    SEARCH_TRAVEL_TOOL_DESCRIPTION, SEARCH_TRAVEL_TOOL_NAME, PreferenceProfile, SearchMeetingsTool,
+    SearchMeetingsByOrganizationTool, SearchTravelPackagesTool
+)
+from app.agent.cached_llm import CachedOpenAI
+from app.agent.package_formatter import TravelPackageFormatter
+from app.agent.preference_extractor import describe_preferences
+from app.agent.query_router import QueryRouter
+from app.agent.speculative_search import Speculation, speculative_search
+from app.models.request_models import parse_highlights_value
 from app.config.env_config import config
+from app.services.llm_cache import LLMResponseCache
+from app.services.resilience import CircuitOpenError, is_retryable
+from app.services.search_cursor_store import search_cursor_store, CursorExpiredError
+from app.utils.lru import TTLCache
+from app.utils.response_utils import project_travel_package
+from app.telemetry.llm_callbacks import PromptTokenCounter, StageTimingHandler
+from app.telemetry.metrics import observe_prompt_tokens, span
+from app.telemetry.log_config import sample_debug, summarize_chat_history
+
+# Speculative search of the /ask query being answered on the current thread
+_speculation: ContextVar[Optional[Speculation]] = ContextVar("speculation", default=None)
+# User ID and access token of the /ask caller being answered on the current thread
+_caller: ContextVar[Optional[str]] = ContextVar("caller", default=None)
+_caller_auth: ContextVar[Optional[str]] = ContextVar("caller_auth", default=None)
+
+
+class CallerSession:
+    """
+    A user's state in the shared agent: their search tool (with its preference
+    profile), "show more" cursor and the package references of their tool output.
+    """
+
+    def __init__(self, search_tool: SearchTravelPackagesTool, auth: str, formatter: TravelPackageFormatter):
+        self.search_tool = search_tool
+        self.formatter = formatter
+        # Agent memory the formatter's references point into
+        self.memory = None
+        # The user's latest access token; searches and cursors are bound to it
+        self.auth = auth
+        # Cursor for the next page of the user's most recent travel package search
+        self.travel_search_cursor: Optional[str] = None
+
+    def bind(self, auth: Optional[str]):
+        """Move the session to the user's new access token, keeping the preference profile."""
+        if auth and auth != self.auth:
+            self.auth = auth
+            self.search_tool.vector_store = get_vector_store(auth)
+            # Cursors are bound to the token they were created with
+            self.travel_search_cursor = None
 
 
 class AgentRag:
@@ -26,12 +84,85 @@ class AgentRag:
     
     def __init__(self, history_module: HistoryModule):
         self.qa_template = PromptTemplate(SYSTEM_TEMPLATE)
-        self.gpt4_llm = OpenAI_LLAMA(model=config.llm_model)
+        # Time every LLM round trip and tool call the agent makes, and count prompt tokens per query
+        self.token_counter = PromptTokenCounter()
+        self.callback_manager = CallbackManager([StageTimingHandler(), self.token_counter])
+        self.embedding_service = get_embedding_service()
+        self.gpt4_llm = CachedOpenAI(
+            cache=self._create_llm_cache(),
+            embed_fn=self.embedding_service.get_embedding if config.llm_cache_semantic_enabled else None,
+            semantic_threshold=config.llm_cache_semantic_threshold,
+            model=config.llm_model,
+            # Timeouts and retries are handled by the resilience layer
+            timeout=config.llm_timeout_seconds,
+            max_retries=0,
+            callback_manager=self.callback_manager
+        )
         self.vector_store = None
         self.agent = None
-        self.embedding_service = EmbeddingService()
+        self.auth = None
+        # Per-user search tools and cursors, so /ask callers never share preferences or results
+        self.sessions = self._create_sessions()
+        # Sends structured preference queries straight to the search tool
+        self.query_router = QueryRouter()
+        self.logger = logging.getLogger(__name__)
         self._load_organizations()
     
+    @staticmethod
+    def _create_llm_cache() -> Optional[LLMResponseCache]:
+        """Open the shared LLM response cache, or return None if it is disabled."""
+        if not config.llm_cache_enabled:
+            return None
+        return LLMResponseCache(
+            path=config.llm_cache_path,
+            ttl_seconds=config.llm_cache_ttl_seconds,
+            max_entries=config.llm_cache_max_entries,
+            semantic_candidates=config.llm_cache_semantic_max_candidates
+        )
+
+    @staticmethod
+    def _create_sessions() -> TTLCache:
+        """Create the per-user session cache, dropping users idle for PREFERENCE_PROFILE_TTL_SECONDS."""
+        return TTLCache(config.preference_profile_max_entries, config.preference_profile_ttl_seconds, sliding=True)
+
+    def _new_session(self, auth: str) -> CallerSession:
+        """Create a session with an empty preference profile, searching with the user's token."""
+        return CallerSession(SearchTravelPackagesTool(
+            vector_store=get_vector_store(auth),
+            embedding_service=self.embedding_service,
+            profile=PreferenceProfile()
+        ), auth, TravelPackageFormatter(
+            fields=config.tool_output_fields,
+            description_chars=config.tool_output_description_chars,
+            token_budget=config.tool_output_token_budget,
+            max_references=config.tool_output_max_references
+        ))
+
+    def _format_packages(self, session: CallerSession, packages: List[Dict]) -> Tuple[str, int]:
+        """
+        Render packages for the agent with the session's formatter.
+
+        References whose first output has left the memory window (or belongs
+        to a replaced memory) are dropped first, so the LLM is never told a
+        package was "already shown above" in text it no longer has.
+        """
+        memory = self.agent.memory
+        messages = len(memory.get_all())
+        if session.memory is not memory:
+            session.formatter.reset()
+            session.memory = memory
+        else:
+            # Outputs of the current turn (at position `messages`) are not stored yet
+            session.formatter.retain(messages - len(memory.get()), messages + 1)
+        return session.formatter.format(packages, position=messages)
+
+    def _session(self) -> CallerSession:
+        """Return the session of the caller being answered on this thread, creating it on first use."""
+        auth = _caller_auth.get()
+        session = self.sessions.get_or_create(_caller.get(), lambda: self._new_session(auth or self.auth))
+        session.bind(auth)
+        return session
+
     def _load_organizations(self):
         """Load organizations from CSV file."""
         try:
@@ -63,12 +194,14 @@ class AgentRag:
                 'Work Healthy Australia', 'YPO Gold Forum', 'Grady Golf'
             ]
     
-    def setup_agent(self, auth: str):
+    def setup_agent(self, auth: str, user_id: Optional[str] = None):
         """
         Set up the agent with necessary tools and configurations.
         
         Args:
             auth: Authentication token for Supabase.
+            user_id: The signing-in user's ID; their session starts over with
+                an empty preference profile. Other users' sessions are kept.
         """
         # Initialize vector store
         self.vector_store = SupabaseVectorStore(
@@ -77,10 +210,10 @@ class AgentRag:
             auth=auth
         )
         
-        search_travel_tool = SearchTravelPackagesTool(
-            vector_store=self.vector_store,
-            embedding_service=self.embedding_service
-        )
+        self.auth = auth
+        # A new sign-in starts the signing-in user with an empty preference profile
+        self.sessions.pop(user_id)
+        self.sessions.get_or_create(user_id, lambda: self._new_session(auth))
         
         # Define a wrapper function to return string output for the agent
         def _search_travel_packages_agent_wrapper(
@@ -108,65 +241,320 @@ class AgentRag:
                 match_count (int): Number of results to return (default 10).
             """
             
-            # Call the original tool to get the list of dictionaries
-            results_list = search_travel_tool(
-                location_input=location_input,
-                duration_input=duration_input,
-                budget_input=budget_input,
-                transportation_input=transportation_input,
-                accommodation_input=accommodation_input,
-                food_input=food_input,
-                activities_input=activities_input,
-                notes_input=notes_input,
-                match_count=match_count
-            )
-            
-            # Format the list of dictionaries into a string
-            if not results_list:
-                return "No travel packages found matching your preferences."
-            
-            formatted_results = []
-            for idx, package in enumerate(results_list):
-                package_lines = [f"Package {idx+1}:"]
-                for key, value in package.items():
-                    # Exclude combined_score from the string output
-                    if key != 'combined_score':
-                        package_lines.append(f"  {key}: {value}")
-                formatted_results.append("\n".join(package_lines))
-            
-            return "\n\n".join(formatted_results)
+            preferences = {
+                "location_input": location_input,
+                "duration_input": duration_input,
+                "budget_input": budget_input,
+                "transportation_input": transportation_input,
+                "accommodation_input": accommodation_input,
+                "food_input": food_input,
+                "activities_input": activities_input,
+                "notes_input": notes_input
+            }
+            _, text = self.search_travel_packages(preferences, match_count, speculation=_speculation.get())
+            return text
+
+        def _show_more_travel_packages(match_count: int = 5) -> str:
+            """Show the next travel packages from the most recent SearchTravelPackages results.
+            Use this when the user asks to see more options for the same preferences,
+            instead of searching again.
+            Args:
+                match_count (int): Number of additional packages to return (default 5).
+            """
+            session = self._session()
+            if not session.travel_search_cursor:
+                return "There are no more travel packages for the last search."
+            cursor = session.travel_search_cursor
+            try:
+                packages, session.travel_search_cursor = search_cursor_store.page(session.auth, cursor, match_count)
+            except CursorExpiredError:
+                session.travel_search_cursor = None
+                return "The previous search results have expired. Please search again with SearchTravelPackages."
+            if not packages:
+                return "There are no more travel packages for the last search."
+            text, shown = self._format_packages(session, packages)
+            if shown < len(packages):
+                session.travel_search_cursor = search_cursor_store.advance(cursor, shown)
+            return text
 
         # Create the FunctionTool using the wrapper function
         search_travel_function_tool = FunctionTool.from_defaults(
-            name=search_travel_tool.name,
-            description=search_travel_tool.description,
+            name=SEARCH_TRAVEL_TOOL_NAME,
+            description=SEARCH_TRAVEL_TOOL_DESCRIPTION,
             fn=_search_travel_packages_agent_wrapper # Use the wrapper function
         )
+        show_more_function_tool = FunctionTool.from_defaults(
+            name="ShowMoreTravelPackages",
+            description="Show more travel packages from the most recent SearchTravelPackages results, without searching again.",
+            fn=_show_more_travel_packages
+        )
         
         # Set up memory with configurable token limit
         memory = ChatMemoryBuffer.from_defaults(token_limit=config.memory_token_limit)
         
+        tools = [search_travel_function_tool, show_more_function_tool]
+        if config.meeting_tools_enabled:
+            tools += self._meeting_tools(auth)
+
         # Initialize agent with tools
         self.agent = OpenAIAgent.from_tools(
-            tools=[
-                search_travel_function_tool
-            ],
+            tools=tools,
             llm=self.gpt4_llm,
             memory=memory,
-            verbose=True,
-            system_prompt=SYSTEM_TEMPLATE
+            # Verbose mode prints every tool call and output; only useful when debugging
+            verbose=config.debug,
+            system_prompt=SYSTEM_TEMPLATE,
+            callback_manager=self.callback_manager
         )
     
-    def agent_query(self, query: str) -> str:
+    def _meeting_tools(self, auth: str) -> List[FunctionTool]:
+        """
+        Build the meeting search tools for a caller.
+
+        Searches go to the Supabase RPCs or, with MEETING_SEARCH_BACKEND=local,
+        to the in-process hybrid engine.
+
+        Args:
+            auth: Authentication token for Supabase.
+
+        Returns:
+            The meeting tools, wrapped for the agent.
+        """
+        meeting_store = get_meeting_vector_store(auth)
+        meeting_tools = [
+            SearchMeetingsTool(vector_store=meeting_store, embedding_service=self.embedding_service),
+            SearchMeetingsByOrganizationTool(vector_store=meeting_store, embedding_service=self.embedding_service),
+            OrganizationValidationTool(getattr(self, "organizations", [])),
+            DateRangeExtractionTool(),
+        ]
+        return [
+            FunctionTool.from_defaults(name=tool.name, description=tool.description, fn=tool.__call__)
+            for tool in meeting_tools
+        ]
+
+    def search_travel_packages(self, preferences: Dict[str, str], match_count: int = 10,
+                               speculation: Optional[Speculation] = None) -> Tuple[List[Dict], str]:
+        """
+        Search travel packages for the current user and render them for the agent.
+
+        Enough ranked results are fetched to serve "show more" requests without
+        a new search; they are kept behind the caller's travel_search_cursor.
+
+        Args:
+            preferences: SearchTravelPackages arguments (location_input, duration_input, ...).
+            match_count: Number of packages to show.
+            speculation: The speculative search of the query being answered, if any.
+
+        Returns:
+            The packages included in the output, and the tool output text.
+        """
+        session = self._session()
+        fetch_count = max(match_count, config.search_cursor_max_results)
+        results_list = speculative_search.claim(speculation, preferences, fetch_count)
+        if results_list is None:
+            results_list = session.search_tool(**preferences, match_count=fetch_count)
+        # Keep only the response fields: the cursor store holds these rows for
+        # "show more", and raw rows carry every vector column
+        results_list = [package for package in map(project_travel_package, results_list) if package is not None]
+        if not results_list:
+            session.travel_search_cursor = None
+            return [], "No travel packages found matching your preferences."
+
+        # Packages cut off by the output token budget are left for ShowMoreTravelPackages
+        text, shown = self._format_packages(session, results_list[:match_count])
+        session.travel_search_cursor = search_cursor_store.create(session.auth, results_list, shown)
+        return results_list[:shown], text
+
+    def agent_query(self, query: str, user_id: Optional[str] = None, auth: Optional[str] = None) -> str:
         """
         Query the agent with a user question.
+
+        Structured preference queries are answered by the fast path, which
+        calls the search tool directly instead of letting the LLM pick it.
         
         Args:
             query: The user's question.
+            user_id: The caller's user ID; their preference profile and
+                "show more" cursor are kept apart from other users'.
+            auth: The caller's access token, which their searches and cursors
+                use (defaults to the token the agent was set up with).
             
         Returns:
             The agent's response.
         """
-        response = self.agent.chat(query)
-        print("Chat history:", self.agent.chat_history)
-        return response 
\ No newline at end of file
+        caller_token = _caller.set(user_id)
+        auth_token = _caller_auth.set(auth)
+        try:
+            return self._answer(query)
+        finally:
+            _caller_auth.reset(auth_token)
+            _caller.reset(caller_token)
+
+    def _answer(self, query: str) -> str:
+        """Answer a question for the caller set in the context (see agent_query)."""
+        preferences = self.query_router.route(query)
+        if preferences is not None:
+            return self._fast_path_query(query, preferences)
+
+        started = time.perf_counter()
+        self.token_counter.begin_query()
+        speculation = self._start_speculation(query)
+        # The agent calls the search tool on this thread; the tool wrapper reads the
+        # speculation from the context, so concurrent queries never see each other's
+        speculation_token = _speculation.set(speculation)
+        memory_before = self.agent.memory.get_all()
+        try:
+            with span("agent.query"):
+                response = self.agent.chat(query)
+        except Exception as e:
+            degraded = self._degraded_answer(query, memory_before, e)
+            if degraded is None:
+                raise
+            return degraded
+        finally:
+            _speculation.reset(speculation_token)
+            speculative_search.release(speculation)
+        self.query_router.record_agent_latency(time.perf_counter() - started)
+        usage = self.token_counter.query_usage()
+        observe_prompt_tokens(usage["prompt_tokens"])
+        chat_history = self.agent.chat_history
+        self.logger.info("Agent query completed", extra={
+            "chat_history": summarize_chat_history(chat_history),
+            "token_usage": usage
+        })
+        if sample_debug(self.logger):
+            self.logger.debug("Agent chat history", extra={"chat_history": [str(message) for message in chat_history]})
+        return response
+
+    def _degraded_answer(self, query: str, memory_before: List[ChatMessage], error: Exception) -> Optional[AgentChatResponse]:
+        """
+        Answer from search results alone when the LLM is unavailable.
+
+        Args:
+            query: The user's message.
+            memory_before: The agent's memory before the failed query, restored before answering.
+            error: The error raised by the agent.
+
+        Returns:
+            A template answer, or None if the error is not an LLM outage or
+            the query names no destination to search for.
+        """
+        if not (isinstance(error, CircuitOpenError) or is_retryable(error)):
+            return None
+        preferences = self.query_router.extractor.extract(query)
+        if not preferences["location_input"]:
+            return None
+        self.logger.warning(f"LLM unavailable, answering from search results: {error}")
+        self.agent.memory.set(memory_before)
+        # Outputs of the failed turn were rolled back with the memory
+        self._session().formatter.retain(0, len(memory_before))
+        return self._fast_path_query(query, preferences, answer_mode="template")
+
+    def _start_speculation(self, query: str):
+        """Guess the SearchTravelPackages arguments locally and start that search in the background."""
+        if not config.speculative_search_enabled:
+            return None
+        guess = self.query_router.extractor.extract(query)
+        if not guess["location_input"]:
+            return None
+        fetch_count = max(10, config.search_cursor_max_results)
+        return speculative_search.start(self._session().search_tool, guess, fetch_count)
+
+    def _fast_path_query(self, query: str, preferences: Dict[str, str],
+                         answer_mode: Optional[str] = None) -> AgentChatResponse:
+        """
+        Answer a structured preference query without LLM tool selection.
+
+        The search and its result are written to the agent's memory as if the
+        agent had called SearchTravelPackages, so follow-up questions keep context.
+
+        Args:
+            query: The user's message.
+            preferences: SearchTravelPackages arguments extracted from the message.
+            answer_mode: "llm" or "template" (defaults to FAST_PATH_ANSWER_MODE).
+
+        Returns:
+            The answer, with the tool output as its source.
+        """
+        started = time.perf_counter()
+        with span("agent.fast_path"):
+            match_count = config.fast_path_match_count
+            packages, tool_output = self.search_travel_packages(preferences, match_count)
+            arguments = dict(preferences, match_count=match_count)
+            messages = self._tool_call_messages(query, arguments, tool_output)
+
+            self.token_counter.begin_query()
+            if packages and (answer_mode or config.fast_path_answer_mode) == "llm":
+                # One summarization round trip instead of tool selection plus summarization
+                chat_response = self.gpt4_llm.chat(
+                    [ChatMessage(role=MessageRole.SYSTEM, content=SYSTEM_TEMPLATE)] + messages
+                )
+                answer = chat_response.message.content or ""
+            else:
+                answer = self._template_answer(preferences, packages)
+
+            for message in messages + [ChatMessage(role=MessageRole.ASSISTANT, content=answer)]:
+                self.agent.memory.put(message)
+        elapsed = time.perf_counter() - started
+        self.query_router.record_fast_path_latency(elapsed)
+        usage = self.token_counter.query_usage()
+        self.logger.info("Fast-path query completed", extra={
+            "packages": len(packages),
+            "token_usage": usage,
+            "elapsed_ms": round(elapsed * 1000, 2)
+        })
+
+        return AgentChatResponse(
+            response=answer,
+            sources=[ToolOutput(
+                content=tool_output,
+                tool_name=SEARCH_TRAVEL_TOOL_NAME,
+                raw_input={"args": (), "kwargs": arguments},
+                raw_output=tool_output
+            )]
+        )
+
+    def _tool_call_messages(self, query: str, arguments: Dict, tool_output: str) -> List[ChatMessage]:
+        """Build the user, tool-call and tool-result messages the agent would have produced."""
+        call_id = f"call_{secrets.token_hex(12)}"
+        tool_call = ChatCompletionMessageToolCall(
+            id=call_id,
+            type="function",
+            function=Function(name=SEARCH_TRAVEL_TOOL_NAME, arguments=json.dumps(arguments))
+        )
+        return [
+            ChatMessage(role=MessageRole.USER, content=query),
+            ChatMessage(role=MessageRole.ASSISTANT, content=None, additional_kwargs={"tool_calls": [tool_call]}),
+            ChatMessage(
+                role=MessageRole.TOOL,
+                content=tool_output,
+                additional_kwargs={"name": SEARCH_TRAVEL_TOOL_NAME, "tool_call_id": call_id}
+            ),
+        ]
+
+    @staticmethod
+    def _template_answer(preferences: Dict[str, str], packages: List[Dict]) -> str:
+        """Write a fast-path answer from the search results without an LLM call."""
+        summary = describe_preferences(preferences)
+        suffix = f" ({summary})" if summary else ""
+        if not packages:
+            return (f"Hmm, I couldn't find packages matching those preferences{suffix}. "
+                    "Maybe we could try broadening the search a bit?")
+
+        lines = [f"Here are some trips that match what you're looking for{suffix}:", ""]
+        for package in packages:
+            details = []
+            if package.get("duration_days"):
+                details.append(f"{package['duration_days']} days")
+            if package.get("price") is not None:
+                details.append(f"${package['price']:,.0f}" if isinstance(package["price"], (int, float))
+                               else f"${package['price']}")
+            title = f"*   **{package.get('title')}**"
+            lines.append(f"{title} ({', '.join(details)})" if details else title)
+            highlights = parse_highlights_value(package.get("highlights"))
+            if highlights:
+                lines.append(f"    *   Highlights: {', '.join(str(item) for item in highlights)}")
+            if package.get("image_url"):
+                lines.append(f"    *   Image: {package['image_url']}")
+        lines += ["", "Would you like more details on any of these, or should I show you more options?"]
+        return "\n".join(lines)
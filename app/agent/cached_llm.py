@@ -0,0 +1,184 @@
+import hashlib
+import json
+import logging
+import secrets
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, MessageRole
+from llama_index.llms.openai import OpenAI as OpenAI_LLAMA
+from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall
+from pydantic import PrivateAttr
+
+from app.config.env_config import config
+from app.services.llm_cache import LLMResponseCache
+from app.services.resilience import llm_calls
+from app.telemetry.metrics import LLM_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+def _collapse(text: Optional[str]) -> str:
+    return " ".join((text or "").split())
+
+
+def _normalize_message(message: ChatMessage) -> Dict[str, Any]:
+    """
+    Reduce a chat message to what determines the model's answer.
+
+    Whitespace is collapsed, user text is lower-cased, and tool call IDs
+    (random per call) are dropped; tool calls are compared by name and
+    arguments.
+    """
+    content = _collapse(message.content)
+    if message.role == MessageRole.USER:
+        content = content.lower()
+    normalized: Dict[str, Any] = {"role": message.role.value, "content": content}
+
+    tool_calls = message.additional_kwargs.get("tool_calls")
+    if tool_calls:
+        calls = []
+        for tool_call in tool_calls:
+            function = tool_call.function if hasattr(tool_call, "function") else tool_call.get("function", {})
+            name = getattr(function, "name", None) or function.get("name")
+            arguments = getattr(function, "arguments", None) or function.get("arguments") or "{}"
+            try:
+                arguments = json.dumps(json.loads(arguments), sort_keys=True)
+            except ValueError:
+                arguments = _collapse(arguments)
+            calls.append([name, arguments])
+        normalized["tool_calls"] = calls
+    if message.role == MessageRole.TOOL:
+        normalized["name"] = message.additional_kwargs.get("name")
+    return normalized
+
+
+def _hash(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _serialize_response(response: ChatResponse) -> str:
+    message = response.message
+    tool_calls = message.additional_kwargs.get("tool_calls") or []
+    return json.dumps({
+        "role": message.role.value,
+        "content": message.content,
+        "tool_calls": [
+            tool_call.model_dump() if hasattr(tool_call, "model_dump") else tool_call
+            for tool_call in tool_calls
+        ],
+    })
+
+
+def _deserialize_response(data: str) -> ChatResponse:
+    payload = json.loads(data)
+    additional_kwargs = {}
+    if payload["tool_calls"]:
+        tool_calls = []
+        for tool_call in payload["tool_calls"]:
+            # Fresh IDs so a reused answer cannot collide with calls already in this conversation
+            tool_call = dict(tool_call, id=f"call_{secrets.token_hex(12)}")
+            tool_calls.append(ChatCompletionMessageToolCall.model_validate(tool_call))
+        additional_kwargs["tool_calls"] = tool_calls
+    message = ChatMessage(
+        role=MessageRole(payload["role"]),
+        content=payload["content"],
+        additional_kwargs=additional_kwargs
+    )
+    return ChatResponse(message=message, raw={"cached": True})
+
+
+class CachedOpenAI(OpenAI_LLAMA):
+    """
+    llama_index OpenAI LLM that serves repeated chat requests from an LLMResponseCache.
+
+    The cache key is a hash of the model, sampling parameters, tool
+    definitions and the normalized conversation (system prompt, messages
+    and tool results). With an embedding function configured, first turns
+    (system prompt plus one user message) can also be answered from a
+    semantically similar cached first turn.
+    """
+
+    _cache: Optional[LLMResponseCache] = PrivateAttr(default=None)
+    _embed_fn: Any = PrivateAttr(default=None)
+    _semantic_threshold: float = PrivateAttr(default=0.95)
+
+    def __init__(self,
+                 cache: Optional[LLMResponseCache] = None,
+                 embed_fn=None,
+                 semantic_threshold: float = 0.95,
+                 **kwargs: Any):
+        """
+        Args:
+            cache: The response cache (None disables caching).
+            embed_fn: Function returning the embedding of a text, for semantic first-turn lookups.
+            semantic_threshold: Minimum cosine similarity for a semantic hit.
+            kwargs: Arguments for the llama_index OpenAI LLM.
+        """
+        super().__init__(**kwargs)
+        self._cache = cache
+        self._embed_fn = embed_fn
+        self._semantic_threshold = semantic_threshold
+
+    def _chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        if self._cache is None:
+            return llm_calls.call(super()._chat, messages, **kwargs)
+
+        context = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "tools": kwargs.get("tools"),
+            "tool_choice": kwargs.get("tool_choice"),
+            "system": [_normalize_message(m) for m in messages if m.role == MessageRole.SYSTEM],
+        }
+        conversation = [_normalize_message(m) for m in messages if m.role != MessageRole.SYSTEM]
+        key = _hash([context, conversation])
+
+        try:
+            cached = self._cache.get(key)
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            cached = None
+        if cached is not None:
+            self._count("hit")
+            return _deserialize_response(cached)
+
+        # First turn: the system prompt and a single user message
+        first_turn_text = None
+        context_key = embedding = None
+        if self._embed_fn is not None and len(conversation) == 1 and conversation[0]["role"] == "user":
+            first_turn_text = conversation[0]["content"]
+            context_key = _hash(context)
+            embedding = self._embed(first_turn_text)
+            if embedding is not None:
+                similar = self._cache.get_similar(context_key, embedding, self._semantic_threshold)
+                if similar is not None:
+                    self._count("semantic_hit")
+                    return _deserialize_response(similar)
+
+        self._count("miss")
+        response = llm_calls.call(super()._chat, messages, **kwargs)
+        try:
+            self._cache.put(key, self.model, _serialize_response(response), context_key, embedding)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+        return response
+
+    @staticmethod
+    def _count(outcome: str):
+        if config.metrics_enabled:
+            LLM_CACHE_LOOKUPS.labels(outcome).inc()
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(self._embed_fn(text), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"LLM cache could not embed first turn: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def cache_stats(self) -> Optional[Dict[str, int]]:
+        """Return cache hit/miss counts, or None if caching is disabled."""
+        return self._cache.stats() if self._cache is not None else None
@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.utils import get_tokenizer
+
+
+class TravelPackageFormatter:
+    """
+    Render travel packages compactly for the agent's tool output.
+
+    Only the configured fields are rendered, descriptions are truncated and
+    the output is cut off at a token budget. Each package gets a short
+    reference (P1, P2, ...) the first time it is shown in a conversation;
+    later tool calls that return the same package only repeat the reference
+    and title instead of the full text.
+
+    References are only valid while the output that introduced them is in
+    the agent's memory window, so each conversation has its own formatter
+    and the caller reports the window (see retain).
+    """
+
+    def __init__(self,
+                 fields: Sequence[str],
+                 description_chars: int = 200,
+                 token_budget: int = 1500,
+                 max_references: int = 200,
+                 tokenizer: Optional[Callable[[str], List]] = None):
+        """
+        Args:
+            fields: Package fields to render, in order. "title" is used as the heading.
+            description_chars: Maximum number of description characters to keep.
+            token_budget: Maximum number of tokens of rendered packages per tool call.
+            max_references: Maximum number of packages remembered; the earliest shown are forgotten first.
+            tokenizer: Function returning the tokens of a string (defaults to the llama_index tokenizer).
+        """
+        self.fields = [field for field in fields if field != "title"]
+        self.description_chars = description_chars
+        self.token_budget = token_budget
+        self.max_references = max_references
+        self.tokenizer = tokenizer or get_tokenizer()
+        # Package ID -> (reference, memory position of the output that introduced it)
+        self._references: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._next_number = 1
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Forget which packages were shown (start of a new conversation)."""
+        with self._lock:
+            self._references.clear()
+            self._next_number = 1
+
+    def retain(self, start: int, end: int):
+        """
+        Forget packages introduced outside memory positions [start, end).
+
+        Args:
+            start: Position of the oldest message still in the memory window.
+            end: First position past the memory (outputs at or after it were rolled back).
+        """
+        with self._lock:
+            for package_id, (_, position) in list(self._references.items()):
+                if not start <= position < end:
+                    del self._references[package_id]
+
+    def format(self, packages: List[Dict], position: int = 0) -> Tuple[str, int]:
+        """
+        Render packages until the token budget is used up.
+
+        Args:
+            packages: Ranked package dictionaries.
+            position: Memory position the output will be stored at (or after).
+
+        Returns:
+            The rendered text and how many of the packages it includes.
+        """
+        blocks = []
+        used_tokens = 0
+        with self._lock:
+            for package in packages:
+                block = self._render(package)
+                tokens = len(self.tokenizer(block))
+                # Always include at least one package, even if it alone exceeds the budget
+                if blocks and used_tokens + tokens > self.token_budget:
+                    break
+                blocks.append(block)
+                used_tokens += tokens
+                self._remember(package, position)
+
+        omitted = len(packages) - len(blocks)
+        if omitted:
+            blocks.append(f"({omitted} more packages omitted to keep this short; "
+                          f"call ShowMoreTravelPackages to see them.)")
+        return "\n\n".join(blocks), len(packages) - omitted
+
+    def _render(self, package: Dict) -> str:
+        """Render one package, or only its reference if it was shown before."""
+        package_id = str(package.get("id"))
+        title = package.get("title") or "Untitled package"
+        known = self._references.get(package_id)
+        if known is not None:
+            return f"[{known[0]}] {title} (already shown above)"
+
+        reference = f"P{self._next_number}"
+        lines = [f"[{reference}] {title}"]
+        for field in self.fields:
+            value = package.get(field)
+            if value is None or value == "" or value == []:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = ", ".join(str(item) for item in value)
+            elif field == "description":
+                value = self._truncate(str(value))
+            lines.append(f"  {field}: {value}")
+        return "\n".join(lines)
+
+    def _remember(self, package: Dict, position: int):
+        package_id = str(package.get("id"))
+        if package_id in self._references:
+            return
+        self._references[package_id] = (f"P{self._next_number}", position)
+        self._next_number += 1
+        while len(self._references) > self.max_references:
+            self._references.popitem(last=False)
+
+    def _truncate(self, text: str) -> str:
+        text = " ".join(text.split())
+        if len(text) <= self.description_chars:
+            return text
+        return text[:self.description_chars].rsplit(" ", 1)[0] + "…"
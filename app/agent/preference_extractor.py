@@ -0,0 +1,184 @@
+import re
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from app.utils.text_utils import is_negated
+
+# Slots filled by the extractor, named like the SearchTravelPackages arguments
+PREFERENCE_SLOTS = [
+    "location_input", "duration_input", "budget_input", "transportation_input",
+    "accommodation_input", "food_input", "activities_input", "notes_input",
+]
+
+_NUMBER = r"(?:\d+|one|two|three|four|five|six|seven|eight|nine|ten|a|an)"
+
+_SLOT_PATTERNS: Dict[str, List[Pattern]] = {
+    "duration_input": [
+        re.compile(rf"\b(?:about |around |for )?{_NUMBER}[ -](?:day|night|week)s?\b", re.I),
+        re.compile(r"\b(?:long )?weekend\b", re.I),
+        re.compile(r"\b\d+\s*-\s*\d+\s*(?:days|nights)\b", re.I),
+    ],
+    "budget_input": [
+        re.compile(r"\b(?:under|below|less than|up to|max(?:imum)?|around|about|within)?\s*"
+                   r"(?:\$|usd\s?)\s?\d(?:[\d,.]*\d)?\s*k?\b(?:\s*(?:budget|per person))?", re.I),
+        re.compile(r"\b\d(?:[\d,.]*\d)?\s*(?:usd|dollars|vnd|eur|euros)\b", re.I),
+        re.compile(r"\b(?:cheap|budget|affordable|low[- ]cost|mid[- ]range|moderate|luxury|luxurious|premium|high[- ]end)\b",
+                   re.I),
+    ],
+    "transportation_input": [
+        re.compile(r"\b(?:flights?(?: included)?|fly(?:ing)?|train|rail|bus|coach|private car|car rental|"
+                   r"self[- ]drive|motorbike|scooter|cruise|ferry|boat)\b", re.I),
+    ],
+    "accommodation_input": [
+        re.compile(r"\b(?:(?:beach |boutique |luxury |budget |\d[- ]star )?(?:hotels?|resorts?)|homestays?|"
+                   r"hostels?|villas?|guest ?houses?|bungalows?|glamping|camping|airbnb)\b", re.I),
+    ],
+    "food_input": [
+        re.compile(r"\b(?:street food|local food|local cuisine|seafood|vegetarian|vegan|halal|kosher|"
+                   r"gluten[- ]free|fine dining|food tours?|wine tasting)\b", re.I),
+    ],
+    "activities_input": [
+        re.compile(r"\b(?:snorkel(?:l)?ing|scuba|diving|surfing|swimming|kayaking|hiking|trekking|climbing|"
+                   r"cycling|biking|sightseeing|museums?|temples?|city tours?|cooking class(?:es)?|shopping|"
+                   r"nightlife|spa|yoga|golf|wildlife|safari|island hopping|caves?|sunbathing|relaxing|"
+                   r"photography|markets?)\b", re.I),
+    ],
+    "notes_input": [
+        re.compile(r"\b(?:with (?:my |our )?(?:kids|children|family|parents|partner|wife|husband|friends)|"
+                   r"honeymoon|anniversary|solo|family[- ]friendly|wheelchair accessible|accessible|"
+                   r"pet[- ]friendly|quiet|romantic|first time)\b", re.I),
+    ],
+}
+
+# "to Da Nang", "in Bali", "visit Hoi An", "trip to the Philippines"
+_LOCATION_PATTERN = re.compile(
+    r"\b(?:to|in|visit(?:ing)?|around|near|explore|exploring)\s+(?:the\s+)?"
+    r"((?:[A-Z][\w'-]*)(?:\s+(?:[A-Z][\w'-]*|of|de|la))*)"
+)
+# Capitalized words the location pattern would otherwise take for places ("in March", "on Friday")
+_CALENDAR_WORDS = frozenset(
+    "january february march april may june july august september october november december "
+    "jan feb mar apr jun jul aug sep sept oct nov dec "
+    "monday tuesday wednesday thursday friday saturday sunday".split()
+)
+# Generic destination descriptions without a place name
+_LOCATION_KEYWORDS = re.compile(
+    r"\b(?:somewhere (?:warm|cold|sunny|tropical|quiet)|beach(?:es)?|islands?|mountains?|countryside|"
+    r"old town|city break|seaside|coast(?:al)?|jungle|desert|lakes?)\b", re.I
+)
+
+# Messages that are about the conversation rather than a fresh search
+_CONVERSATIONAL_PATTERN = re.compile(
+    r"\?|\b(?:what|why|how|which|who|when|where|compare|difference|tell me|explain|more|another|other|else|"
+    r"that one|this one|the first|the second|the last|previous|above|instead|book|booking|cancel|thanks|"
+    r"thank you|hi|hello)\b|\bP\d+\b",
+    re.I
+)
+
+
+# Leading words that say "search for me" without carrying a preference
+_REQUEST_PATTERN = re.compile(
+    r"\b(?:i want|i'd like|i would like|looking for|find|show me|search|recommend|suggest|plan|need|"
+    r"trip|travel|vacation|holiday|getaway|tour|package)\b",
+    re.I
+)
+
+
+class PreferenceExtractor:
+    """
+    Rule-based slot extractor for travel preference messages.
+
+    Fills the SearchTravelPackages arguments from a user message with
+    regular expressions and decides whether the message is a plain
+    structured search request that can skip the LLM tool-selection step.
+    """
+
+    def __init__(self, max_words: int = 40, min_slots: int = 2):
+        """
+        Args:
+            max_words: Longer messages are left to the agent.
+            min_slots: Minimum number of filled slots for a message to count as structured.
+        """
+        self.max_words = max_words
+        self.min_slots = min_slots
+
+    def extract(self, text: str) -> Dict[str, str]:
+        """
+        Extract preference slots from a message.
+
+        Args:
+            text: The user message.
+
+        Returns:
+            Mapping of every preference slot to its extracted text ("" if not mentioned).
+        """
+        slots = {slot: "" for slot in PREFERENCE_SLOTS}
+        for slot, patterns in _SLOT_PATTERNS.items():
+            matches = self._matches(text, patterns)
+            if matches:
+                slots[slot] = ", ".join(matches)
+
+        locations = [location for location in map(self._strip_calendar_words, _LOCATION_PATTERN.findall(text))
+                     if location]
+        locations += [match.group(0) for match in _LOCATION_KEYWORDS.finditer(text)]
+        if locations:
+            slots["location_input"] = ", ".join(dict.fromkeys(locations))
+        return slots
+
+    def classify(self, text: str) -> Tuple[bool, Dict[str, str]]:
+        """
+        Decide whether a message is a structured preference query.
+
+        A message qualifies when it is short, names a location, fills at
+        least `min_slots` slots and contains nothing conversational
+        (questions, references to earlier results, greetings) and no
+        negation or exclusion.
+
+        Args:
+            text: The user message.
+
+        Returns:
+            Whether the message qualifies, and the extracted slots.
+        """
+        slots = self.extract(text)
+        if len(text.split()) > self.max_words or _CONVERSATIONAL_PATTERN.search(text):
+            return False, slots
+        # The extractor would turn negations into positive preferences, so they are left to the agent
+        if is_negated(text):
+            return False, slots
+        filled = sum(1 for value in slots.values() if value)
+        if not slots["location_input"] or filled < self.min_slots:
+            return False, slots
+        if not _REQUEST_PATTERN.search(text) and filled < self.min_slots + 1:
+            return False, slots
+        return True, slots
+
+    @staticmethod
+    def _strip_calendar_words(location: str) -> str:
+        """Drop month and weekday names from the ends of a captured location."""
+        words = location.split()
+        while words and words[0].lower() in _CALENDAR_WORDS:
+            words.pop(0)
+        while words and words[-1].lower() in _CALENDAR_WORDS:
+            words.pop()
+        return " ".join(words)
+
+    @staticmethod
+    def _matches(text: str, patterns: List[Pattern]) -> List[str]:
+        found: List[str] = []
+        for pattern in patterns:
+            for match in pattern.finditer(text):
+                value = " ".join(match.group(0).split())
+                if value and value.lower() not in (item.lower() for item in found):
+                    found.append(value)
+        return found
+
+
+def describe_preferences(slots: Dict[str, str]) -> Optional[str]:
+    """Render the filled slots as a short human-readable summary, e.g. for a template answer."""
+    labels = {
+        "location_input": "destination", "duration_input": "duration", "budget_input": "budget",
+        "transportation_input": "transport", "accommodation_input": "stay", "food_input": "food",
+        "activities_input": "activities", "notes_input": "notes",
+    }
+    parts = [f"{labels[slot]}: {value}" for slot, value in slots.items() if value and slot in labels]
+    return "; ".join(parts) if parts else None
@@ -0,0 +1,82 @@
+import threading
+from typing import Dict, Optional
+
+from app.agent.preference_extractor import PreferenceExtractor
+from app.config.env_config import config
+from app.telemetry.metrics import ROUTER_DECISIONS, ROUTER_LATENCY_SAVED
+
+
+class QueryRouter:
+    """
+    Decide whether a user message can skip the agent's LLM tool selection.
+
+    Structured preference queries ("5 days in Da Nang, beach resort, under
+    $800") are routed to a direct SearchTravelPackages call; everything else
+    goes to the agent. The router keeps a moving average of agent-path
+    latency to estimate how much time each fast-path hit saved.
+    """
+
+    def __init__(self, extractor: Optional[PreferenceExtractor] = None, smoothing: float = 0.1):
+        """
+        Args:
+            extractor: Slot extractor and classifier for user messages.
+            smoothing: Weight of the newest sample in the agent latency moving average.
+        """
+        self.extractor = extractor or PreferenceExtractor()
+        self.smoothing = smoothing
+        self._agent_latency: Optional[float] = None
+        self._lock = threading.Lock()
+        self._counts = {"fast_path": 0, "agent": 0}
+        self._saved_seconds = 0.0
+
+    def route(self, query: str) -> Optional[Dict[str, str]]:
+        """
+        Route a user message.
+
+        Args:
+            query: The user message.
+
+        Returns:
+            The extracted SearchTravelPackages arguments if the message should take
+            the fast path, or None if it should go to the agent.
+        """
+        structured = False
+        slots: Dict[str, str] = {}
+        if config.fast_path_enabled:
+            structured, slots = self.extractor.classify(query)
+        route = "fast_path" if structured else "agent"
+        with self._lock:
+            self._counts[route] += 1
+        if config.metrics_enabled:
+            ROUTER_DECISIONS.labels(route).inc()
+        return slots if structured else None
+
+    def record_agent_latency(self, seconds: float):
+        """Feed the latency of a query answered by the agent into the moving average."""
+        with self._lock:
+            if self._agent_latency is None:
+                self._agent_latency = seconds
+            else:
+                self._agent_latency += self.smoothing * (seconds - self._agent_latency)
+
+    def record_fast_path_latency(self, seconds: float):
+        """Record a fast-path answer and the latency it saved compared to the agent average."""
+        with self._lock:
+            if self._agent_latency is None:
+                return
+            saved = max(0.0, self._agent_latency - seconds)
+            self._saved_seconds += saved
+        if config.metrics_enabled:
+            ROUTER_LATENCY_SAVED.inc(saved)
+
+    def stats(self) -> Dict[str, float]:
+        """Return routing counts, fast-path hit rate and the estimated latency saved."""
+        with self._lock:
+            total = self._counts["fast_path"] + self._counts["agent"]
+            return {
+                "fast_path": self._counts["fast_path"],
+                "agent": self._counts["agent"],
+                "hit_rate": self._counts["fast_path"] / total if total else 0.0,
+                "latency_saved_seconds": self._saved_seconds,
+                "agent_latency_avg_seconds": self._agent_latency or 0.0,
+            }
@@ -0,0 +1,147 @@
+import logging
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from app.agent.preference_extractor import PREFERENCE_SLOTS
+from app.config.env_config import config
+from app.telemetry.metrics import SPECULATION_OUTCOMES, span
+from app.tools.search.search_tools import SearchTravelPackagesTool, preference_text
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_preferences(preferences: Dict[str, Optional[str]]) -> tuple:
+    """Key for comparing two sets of SearchTravelPackages arguments by the texts that get embedded."""
+    return tuple(" ".join(preference_text(preferences.get(slot)).lower().split()) for slot in PREFERENCE_SLOTS)
+
+
+class Speculation:
+    """A travel package search started before the agent asked for it."""
+
+    def __init__(self, preferences: Dict[str, str], fetch_count: int):
+        self.key = normalize_preferences(preferences)
+        self.fetch_count = fetch_count
+        self.future: Future = Future()
+        self.cancelled = threading.Event()
+        self.consumed = False
+
+    def cancel(self):
+        """Stop the speculative work at the next stage boundary."""
+        self.cancelled.set()
+        self.future.cancel()
+
+
+class SpeculativeSearch:
+    """
+    Run a guessed SearchTravelPackages call while the agent's first LLM call is in flight.
+
+    The search is split into the embedding and vector search stages; a
+    cancelled speculation stops before the next stage. When the agent's
+    real tool call has the same (normalized) arguments and needs no more
+    results than were fetched, the speculative result is reused.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        """
+        Args:
+            max_workers: Maximum number of speculative searches running at once.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-search")
+        self._lock = threading.Lock()
+        self._counts = {"hit": 0, "mismatch": 0, "unused": 0}
+
+    def start(self,
+              search_tool: SearchTravelPackagesTool,
+              preferences: Dict[str, str],
+              fetch_count: int) -> Speculation:
+        """
+        Start a speculative search in the background.
+
+        Args:
+            search_tool: The caller's travel package search tool.
+            preferences: Guessed SearchTravelPackages arguments.
+            fetch_count: Number of ranked results to fetch.
+
+        Returns:
+            The running speculation.
+        """
+        speculation = Speculation(preferences, fetch_count)
+        inputs = [preferences.get(slot) for slot in PREFERENCE_SLOTS]
+
+        def run():
+            if not speculation.future.set_running_or_notify_cancel():
+                return
+            try:
+                with span("agent.speculative_search"):
+                    embeddings = search_tool.embed_preferences(inputs)
+                    if speculation.cancelled.is_set():
+                        speculation.future.set_exception(CancelledError())
+                        return
+                    results = search_tool.search_with_embeddings(
+                        embeddings, fetch_count, location_input=preferences.get("location_input")
+                    )
+                speculation.future.set_result(results or [])
+            except BaseException as e:
+                speculation.future.set_exception(e)
+
+        self.executor.submit(run)
+        return speculation
+
+    def claim(self,
+              speculation: Optional[Speculation],
+              preferences: Dict[str, str],
+              fetch_count: int) -> Optional[List[Dict]]:
+        """
+        Reuse a speculation for the agent's real tool call if the arguments match.
+
+        A mismatching speculation is cancelled.
+
+        Args:
+            speculation: The speculation for the current query, if any.
+            preferences: The arguments of the agent's tool call.
+            fetch_count: Number of ranked results the tool call needs.
+
+        Returns:
+            The prefetched results, or None if the search has to run normally.
+        """
+        if speculation is None or speculation.consumed:
+            return None
+        speculation.consumed = True
+        if speculation.key != normalize_preferences(preferences) or speculation.fetch_count < fetch_count:
+            speculation.cancel()
+            self._record("mismatch")
+            return None
+        try:
+            results = speculation.future.result()
+        except Exception as e:
+            # Fall back to a normal search; the tool call itself will surface persistent errors
+            logger.warning(f"Speculative search failed: {e}")
+            self._record("mismatch")
+            return None
+        self._record("hit")
+        return [dict(row) for row in results]
+
+    def release(self, speculation: Optional[Speculation]):
+        """Cancel a speculation the agent never claimed (it answered without searching)."""
+        if speculation is None or speculation.consumed:
+            return
+        speculation.consumed = True
+        speculation.cancel()
+        self._record("unused")
+
+    def _record(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+        if config.metrics_enabled:
+            SPECULATION_OUTCOMES.labels(outcome).inc()
+
+    def stats(self) -> Dict[str, float]:
+        """Return speculation outcomes and the hit rate over speculations that were started."""
+        with self._lock:
+            total = sum(self._counts.values())
+            return dict(self._counts, hit_rate=self._counts["hit"] / total if total else 0.0)
+
+
+# Shared by all agent queries
+speculative_search = SpeculativeSearch(max_workers=config.speculative_search_max_workers)
@@ -1,5 +1,5 @@
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -57,6 +57,17 @@ class EnvConfig:
         except ValueError:
             return default
 
+    @staticmethod
+    def get_float(key: str, default: float) -> float:
+        """Get an environment variable as a float."""
+        value = os.environ.get(key)
+        if value is None:
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            return default
+
 
 # Application-specific config properties
 class AppConfig:
@@ -97,6 +108,467 @@ class AppConfig:
         """Get the token limit for chat memory."""
         return EnvConfig.get_int("MEMORY_TOKEN_LIMIT", 100000)
 
+    @property
+    def single_flight_enabled(self) -> bool:
+        """Check if identical in-flight embedding and search calls are coalesced."""
+        return bool(EnvConfig.get_int("SINGLE_FLIGHT_ENABLED", 1))
+
+    @property
+    def embedding_batching_enabled(self) -> bool:
+        """Check if embedding requests are merged across callers by the micro-batcher."""
+        return bool(EnvConfig.get_int("EMBEDDING_BATCHING_ENABLED", 1))
+
+    @property
+    def embedding_batch_max_size(self) -> int:
+        """Get the maximum number of texts sent in one embeddings API call."""
+        return EnvConfig.get_int("EMBEDDING_BATCH_MAX_SIZE", 256)
+
+    @property
+    def embedding_batch_max_wait_ms(self) -> float:
+        """Get how long (ms) a queued text may wait for others to join its batch."""
+        return EnvConfig.get_float("EMBEDDING_BATCH_MAX_WAIT_MS", 10.0)
+
+    @property
+    def embedding_batch_max_concurrency(self) -> int:
+        """Get the maximum number of concurrent embeddings API calls made by the batcher."""
+        return EnvConfig.get_int("EMBEDDING_BATCH_MAX_CONCURRENCY", 4)
+
+    @property
+    def embedding_batch_result_timeout_seconds(self) -> float:
+        """Get how long (seconds) a caller waits for its batched embeddings before giving up."""
+        default = self.embedding_timeout_seconds * (self.upstream_max_retries + 1) + 5.0
+        return EnvConfig.get_float("EMBEDDING_BATCH_RESULT_TIMEOUT_SECONDS", default)
+
+    @property
+    def auth_cache_ttl_seconds(self) -> int:
+        """Get how long (seconds) per-token vector stores, search tools and user IDs are reused."""
+        return EnvConfig.get_int("AUTH_CACHE_TTL_SECONDS", 300)
+
+    @property
+    def auth_cache_max_entries(self) -> int:
+        """Get the maximum number of tokens whose vector stores, search tools and user IDs are kept."""
+        return EnvConfig.get_int("AUTH_CACHE_MAX_ENTRIES", 256)
+
+    @property
+    def preference_profile_ttl_seconds(self) -> int:
+        """Get how long (seconds) an idle user's search preference profile is kept."""
+        return EnvConfig.get_int("PREFERENCE_PROFILE_TTL_SECONDS", 3600)
+
+    @property
+    def preference_profile_max_entries(self) -> int:
+        """Get the maximum number of users whose search preference profiles are kept."""
+        return EnvConfig.get_int("PREFERENCE_PROFILE_MAX_ENTRIES", 10000)
+
+    @property
+    def search_cursor_ttl_seconds(self) -> int:
+        """Get how long (seconds) ranked search results are kept for pagination."""
+        return EnvConfig.get_int("SEARCH_CURSOR_TTL_SECONDS", 900)
+
+    @property
+    def search_cursor_max_entries(self) -> int:
+        """Get the maximum number of paginated searches kept in memory."""
+        return EnvConfig.get_int("SEARCH_CURSOR_MAX_ENTRIES", 10000)
+
+    @property
+    def search_cursor_max_results(self) -> int:
+        """Get how many ranked results the first page of a search fetches for later pages."""
+        return EnvConfig.get_int("SEARCH_CURSOR_MAX_RESULTS", 50)
+
+    @property
+    def catalog_refresh_seconds(self) -> int:
+        """Get how often (seconds) in-process catalogs are checked for a new version."""
+        return EnvConfig.get_int("CATALOG_REFRESH_SECONDS", 300)
+
+    @property
+    def catalog_page_size(self) -> int:
+        """Get the number of travel_packages rows fetched per request when loading the index."""
+        return EnvConfig.get_int("CATALOG_PAGE_SIZE", 1000)
+
+    @property
+    def catalog_snapshot_dir(self) -> str:
+        """Get the directory of memory-mapped catalog snapshots (empty to load travel packages from Supabase)."""
+        return EnvConfig.get("CATALOG_SNAPSHOT_DIR", "")
+
+    @property
+    def travel_search_backend(self) -> str:
+        """Get where travel package searches run: "supabase" (RPC) or "local" (in-process index)."""
+        return EnvConfig.get("TRAVEL_SEARCH_BACKEND", "supabase")
+
+    @property
+    def travel_search_rpc_columns(self) -> str:
+        """Get the columns selected from search_travel_packages results (empty for all, vector columns included)."""
+        return EnvConfig.get(
+            "TRAVEL_SEARCH_RPC_COLUMNS",
+            "id,title,provider_id,location_id,price,duration_days,highlights,description,image_url,combined_score"
+        )
+
+    @property
+    def batch_search_chunk_size(self) -> int:
+        """Get the number of preference profiles scored per matrix operation in batch search."""
+        return EnvConfig.get_int("BATCH_SEARCH_CHUNK_SIZE", 256)
+
+    @property
+    def batch_search_max_profiles(self) -> int:
+        """Get the maximum number of preference profiles accepted by one batch search call."""
+        return EnvConfig.get_int("BATCH_SEARCH_MAX_PROFILES", 10000)
+
+    @property
+    def tool_output_fields(self) -> List[str]:
+        """Get the travel package fields rendered in the agent's tool output."""
+        fields = EnvConfig.get("TOOL_OUTPUT_FIELDS", "title,price,duration_days,highlights,description,image_url")
+        return [field.strip() for field in fields.split(",") if field.strip()]
+
+    @property
+    def tool_output_description_chars(self) -> int:
+        """Get the maximum description length in the agent's tool output."""
+        return EnvConfig.get_int("TOOL_OUTPUT_DESCRIPTION_CHARS", 200)
+
+    @property
+    def tool_output_token_budget(self) -> int:
+        """Get the maximum number of tokens of packages per agent tool output."""
+        return EnvConfig.get_int("TOOL_OUTPUT_TOKEN_BUDGET", 1500)
+
+    @property
+    def tool_output_max_references(self) -> int:
+        """Get the maximum number of packages per conversation the agent's tool output refers back to."""
+        return EnvConfig.get_int("TOOL_OUTPUT_MAX_REFERENCES", 200)
+
+    @property
+    def fast_path_enabled(self) -> bool:
+        """Check if structured preference queries bypass the agent's LLM tool selection."""
+        return bool(EnvConfig.get_int("FAST_PATH_ENABLED", 1))
+
+    @property
+    def fast_path_answer_mode(self) -> str:
+        """Get how fast-path answers are written: "template" (no LLM call) or "llm" (one summarization call)."""
+        return EnvConfig.get("FAST_PATH_ANSWER_MODE", "template")
+
+    @property
+    def fast_path_match_count(self) -> int:
+        """Get the number of packages shown in a fast-path answer."""
+        return EnvConfig.get_int("FAST_PATH_MATCH_COUNT", 5)
+
+    @property
+    def speculative_search_enabled(self) -> bool:
+        """Check if a guessed travel package search starts while the agent's first LLM call runs."""
+        return bool(EnvConfig.get_int("SPECULATIVE_SEARCH_ENABLED", 1))
+
+    @property
+    def speculative_search_max_workers(self) -> int:
+        """Get the maximum number of speculative searches running at once."""
+        return EnvConfig.get_int("SPECULATIVE_SEARCH_MAX_WORKERS", 2)
+
+    @property
+    def llm_cache_enabled(self) -> bool:
+        """Check if agent LLM responses are cached."""
+        return bool(EnvConfig.get_int("LLM_CACHE_ENABLED", 1))
+
+    @property
+    def llm_cache_path(self) -> str:
+        """Get the SQLite file backing the LLM response cache (shared by all workers)."""
+        return EnvConfig.get("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+
+    @property
+    def llm_cache_ttl_seconds(self) -> int:
+        """Get how long cached LLM responses are served."""
+        return EnvConfig.get_int("LLM_CACHE_TTL_SECONDS", 86400)
+
+    @property
+    def llm_cache_max_entries(self) -> int:
+        """Get the maximum number of cached LLM responses."""
+        return EnvConfig.get_int("LLM_CACHE_MAX_ENTRIES", 10000)
+
+    @property
+    def llm_cache_semantic_enabled(self) -> bool:
+        """Check if first turns may reuse the answer of a semantically similar first turn."""
+        return bool(EnvConfig.get_int("LLM_CACHE_SEMANTIC_ENABLED", 0))
+
+    @property
+    def llm_cache_semantic_threshold(self) -> float:
+        """Get the minimum cosine similarity for a semantic LLM cache hit."""
+        return EnvConfig.get_float("LLM_CACHE_SEMANTIC_THRESHOLD", 0.95)
+
+    @property
+    def llm_cache_semantic_max_candidates(self) -> int:
+        """Get how many recently used first turns a semantic LLM cache lookup compares."""
+        return EnvConfig.get_int("LLM_CACHE_SEMANTIC_MAX_CANDIDATES", 500)
+
+    @property
+    def meeting_tools_enabled(self) -> bool:
+        """Check if the agent is given the meeting search tools."""
+        return bool(EnvConfig.get_int("MEETING_TOOLS_ENABLED", 0))
+
+    @property
+    def meeting_search_backend(self) -> str:
+        """Get where meeting searches run: "supabase" (RPC) or "local" (in-process hybrid engine)."""
+        return EnvConfig.get("MEETING_SEARCH_BACKEND", "supabase")
+
+    @property
+    def meeting_table(self) -> str:
+        """Get the meeting table loaded by the local meeting search engine."""
+        return EnvConfig.get("MEETING_TABLE", "meetings")
+
+    @property
+    def meeting_date_columns(self) -> List[str]:
+        """Get the meeting columns holding the meeting date, in order of preference."""
+        columns = EnvConfig.get("MEETING_DATE_COLUMNS", "meeting_date,created_at")
+        return [column.strip() for column in columns.split(",") if column.strip()]
+
+    @property
+    def meeting_date_overfetch(self) -> int:
+        """Get the factor by which Supabase meeting searches over-fetch when filtering by date."""
+        return EnvConfig.get_int("MEETING_DATE_OVERFETCH", 5)
+
+    @property
+    def admission_control_enabled(self) -> bool:
+        """Check if /ask and search requests are rate limited and shed under overload."""
+        return EnvConfig.get_int("ADMISSION_CONTROL_ENABLED", 1) == 1
+
+    @property
+    def ask_workers(self) -> int:
+        """Get the number of worker threads running agent queries."""
+        return EnvConfig.get_int("ASK_WORKERS", 4)
+
+    @property
+    def ask_max_queue(self) -> int:
+        """Get the maximum number of agent queries waiting for a worker."""
+        return EnvConfig.get_int("ASK_MAX_QUEUE", 16)
+
+    @property
+    def ask_queue_slo_seconds(self) -> float:
+        """Get the longest queue wait (seconds) accepted for an agent query before it is shed."""
+        return EnvConfig.get_float("ASK_QUEUE_SLO_SECONDS", 10.0)
+
+    @property
+    def ask_rate_limit_per_minute(self) -> float:
+        """Get the sustained number of agent queries allowed per user per minute."""
+        return EnvConfig.get_float("ASK_RATE_LIMIT_PER_MINUTE", 20.0)
+
+    @property
+    def ask_rate_limit_burst(self) -> int:
+        """Get the number of agent queries a user may send back to back."""
+        return EnvConfig.get_int("ASK_RATE_LIMIT_BURST", 5)
+
+    @property
+    def search_workers(self) -> int:
+        """Get the number of worker threads running travel package searches."""
+        return EnvConfig.get_int("SEARCH_WORKERS", 8)
+
+    @property
+    def search_max_queue(self) -> int:
+        """Get the maximum number of searches waiting for a worker."""
+        return EnvConfig.get_int("SEARCH_MAX_QUEUE", 64)
+
+    @property
+    def search_queue_slo_seconds(self) -> float:
+        """Get the longest queue wait (seconds) accepted for a search before it is shed."""
+        return EnvConfig.get_float("SEARCH_QUEUE_SLO_SECONDS", 1.0)
+
+    @property
+    def search_rate_limit_per_minute(self) -> float:
+        """Get the sustained number of searches allowed per user per minute."""
+        return EnvConfig.get_float("SEARCH_RATE_LIMIT_PER_MINUTE", 120.0)
+
+    @property
+    def search_rate_limit_burst(self) -> int:
+        """Get the number of searches a user may send back to back."""
+        return EnvConfig.get_int("SEARCH_RATE_LIMIT_BURST", 20)
+
+    @property
+    def embedding_timeout_seconds(self) -> float:
+        """Get the deadline (seconds) of each OpenAI embeddings attempt."""
+        return EnvConfig.get_float("EMBEDDING_TIMEOUT_SECONDS", 10.0)
+
+    @property
+    def llm_timeout_seconds(self) -> float:
+        """Get the deadline (seconds) of each OpenAI chat completion attempt."""
+        return EnvConfig.get_float("LLM_TIMEOUT_SECONDS", 60.0)
+
+    @property
+    def supabase_timeout_seconds(self) -> float:
+        """Get the deadline (seconds) of each Supabase request."""
+        return EnvConfig.get_float("SUPABASE_TIMEOUT_SECONDS", 10.0)
+
+    @property
+    def upstream_max_retries(self) -> int:
+        """Get the maximum number of retries of a failed OpenAI or Supabase call."""
+        return EnvConfig.get_int("UPSTREAM_MAX_RETRIES", 2)
+
+    @property
+    def retry_budget_ratio(self) -> float:
+        """Get the retries and hedges allowed per upstream call, across all dependencies."""
+        return EnvConfig.get_float("RETRY_BUDGET_RATIO", 0.1)
+
+    @property
+    def hedging_enabled(self) -> bool:
+        """Check if slow idempotent upstream calls are hedged with a duplicate request."""
+        return EnvConfig.get_int("HEDGING_ENABLED", 1) == 1
+
+    @property
+    def circuit_failure_threshold(self) -> int:
+        """Get the number of consecutive failed calls that opens a dependency's circuit."""
+        return EnvConfig.get_int("CIRCUIT_FAILURE_THRESHOLD", 5)
+
+    @property
+    def circuit_reset_seconds(self) -> float:
+        """Get how long (seconds) an open circuit waits before letting a trial call through."""
+        return EnvConfig.get_float("CIRCUIT_RESET_SECONDS", 30.0)
+
+    @property
+    def embedding_fallback_cache_size(self) -> int:
+        """Get the number of recent embeddings kept to answer while the embeddings API is down."""
+        return EnvConfig.get_int("EMBEDDING_FALLBACK_CACHE_SIZE", 2000)
+
+    @property
+    def embedding_cache_enabled(self) -> bool:
+        """Check if repeated texts are answered from the recent-embeddings cache instead of the API."""
+        return bool(EnvConfig.get_int("EMBEDDING_CACHE_ENABLED", 1))
+
+    @property
+    def embedding_cache_size(self) -> int:
+        """Get the number of recent embeddings kept (defaults to EMBEDDING_FALLBACK_CACHE_SIZE)."""
+        return EnvConfig.get_int("EMBEDDING_CACHE_SIZE", self.embedding_fallback_cache_size)
+
+    @property
+    def recommendations_enabled(self) -> bool:
+        """Check if searches matching a user's saved preferences are served from materialized recommendations (local search backend only)."""
+        return EnvConfig.get_int("RECOMMENDATIONS_ENABLED", 0) == 1 and self.travel_search_backend == "local"
+
+    @property
+    def recommendations_top_n(self) -> int:
+        """Get the number of packages materialized per user."""
+        return EnvConfig.get_int("RECOMMENDATIONS_TOP_N", 50)
+
+    @property
+    def recommendations_refresh_seconds(self) -> float:
+        """Get the longest interval (seconds) between checks for stale materialized recommendations."""
+        return EnvConfig.get_float("RECOMMENDATIONS_REFRESH_SECONDS", 30.0)
+
+    @property
+    def recommendations_max_users(self) -> int:
+        """Get the maximum number of users whose recommendations are kept in memory."""
+        return EnvConfig.get_int("RECOMMENDATIONS_MAX_USERS", 10000)
+
+    @property
+    def recommendations_profile_path(self) -> str:
+        """Get the SQLite file of saved preferences shared by all workers (empty keeps them per process)."""
+        return EnvConfig.get("RECOMMENDATIONS_PROFILE_PATH", ".cache/saved_profiles.sqlite3")
+
+    @property
+    def location_prefilter_enabled(self) -> bool:
+        """Check if in-process travel package searches only score packages at the locations named in the location preference."""
+        return EnvConfig.get_int("LOCATION_PREFILTER_ENABLED", 1) == 1
+
+    @property
+    def location_table(self) -> str:
+        """Get the table the location gazetteer is built from."""
+        return EnvConfig.get("LOCATION_TABLE", "locations")
+
+    @property
+    def dedup_enabled(self) -> bool:
+        """Check if near-duplicate travel packages are collapsed in search results."""
+        return EnvConfig.get_int("DEDUP_ENABLED", 1) == 1
+
+    @property
+    def dedup_similarity_threshold(self) -> float:
+        """Get the mean criterion cosine similarity at or above which two packages are duplicates."""
+        return EnvConfig.get_float("DEDUP_SIMILARITY_THRESHOLD", 0.97)
+
+    @property
+    def dedup_max_overfetch(self) -> float:
+        """Get the maximum number of candidates fetched per requested package when collapsing duplicates."""
+        return EnvConfig.get_float("DEDUP_MAX_OVERFETCH", 2.0)
+
+    @property
+    def process_pool_workers(self) -> int:
+        """Get the number of worker processes for batch scoring and ingestion (0 to run them in-process)."""
+        return EnvConfig.get_int("PROCESS_POOL_WORKERS", 0)
+
+    @property
+    def process_pool_start_method(self) -> str:
+        """Get the multiprocessing start method of the worker processes."""
+        return EnvConfig.get("PROCESS_POOL_START_METHOD", "spawn")
+
+    @property
+    def ingest_chunk_size(self) -> int:
+        """Get the number of travel_packages rows parsed per worker task during ingestion."""
+        return EnvConfig.get_int("INGEST_CHUNK_SIZE", 2000)
+
+    @property
+    def query_log_path(self) -> str:
+        """Get the file /ask and /search-travel-packages requests are captured to (empty to disable capture)."""
+        return EnvConfig.get("QUERY_LOG_PATH", "")
+
+    @property
+    def query_log_sample_rate(self) -> float:
+        """Get the share of requests written to the query log."""
+        return EnvConfig.get_float("QUERY_LOG_SAMPLE_RATE", 1.0)
+
+    @property
+    def query_log_max_bytes(self) -> int:
+        """Get the size at which the query log is rotated."""
+        return EnvConfig.get_int("QUERY_LOG_MAX_BYTES", 50 * 1024 * 1024)
+
+    @property
+    def query_log_backups(self) -> int:
+        """Get the number of rotated query log files kept."""
+        return EnvConfig.get_int("QUERY_LOG_BACKUPS", 5)
+
+    @property
+    def query_log_salt(self) -> str:
+        """Get the key users are pseudonymized with in the query log (required when QUERY_LOG_PATH is set)."""
+        return EnvConfig.get("QUERY_LOG_SALT", "")
+
+    @property
+    def embedding_warmup_enabled(self) -> bool:
+        """Check if frequent preference strings are embedded at startup, before the worker reports ready."""
+        return bool(EnvConfig.get_int("EMBEDDING_WARMUP_ENABLED", 1))
+
+    @property
+    def embedding_warmup_query_log(self) -> str:
+        """Get the query log the warm-up reads frequent preference strings from (defaults to QUERY_LOG_PATH)."""
+        return EnvConfig.get("EMBEDDING_WARMUP_QUERY_LOG", self.query_log_path)
+
+    @property
+    def embedding_warmup_curated_path(self) -> str:
+        """Get a file of extra preference strings to warm up, one per line."""
+        return EnvConfig.get("EMBEDDING_WARMUP_CURATED_PATH", "")
+
+    @property
+    def embedding_warmup_max_texts(self) -> int:
+        """Get the maximum number of preference strings embedded by the warm-up."""
+        return EnvConfig.get_int("EMBEDDING_WARMUP_MAX_TEXTS", 2000)
+
+    @property
+    def embedding_warmup_timeout_seconds(self) -> float:
+        """Get the longest the warm-up may delay readiness."""
+        return EnvConfig.get_float("EMBEDDING_WARMUP_TIMEOUT_SECONDS", 30.0)
+
+    @property
+    def metrics_enabled(self) -> bool:
+        """Check if per-stage latency metrics are recorded and served on /metrics."""
+        return bool(EnvConfig.get_int("METRICS_ENABLED", 1))
+
+    @property
+    def otel_exporter_endpoint(self) -> Optional[str]:
+        """Get the OTLP/HTTP collector endpoint for trace export (disabled if unset)."""
+        return EnvConfig.get("OTEL_EXPORTER_OTLP_ENDPOINT")
+
+    @property
+    def otel_service_name(self) -> str:
+        """Get the service name reported with exported traces."""
+        return EnvConfig.get("OTEL_SERVICE_NAME", "travel-buddy")
+
+    @property
+    def log_format(self) -> str:
+        """Get the log output format: "json" for structured records or "text"."""
+        return EnvConfig.get("LOG_FORMAT", "json")
+
+    @property
+    def log_debug_sample_rate(self) -> float:
+        """Get the fraction of debug-level payload dumps that are actually logged."""
+        return EnvConfig.get_float("LOG_DEBUG_SAMPLE_RATE", 0.01)
+
     @property
     def jwt_private_key(self) -> str:
         """Get the JWT private key for password encryption."""
@@ -32,6 +32,7 @@ def get_supabase_client(auth_header=None):
             credentials["key"], 
             options=ClientOptions(
                 headers={"Authorization": auth_header},
+                postgrest_client_timeout=config.supabase_timeout_seconds,
                 # schema="dummy_schema",
             )
         )
@@ -39,7 +40,27 @@ def get_supabase_client(auth_header=None):
     return create_client(
         credentials["url"], 
         credentials["key"],
-        # options=ClientOptions(
-        #     schema="dummy_schema",
-        # )
-    ) 
\ No newline at end of file
+        options=ClientOptions(
+            postgrest_client_timeout=config.supabase_timeout_seconds,
+            # schema="dummy_schema",
+        )
+    )
+
+
+def get_service_supabase_client():
+    """
+    Create a Supabase client authenticated with the service key (SUPABASE_SERVICE_KEY).
+
+    Used to load data shared by all users (the travel package catalog, the
+    location gazetteer, the meeting engine): what is loaded must not depend
+    on which user's token happened to trigger the load, and must not fail
+    when that token expires. Never use it to answer a user's request directly.
+
+    Returns:
+        Client: A Supabase client instance.
+    """
+    return create_client(
+        config.supabase_url,
+        config.supabase_service_key,
+        options=ClientOptions(postgrest_client_timeout=config.supabase_timeout_seconds)
+    )
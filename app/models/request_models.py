@@ -1,7 +1,32 @@
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, Field, validator
 from typing import Any, Dict, Optional, Union, List
+from functools import lru_cache
 import ast
 
+# Largest page a search request may ask for
+MAX_MATCH_COUNT = 100
+
+
+@lru_cache(maxsize=4096)
+def _parse_highlights_string(v: str) -> Any:
+    """Parse a string representation of a highlights list (cached per distinct value, lists as tuples)."""
+    try:
+        # Handle string representation of list
+        value = ast.literal_eval(v)
+    except (ValueError, SyntaxError):
+        # If the string is not a valid Python literal, split by comma
+        return tuple(x.strip() for x in v.strip('[]').split(','))
+    return tuple(value) if isinstance(value, list) else value
+
+
+def parse_highlights_value(v: Any) -> Any:
+    """Normalize a raw highlights column value into a list of strings."""
+    if isinstance(v, str):
+        parsed = _parse_highlights_string(v)
+        # A fresh list per call: the cached tuple is shared by every row with this value
+        return list(parsed) if isinstance(parsed, tuple) else parsed
+    return v
+
 
 class QueryRequest(BaseModel):
     """Request model for the /ask endpoint."""
@@ -31,14 +56,26 @@ class TravelPackage(BaseModel):
 
     @validator('highlights', pre=True)
     def parse_highlights(cls, v):
-        if isinstance(v, str):
-            try:
-                # Handle string representation of list
-                return ast.literal_eval(v)
-            except (ValueError, SyntaxError):
-                # If the string is not a valid Python literal, split by comma
-                return [x.strip() for x in v.strip('[]').split(',')]
-        return v
+        return parse_highlights_value(v)
+
+
+def _model_field_names(model) -> List[str]:
+    """Get the field names of a model (works for Pydantic v1 and v2)."""
+    fields = getattr(model, 'model_fields', None) or model.__fields__
+    return list(fields)
+
+
+def _model_required_field_names(model) -> List[str]:
+    """Get the required field names of a model (works for Pydantic v1 and v2)."""
+    fields = getattr(model, 'model_fields', None)
+    if fields is not None:
+        return [name for name, field_info in fields.items() if field_info.is_required()]
+    return [name for name, field in model.__fields__.items() if field.required]
+
+
+# Field schema of TravelPackage, computed once for the response path
+TRAVEL_PACKAGE_FIELDS = _model_field_names(TravelPackage)
+TRAVEL_PACKAGE_REQUIRED_FIELDS = frozenset(_model_required_field_names(TravelPackage))
 
 
 class TravelPackageSearchRequest(BaseModel):
@@ -51,19 +88,44 @@ class TravelPackageSearchRequest(BaseModel):
     food_input: str = ""
     activities_input: str = ""
     notes_input: str = ""
-    match_count: Optional[int] = 10
+    match_count: Optional[int] = Field(10, ge=1, le=MAX_MATCH_COUNT)
+    # Cursor from a previous response's next_cursor; when set, the preference
+    # fields are ignored and the next page of that search is returned
+    cursor: Optional[str] = None
 
-    @validator('*', pre=True)
-    def empty_string_to_none(cls, v, field):
-        if field.name == 'match_count':
-            return v
+    @validator('location_input', 'duration_input', 'budget_input', 'transportation_input',
+               'accommodation_input', 'food_input', 'activities_input', 'notes_input', pre=True)
+    def none_to_empty_string(cls, v):
         return v if v is not None else ""
 
 
+class SavedPreferencesRequest(BaseModel):
+    """Request model for the /preferences endpoint."""
+    location_input: str = ""
+    duration_input: str = ""
+    budget_input: str = ""
+    transportation_input: str = ""
+    accommodation_input: str = ""
+    food_input: str = ""
+    activities_input: str = ""
+    notes_input: str = ""
+
+    @validator('location_input', 'duration_input', 'budget_input', 'transportation_input',
+               'accommodation_input', 'food_input', 'activities_input', 'notes_input', pre=True)
+    def none_to_empty_string(cls, v):
+        return v if v is not None else ""
+
+
+class TravelPackageBatchSearchRequest(BaseModel):
+    """Request model for the /search-travel-packages/batch endpoint."""
+    requests: List[TravelPackageSearchRequest]
+
+
 class TravelPackageSearchResponse(BaseModel):
     """Response model for the /search-travel-packages endpoint."""
     packages: List[TravelPackage]
     total_count: int
+    next_cursor: Optional[str] = None
 
 
 class APIResponse(BaseModel):
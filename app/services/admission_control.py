@@ -0,0 +1,309 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from app.config.env_config import config
+from app.telemetry.metrics import ADMISSION_DECISIONS, ADMISSION_QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a streamed generator (next() default)
+_END = object()
+
+
+class AdmissionRejectedError(Exception):
+    """A request was refused before doing any work; retry after retry_after seconds."""
+
+    def __init__(self, status_code: int, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After value in whole seconds (at least 1)."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate tokens per second, holding at most burst tokens."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_acquire(self, now: Optional[float] = None) -> float:
+        """
+        Take one token if available.
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until one is available.
+        """
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class RateLimiter:
+    """
+    Per-user token buckets.
+
+    Buckets are kept in LRU order and bounded to max_users; an evicted user
+    simply starts again with a full bucket.
+    """
+
+    def __init__(self, per_minute: float, burst: int, max_users: int = 10000):
+        """
+        Args:
+            per_minute: Sustained requests per minute allowed per user.
+            burst: Requests a user can make back to back.
+            max_users: Maximum number of buckets kept in memory.
+        """
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, user_key: str) -> float:
+        """
+        Charge one request to a user.
+
+        Args:
+            user_key: Identity of the caller (their user ID, not a token they could rotate).
+
+        Returns:
+            0 if the request is allowed, otherwise the seconds until it would be.
+        """
+        with self._lock:
+            bucket = self._buckets.get(user_key)
+            if bucket is None:
+                bucket = self._buckets[user_key] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_users:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(user_key)
+            return bucket.try_acquire()
+
+
+class AdmissionController:
+    """
+    Admission control for one class of requests with its own worker pool.
+
+    A request is rejected up front, without queueing, when the caller is
+    over their rate limit (429), the pool's queue is full (503), or the
+    estimated queue wait (queued requests ahead x average service time /
+    workers) exceeds the SLO (503). Requests whose wait still overran the
+    SLO by the time a worker picks them up are dropped instead of run.
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_workers: int,
+                 max_queue: int,
+                 slo_seconds: float,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 enabled: bool = True):
+        """
+        Args:
+            name: Pool name, used in metrics and thread names.
+            max_workers: Worker threads of the pool.
+            max_queue: Maximum requests waiting for a worker.
+            slo_seconds: Maximum acceptable queue wait.
+            rate_limiter: Per-user limiter for this class of requests.
+            enabled: If False, requests are only run on the pool (no limits).
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.slo_seconds = slo_seconds
+        self.rate_limiter = rate_limiter
+        self.enabled = enabled
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._avg_service_seconds = 0.0
+        self.rejected: Dict[str, int] = {}
+
+    def estimated_wait(self) -> float:
+        """Seconds a request admitted now is expected to wait for a worker."""
+        ahead = self._pending - self.max_workers + 1
+        if ahead <= 0:
+            return 0.0
+        return ahead * self._avg_service_seconds / self.max_workers
+
+    def _reject(self, outcome: str, status_code: int, retry_after: float, detail: str):
+        self.rejected[outcome] = self.rejected.get(outcome, 0) + 1
+        if config.metrics_enabled:
+            ADMISSION_DECISIONS.labels(self.name, outcome).inc()
+        raise AdmissionRejectedError(status_code, retry_after, detail)
+
+    def admit(self, user_key: Optional[str] = None):
+        """
+        Decide whether a request may be queued, and reserve its place if so.
+
+        Raises:
+            AdmissionRejectedError: If the request must be rejected.
+        """
+        if not self.enabled:
+            with self._lock:
+                self._pending += 1
+            return
+        if self.rate_limiter is not None and user_key:
+            retry_after = self.rate_limiter.check(user_key)
+            if retry_after > 0:
+                self._reject("rate_limited", 429, retry_after, "Too many requests, please slow down")
+        with self._lock:
+            if self._pending - self.max_workers >= self.max_queue:
+                retry_after = self.estimated_wait() or self.slo_seconds
+                self._reject("queue_full", 503, retry_after, "Server is busy, please retry shortly")
+            wait = self.estimated_wait()
+            if wait > self.slo_seconds:
+                self._reject("shed", 503, wait - self.slo_seconds, "Server is busy, please retry shortly")
+            self._pending += 1
+        if config.metrics_enabled:
+            ADMISSION_DECISIONS.labels(self.name, "admitted").inc()
+
+    async def run(self, user_key: Optional[str], fn: Callable[..., Any], *args) -> Any:
+        """
+        Admit a request and run fn(*args) on this pool.
+
+        Args:
+            user_key: Identity of the caller for rate limiting (None to skip it).
+            fn: The blocking function to run.
+            args: Arguments for fn.
+
+        Returns:
+            The result of fn.
+
+        Raises:
+            AdmissionRejectedError: If the request was rejected or expired in the queue.
+        """
+        self.admit(user_key)
+        queued_at = time.monotonic()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._execute, queued_at, fn, args)
+
+    async def stream(self, user_key: Optional[str], fn: Callable[..., Iterator[Any]], *args) -> AsyncIterator[Any]:
+        """
+        Admit a streamed request and iterate the generator fn(*args) on this pool.
+
+        Each item is produced on a worker thread, so nothing blocks the event
+        loop, and the request keeps its admission slot until the stream is
+        exhausted or closed (e.g. the client disconnects).
+
+        Args:
+            user_key: Identity of the caller for rate limiting (None to skip it).
+            fn: Function returning the (blocking) generator to stream.
+            args: Arguments for fn.
+
+        Returns:
+            An async iterator over the generator's items.
+
+        Raises:
+            AdmissionRejectedError: If the request was rejected or expired in the
+                queue; raised here, before any item is produced.
+        """
+        self.admit(user_key)
+        queued_at = time.monotonic()
+        loop = asyncio.get_running_loop()
+        items, started = await loop.run_in_executor(self.executor, self._start_stream, queued_at, fn, args)
+        return self._iterate(items, started)
+
+    def _start_stream(self, queued_at: float, fn: Callable[..., Iterator[Any]], args: tuple):
+        started = self._begin(queued_at)
+        try:
+            return iter(fn(*args)), started
+        except BaseException:
+            self._finish(started)
+            raise
+
+    async def _iterate(self, items: Iterator[Any], started: float) -> AsyncIterator[Any]:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                item = await loop.run_in_executor(self.executor, next, items, _END)
+                if item is _END:
+                    return
+                yield item
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except ValueError:
+                    # Still running on a worker (the stream was cancelled mid-item); it ends with that item
+                    pass
+            self._finish(started)
+
+    def _execute(self, queued_at: float, fn: Callable[..., Any], args: tuple) -> Any:
+        started = self._begin(queued_at)
+        try:
+            return fn(*args)
+        finally:
+            self._finish(started)
+
+    def _begin(self, queued_at: float) -> float:
+        """Start an admitted request on a worker, dropping it if it waited past the SLO."""
+        started = time.monotonic()
+        waited = started - queued_at
+        if config.metrics_enabled:
+            ADMISSION_QUEUE_WAIT.labels(self.name).observe(waited)
+        if self.enabled and waited > self.slo_seconds:
+            with self._lock:
+                self._pending -= 1
+            # The caller has been waiting past the SLO; free the worker for fresher requests
+            self._reject("expired", 503, self.estimated_wait(), "Server is busy, please retry shortly")
+        return started
+
+    def _finish(self, started: float):
+        """Release a request's slot and fold its service time into the average."""
+        service = time.monotonic() - started
+        with self._lock:
+            self._pending -= 1
+            self._avg_service_seconds = (
+                service if self._avg_service_seconds == 0.0
+                else 0.8 * self._avg_service_seconds + 0.2 * service
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the queue depth, average service time, estimated wait and rejection counts."""
+        return {
+            "pending": self._pending,
+            "queued": max(0, self._pending - self.max_workers),
+            "avg_service_ms": round(self._avg_service_seconds * 1000, 2),
+            "estimated_wait_ms": round(self.estimated_wait() * 1000, 2),
+            "rejected": dict(self.rejected),
+        }
+
+
+# Long agent conversations and cheap searches get separate pools, so a burst
+# of /ask traffic cannot starve searches of worker threads
+ask_admission = AdmissionController(
+    "ask",
+    max_workers=config.ask_workers,
+    max_queue=config.ask_max_queue,
+    slo_seconds=config.ask_queue_slo_seconds,
+    rate_limiter=RateLimiter(config.ask_rate_limit_per_minute, config.ask_rate_limit_burst),
+    enabled=config.admission_control_enabled,
+)
+search_admission = AdmissionController(
+    "search",
+    max_workers=config.search_workers,
+    max_queue=config.search_max_queue,
+    slo_seconds=config.search_queue_slo_seconds,
+    rate_limiter=RateLimiter(config.search_rate_limit_per_minute, config.search_rate_limit_burst),
+    enabled=config.admission_control_enabled,
+)
@@ -0,0 +1,185 @@
+import logging
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config.env_config import config
+from app.services.embeddings import EmbeddingService
+from app.services.process_pool import (
+    get_process_pool,
+    release_index,
+    reset_process_pool,
+    score_chunk,
+    share_index,
+)
+from app.services.result_dedup import near_duplicate_collapser
+from app.telemetry.metrics import span
+from app.tools.search.search_tools import preference_text
+from app.vectorstore.location_gazetteer import LocationGazetteer
+from app.vectorstore.travel_package_index import (
+    TRAVEL_PACKAGE_CRITERIA,
+    TravelPackageIndex,
+    normalize_rows,
+)
+
+
+class BatchTravelPackageSearch:
+    """
+    Search the travel package catalog for many preference profiles at once.
+
+    All preference strings across the profiles are deduplicated and embedded
+    in a few batched API calls, then profiles are scored against the
+    in-process catalog index chunk by chunk with matrix operations.
+    """
+
+    def __init__(self,
+                 embedding_service: EmbeddingService,
+                 index: TravelPackageIndex,
+                 chunk_size: int = 256,
+                 embedding_batch_size: int = 256,
+                 gazetteer: Optional[LocationGazetteer] = None):
+        """
+        Args:
+            embedding_service: Service used to embed the distinct preference strings.
+            index: The in-process catalog index to score against.
+            chunk_size: Number of profiles scored per matrix operation.
+            embedding_batch_size: Maximum number of texts per embeddings call.
+            gazetteer: If given, profiles naming known places are ranked only among
+                packages at those locations, as single local searches are.
+        """
+        self.embedding_service = embedding_service
+        self.index = index
+        self.gazetteer = gazetteer
+        self.chunk_size = max(1, chunk_size)
+        self.embedding_batch_size = max(1, embedding_batch_size)
+        self.logger = logging.getLogger(__name__)
+
+    def embed_profiles(self, profiles: Sequence[Dict[str, str]]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Embed the distinct preference texts of all profiles.
+
+        Args:
+            profiles: One dict per profile mapping each criterion to its preference input.
+
+        Returns:
+            The normalized (U, d) embedding matrix of the distinct texts, and per
+            criterion a (P,) array of row indices into it.
+        """
+        text_rows: Dict[str, int] = {}
+        text_ids = {criterion: np.empty(len(profiles), dtype=np.int64) for criterion in TRAVEL_PACKAGE_CRITERIA}
+        for row, profile in enumerate(profiles):
+            for criterion in TRAVEL_PACKAGE_CRITERIA:
+                text = preference_text(profile.get(criterion))
+                text_ids[criterion][row] = text_rows.setdefault(text, len(text_rows))
+
+        texts = list(text_rows)
+        vectors = []
+        with span("batch_search.embed", texts=len(texts)):
+            for start in range(0, len(texts), self.embedding_batch_size):
+                vectors.extend(self.embedding_service.get_embeddings(texts[start:start + self.embedding_batch_size]))
+        self.logger.info(f"Embedded {len(texts)} distinct preference texts for {len(profiles)} profiles")
+
+        if not vectors:
+            return np.zeros((0, self.index.dimensions), dtype=np.float32), text_ids
+        return normalize_rows(np.asarray(vectors, dtype=np.float32)), text_ids
+
+    def search(self,
+               profiles: Sequence[Dict[str, str]],
+               match_counts: Sequence[int]) -> Iterator[Tuple[int, List[Dict]]]:
+        """
+        Rank the catalog for every profile, yielding results as each chunk is scored.
+
+        Args:
+            profiles: One dict per profile mapping each criterion to its preference input.
+            match_counts: Number of packages to return for each profile.
+
+        Yields:
+            (profile position, ranked packages with combined_score), in profile order.
+        """
+        text_vectors, text_ids = self.embed_profiles(profiles)
+        pool = get_process_pool() if self.index.size else None
+        chunks = [(start, min(start + self.chunk_size, len(profiles))) for start in range(0, len(profiles), self.chunk_size)]
+
+        if pool is None:
+            for start, end in chunks:
+                with span("batch_search.score", profiles=end - start):
+                    scored = score_chunk(self.index, *self._chunk_args(text_vectors, text_ids, profiles,
+                                                                       match_counts, start, end))
+                    ranked = self._packages(scored, match_counts[start:end])
+                for offset, packages in enumerate(ranked):
+                    yield start + offset, packages
+            return
+
+        # Workers attach the matrices by handle; only each chunk's own text vectors are pickled.
+        # The handle keeps the index's shared memory alive until this batch is done with it.
+        handle = share_index(self.index)
+        futures = []
+        try:
+            futures = [
+                pool.submit(score_chunk, handle, *self._chunk_args(text_vectors, text_ids, profiles,
+                                                                   match_counts, start, end))
+                for start, end in chunks
+            ]
+            for (start, end), future in zip(chunks, futures):
+                with span("batch_search.score", profiles=end - start):
+                    try:
+                        scored = future.result()
+                    except BrokenProcessPool:
+                        self.logger.error("A scoring worker process died; scoring the rest of the batch in-process")
+                        reset_process_pool()
+                        scored = score_chunk(self.index, *self._chunk_args(text_vectors, text_ids, profiles,
+                                                                           match_counts, start, end))
+                    except FileNotFoundError:
+                        # The snapshot files behind the index were removed
+                        self.logger.warning("A scoring worker could not attach the catalog index; scoring in-process")
+                        scored = score_chunk(self.index, *self._chunk_args(text_vectors, text_ids, profiles,
+                                                                           match_counts, start, end))
+                    ranked = self._packages(scored, match_counts[start:end])
+                for offset, packages in enumerate(ranked):
+                    yield start + offset, packages
+        finally:
+            # A closed stream leaves no work behind in the pool
+            for future in futures:
+                future.cancel()
+            release_index(handle)
+
+    def _chunk_args(self,
+                    text_vectors: np.ndarray,
+                    text_ids: Dict[str, np.ndarray],
+                    profiles: Sequence[Dict[str, str]],
+                    match_counts: Sequence[int],
+                    start: int,
+                    end: int) -> tuple:
+        """Arguments of score_chunk (after the index) for profiles[start:end]."""
+        chunk_ids = {criterion: ids[start:end] for criterion, ids in text_ids.items()}
+        # Keep only the texts this chunk uses, renumbered
+        used = np.unique(np.concatenate(list(chunk_ids.values())))
+        chunk_ids = {criterion: np.searchsorted(used, ids) for criterion, ids in chunk_ids.items()}
+        counts = match_counts[start:end]
+        if config.dedup_enabled:
+            fetch_counts = [near_duplicate_collapser.max_fetch_count(count) for count in counts]
+            threshold = near_duplicate_collapser.threshold
+        else:
+            fetch_counts, threshold = list(counts), None
+        candidate_rows = [
+            self.index.candidate_rows(self.gazetteer.resolve(profile.get("location")), count)
+            if self.gazetteer is not None else None
+            for profile, count in zip(profiles[start:end], counts)
+        ]
+        return (text_vectors[used], chunk_ids, fetch_counts, counts, candidate_rows, threshold,
+                near_duplicate_collapser.block_size)
+
+    def _packages(self, scored: Sequence[Tuple], match_counts: Sequence[int]) -> List[List[Dict]]:
+        """Turn score_chunk results into package rows (collapsing duplicates if they were grouped)."""
+        results = []
+        for (rows, scores, dedup), match_count in zip(scored, match_counts):
+            packages = [
+                dict(self.index.packages[int(row)], combined_score=float(score))
+                for row, score in zip(rows, scores)
+            ]
+            if dedup is None:
+                results.append(packages[:match_count])
+            else:
+                results.append(near_duplicate_collapser.build(packages, *dedup))
+        return results
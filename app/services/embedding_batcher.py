@@ -0,0 +1,178 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class EmbeddingBatcher:
+    """
+    Background micro-batcher for embedding requests.
+
+    Texts submitted from any thread are collected for up to `max_wait_ms`
+    (or until `max_batch_size` texts are queued) and sent to the embeddings
+    API as one combined call. Results are fanned back out to each caller's
+    future. Identical texts that are queued or in flight share one future.
+    """
+
+    def __init__(self,
+                 embed_fn: Callable[[List[str], str], List[List[float]]],
+                 max_batch_size: int = 256,
+                 max_wait_ms: float = 10,
+                 max_concurrency: int = 4,
+                 result_timeout_seconds: Optional[float] = None):
+        """
+        Args:
+            embed_fn: Function that embeds a list of texts with a model in one API call.
+            max_batch_size: Maximum number of texts sent in one API call.
+            max_wait_ms: How long the first queued text may wait for others to join its batch.
+            max_concurrency: Maximum number of embedding API calls in flight at once.
+            result_timeout_seconds: Longest `embed` waits for its vectors; None waits indefinitely.
+        """
+        self.embed_fn = embed_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_concurrency = max(1, max_concurrency)
+        self.result_timeout = result_timeout_seconds
+        self.logger = logging.getLogger(__name__)
+
+        self._queue: "queue.Queue[Tuple[str, str, float]]" = queue.Queue()
+        self._pending: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="embedding-batch"
+        )
+
+        self.requests = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str, model: str) -> Future:
+        """
+        Queue a text for embedding.
+
+        Args:
+            text: The text to embed.
+            model: The embedding model to use.
+
+        Returns:
+            A future resolving to the embedding vector.
+        """
+        key = (model, text)
+        with self._lock:
+            self.requests += 1
+            future = self._pending.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = Future()
+            self._pending[key] = future
+        self._queue.put((model, text, time.monotonic()))
+        return future
+
+    def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        """
+        Embed several texts through the batcher and wait for all of them.
+
+        Raises:
+            TimeoutError: If the vectors are not ready within `result_timeout_seconds`.
+        """
+        futures = [self.submit(text, model) for text in texts]
+        if self.result_timeout is None:
+            return [future.result() for future in futures]
+        deadline = time.monotonic() + self.result_timeout
+        return [future.result(timeout=max(0.0, deadline - time.monotonic())) for future in futures]
+
+    def _run(self):
+        """Collect queued texts into batches and dispatch them."""
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = first[2] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Never have more than max_concurrency API calls running. Texts that
+            # arrive while we wait for a slot join this batch, up to its limit.
+            self._slots.acquire()
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch: List[Tuple[str, str, float]]):
+        """Send one batch to the API and resolve the callers' futures."""
+        try:
+            dispatched_at = time.monotonic()
+            by_model: Dict[str, List[str]] = {}
+            with self._lock:
+                for model, text, enqueued_at in batch:
+                    by_model.setdefault(model, []).append(text)
+                    delay = dispatched_at - enqueued_at
+                    self.queue_delay_total += delay
+                    self.queue_delay_max = max(self.queue_delay_max, delay)
+                self.batches += len(by_model)
+                self.batched_texts += len(batch)
+
+            for model, texts in by_model.items():
+                try:
+                    vectors = self.embed_fn(texts, model)
+                except Exception as e:
+                    self.logger.warning(f"Embedding batch of {len(texts)} texts failed: {e}")
+                    for text in texts:
+                        self._resolve((model, text), exception=e)
+                    continue
+                if len(vectors) != len(texts):
+                    error = RuntimeError(f"Embeddings API returned {len(vectors)} vectors for {len(texts)} texts")
+                    self.logger.warning(f"Embedding batch failed: {error}")
+                    for text in texts:
+                        self._resolve((model, text), exception=error)
+                    continue
+                for text, vector in zip(texts, vectors):
+                    self._resolve((model, text), result=vector)
+        finally:
+            self._slots.release()
+
+    def _resolve(self, key: Tuple[str, str], result=None, exception: Exception = None):
+        """Complete and forget the pending future for a key."""
+        with self._lock:
+            future = self._pending.pop(key, None)
+        if future is None:
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> Dict[str, float]:
+        """Return batching counters, average batch fill and queueing delay."""
+        batches = self.batches
+        texts = self.batched_texts
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "batches": batches,
+            "batched_texts": texts,
+            "avg_batch_size": texts / batches if batches else 0.0,
+            "avg_batch_fill": texts / (batches * self.max_batch_size) if batches else 0.0,
+            "avg_queue_delay_ms": 1000.0 * self.queue_delay_total / texts if texts else 0.0,
+            "max_queue_delay_ms": 1000.0 * self.queue_delay_max,
+            "queued": self._queue.qsize(),
+        }
@@ -0,0 +1,165 @@
+"""
+Startup warm-up of the embedding cache.
+
+After a deploy every preference string is a cache miss, so the first wave
+of searches pays the full embeddings API latency on all eight fields. The
+warm-up counts the preference strings of the query log (QUERY_LOG_PATH, or
+EMBEDDING_WARMUP_QUERY_LOG) and of a curated list, and batch-embeds the
+most frequent ones into the embedding cache before the worker reports
+ready. Readiness never waits longer than EMBEDDING_WARMUP_TIMEOUT_SECONDS;
+the warm-up is best effort and a failure only means a colder start.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from app.agent.preference_extractor import PREFERENCE_SLOTS, PreferenceExtractor
+from app.config.env_config import config
+from app.services.embeddings import get_embedding_service
+from app.telemetry.query_log import read_query_log
+from app.tools.search.search_tools import EMPTY_PREFERENCE_TEXT, preference_text
+
+logger = logging.getLogger(__name__)
+
+
+def count_preference_texts(query_log_path: str = "", curated_path: str = "") -> Counter:
+    """
+    Count the preference strings searches would embed.
+
+    Search requests contribute their preference inputs. /ask messages
+    contribute the slots the fast path would extract from them. Curated
+    strings count once more than the most frequent logged string, so they
+    are always warmed first.
+
+    Args:
+        query_log_path: A query log (its rotated files are read too), or "".
+        curated_path: A file with one preference string per line, or "".
+
+    Returns:
+        Preference text -> number of occurrences, after the normalization searches apply.
+    """
+    counts: Counter = Counter()
+    if query_log_path:
+        extractor = PreferenceExtractor()
+        for entry in read_query_log(query_log_path):
+            request = entry.get("request") or {}
+            if entry.get("endpoint") == "/ask":
+                request = extractor.extract(request.get("query") or "")
+            for slot in PREFERENCE_SLOTS:
+                counts[preference_text(request.get(slot))] += 1
+
+    if curated_path:
+        with open(curated_path, encoding="utf-8") as f:
+            curated = [line.strip() for line in f if line.strip()]
+        top = max(counts.values(), default=0) + 1
+        for text in curated:
+            counts[preference_text(text)] = top
+    # Searches always need it, whatever the log holds
+    counts[EMPTY_PREFERENCE_TEXT] = max(counts.values(), default=0) + 1
+    return counts
+
+
+class EmbeddingWarmup:
+    """Runs the warm-up on a background thread and answers the readiness probe."""
+
+    def __init__(self, max_texts: int = 2000, timeout_seconds: float = 30.0, batch_size: int = 256):
+        """
+        Args:
+            max_texts: Maximum number of preference strings embedded.
+            timeout_seconds: Longest the warm-up may delay readiness.
+            batch_size: Texts per embeddings call.
+        """
+        self.max_texts = max_texts
+        self.timeout_seconds = timeout_seconds
+        self.batch_size = max(1, batch_size)
+        self._started_at: Optional[float] = None
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.state = "pending"
+        self.candidates = 0
+        self.embedded = 0
+        self.duration_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the worker may report ready (warm-up finished, failed or out of time)."""
+        if self._done.is_set():
+            return True
+        return self._started_at is not None and time.monotonic() - self._started_at >= self.timeout_seconds
+
+    def start(self):
+        """Start the warm-up thread (once); readiness is immediate if warm-up is disabled."""
+        if self._started_at is not None:
+            return
+        self._started_at = time.monotonic()
+        if not config.embedding_warmup_enabled or not config.embedding_cache_enabled:
+            self.state = "disabled"
+            self._done.set()
+            return
+        self._thread = threading.Thread(target=self._run, name="embedding-warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.run(config.embedding_warmup_query_log, config.embedding_warmup_curated_path)
+        except Exception as e:
+            self.state = "failed"
+            logger.warning(f"Embedding warm-up failed, starting with a cold cache: {e}")
+        finally:
+            self.duration_seconds = round(time.monotonic() - self._started_at, 3)
+            self._done.set()
+
+    def run(self, query_log_path: str = "", curated_path: str = "") -> int:
+        """
+        Embed the most frequent preference strings not cached yet, until done or out of time.
+
+        Args:
+            query_log_path: Query log to count preference strings in.
+            curated_path: File of extra preference strings, one per line.
+
+        Returns:
+            The number of strings embedded (those already cached are skipped).
+        """
+        self.state = "warming"
+        started = time.monotonic()
+        deadline = (self._started_at or started) + self.timeout_seconds
+        counts = count_preference_texts(query_log_path, curated_path)
+        texts: List[str] = [text for text, _ in counts.most_common(self.max_texts)]
+        self.candidates = len(texts)
+
+        embedding_service = get_embedding_service()
+        for start in range(0, len(texts), self.batch_size):
+            if time.monotonic() >= deadline:
+                self.state = "timed_out"
+                logger.warning(
+                    f"Embedding warm-up stopped at its {self.timeout_seconds}s cap after "
+                    f"{self.embedded} of {len(texts)} strings"
+                )
+                return self.embedded
+            self.embedded += embedding_service.prefill(texts[start:start + self.batch_size])
+
+        self.state = "done"
+        logger.info(
+            f"Embedding warm-up cached {self.embedded} of {len(texts)} frequent strings "
+            f"in {time.monotonic() - started:.1f}s"
+        )
+        return self.embedded
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the warm-up state, string counts and duration."""
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "candidates": self.candidates,
+            "embedded": self.embedded,
+            "duration_seconds": self.duration_seconds,
+        }
+
+
+embedding_warmup = EmbeddingWarmup(
+    max_texts=config.embedding_warmup_max_texts,
+    timeout_seconds=config.embedding_warmup_timeout_seconds,
+    batch_size=config.embedding_batch_max_size,
+)
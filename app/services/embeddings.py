@@ -1,24 +1,198 @@
+import threading
+
+import numpy as np
 from openai import OpenAI
 from app.config.env_config import config
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.resilience import embedding_calls
+from app.telemetry.metrics import span
+from app.utils.lru import LRUCache
+from app.utils.single_flight import SingleFlight
 
 
 class EmbeddingService:
     """Service for generating embeddings from text using OpenAI API."""
-    
+
+    # Shared by every instance so that concurrent requests, each with their own
+    # EmbeddingService, still coalesce identical embedding calls.
+    _inflight = SingleFlight("embeddings")
+    _batcher = None
+    _batcher_lock = threading.Lock()
+    # Recent embeddings: repeated texts skip the API, and while the API is
+    # unavailable they are served as a fallback. Pre-filled at startup by
+    # the embedding warm-up. Vectors are kept as float32 arrays (6 KB for
+    # 1536 dimensions, against about 50 KB as a list of Python floats).
+    _recent = LRUCache(config.embedding_cache_size)
+    _cache_counts = {"hits": 0, "misses": 0}
+    _cache_counts_lock = threading.Lock()
+
     def __init__(self, api_key=None):
         self.api_key = api_key or config.openai_api_key
-        self.client = OpenAI(api_key=self.api_key)
-    
+        # Timeouts and retries are handled by the resilience layer
+        self.client = OpenAI(api_key=self.api_key, timeout=config.embedding_timeout_seconds, max_retries=0)
+
     def get_embedding(self, text, model="text-embedding-3-small"):
         """
         Generate an embedding for the provided text.
-        
+
         Args:
             text (str): The text to generate an embedding for.
             model (str): The embedding model to use.
-            
+
         Returns:
             list: The embedding vector.
         """
-        text = text.replace("\n", " ")
-        return self.client.embeddings.create(input=[text], model=model).data[0].embedding 
\ No newline at end of file
+        return self.get_embeddings([text], model=model)[0]
+
+    def get_embeddings(self, texts, model="text-embedding-3-small"):
+        """
+        Generate embeddings for several texts.
+
+        Texts embedded recently are answered from the embedding cache. For
+        the others, when micro-batching is enabled the texts join the shared
+        batch queue and may be sent together with other callers' texts;
+        otherwise they are sent as one API call of their own.
+
+        Args:
+            texts (list): The texts to generate embeddings for.
+            model (str): The embedding model to use.
+
+        Returns:
+            list: One embedding vector per input text, in input order. Vectors
+            are rounded to float32, whether they came from the cache or the API.
+        """
+        texts = [text.replace("\n", " ") for text in texts]
+        if not config.embedding_cache_enabled:
+            return self._embed_uncached(texts, model)
+
+        found = self._recent.get_many((model, text) for text in texts)
+        missing = list(dict.fromkeys(text for text in texts if (model, text) not in found))
+        with self._cache_counts_lock:
+            self._cache_counts["hits"] += len(texts) - len(missing)
+            self._cache_counts["misses"] += len(missing)
+        if missing:
+            for text, vector in zip(missing, self._embed_uncached(missing, model)):
+                found[(model, text)] = vector
+        return [_as_list(found[(model, text)]) for text in texts]
+
+    def prefill(self, texts, model="text-embedding-3-small"):
+        """
+        Embed the texts that are not cached yet into the embedding cache.
+
+        Used by the startup warm-up; the texts are sent as one API call and do
+        not count as cache lookups.
+
+        Args:
+            texts (list): The texts to cache.
+            model (str): The embedding model to use.
+
+        Returns:
+            int: The number of texts that were embedded.
+        """
+        texts = [text.replace("\n", " ") for text in texts]
+        found = self._recent.get_many((model, text) for text in texts)
+        missing = list(dict.fromkeys(text for text in texts if (model, text) not in found))
+        if missing:
+            self._create_embeddings(missing, model)
+        return len(missing)
+
+    def _embed_uncached(self, texts, model):
+        """Embed texts through the micro-batcher, single-flight or a direct API call."""
+        batcher = self._get_batcher()
+        if batcher is not None:
+            return batcher.embed(texts, model)
+
+        if len(texts) == 1:
+            if not config.single_flight_enabled:
+                return self._create_embeddings(texts, model)
+            return [self._inflight.do((model, texts[0]), self._create_embedding, texts[0], model)]
+
+        unique_texts = list(dict.fromkeys(texts))
+        vectors = dict(zip(unique_texts, self._create_embeddings(unique_texts, model)))
+        return [vectors[text] for text in texts]
+
+    def _create_embedding(self, text, model):
+        """Call the OpenAI embeddings API for a single text."""
+        return self._create_embeddings([text], model)[0]
+
+    def _create_embeddings(self, texts, model):
+        """
+        Call the OpenAI embeddings API once for a list of texts.
+
+        If the API is unavailable, texts embedded recently are answered from
+        the fallback cache.
+        """
+        with span("embeddings.api_call", texts=len(texts)):
+            response = embedding_calls.call(
+                self.client.embeddings.create, input=texts, model=model,
+                fallback=lambda: self._recent_embeddings(texts, model)
+            )
+        if isinstance(response, list):
+            return response
+        vectors = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        for text, vector in zip(texts, vectors):
+            self._recent.put((model, text), np.asarray(vector, dtype=np.float32))
+        return vectors
+
+    def _recent_embeddings(self, texts, model):
+        """Answer from the fallback cache, if every text was embedded recently."""
+        found = self._recent.get_many((model, text) for text in texts)
+        if len(found) < len(texts):
+            raise LookupError(f"{len(texts) - len(found)} of {len(texts)} texts are not cached")
+        return [_as_list(found[(model, text)]) for text in texts]
+
+    def _get_batcher(self):
+        """Return the process-wide micro-batcher, creating it on first use."""
+        if not config.embedding_batching_enabled or self.api_key != config.openai_api_key:
+            return None
+        if EmbeddingService._batcher is None:
+            with EmbeddingService._batcher_lock:
+                if EmbeddingService._batcher is None:
+                    EmbeddingService._batcher = EmbeddingBatcher(
+                        embed_fn=self._create_embeddings,
+                        max_batch_size=config.embedding_batch_max_size,
+                        max_wait_ms=config.embedding_batch_max_wait_ms,
+                        max_concurrency=config.embedding_batch_max_concurrency,
+                        result_timeout_seconds=config.embedding_batch_result_timeout_seconds
+                    )
+        return EmbeddingService._batcher
+
+    @classmethod
+    def coalescing_stats(cls):
+        """Return how many embedding calls were executed and how many were coalesced."""
+        stats = cls._inflight.stats()
+        if cls._batcher is not None:
+            batcher_stats = cls._batcher.stats()
+            stats["calls"] += batcher_stats["requests"]
+            stats["coalesced"] += batcher_stats["coalesced"]
+        return stats
+
+    @classmethod
+    def cache_stats(cls):
+        """Return embedding cache hits, misses and the number of cached texts."""
+        with cls._cache_counts_lock:
+            return dict(cls._cache_counts, entries=len(cls._recent))
+
+    @classmethod
+    def batching_stats(cls):
+        """Return micro-batcher metrics (batch fill, queueing delay), or None if it is not running."""
+        return cls._batcher.stats() if cls._batcher is not None else None
+
+
+def _as_list(vector):
+    """Return an embedding as a list of float32 values, as the embedding cache stores it."""
+    return np.asarray(vector, dtype=np.float32).tolist()
+
+
+_shared_service = None
+_shared_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Return the process-wide EmbeddingService (one OpenAI client for all requests)."""
+    global _shared_service
+    if _shared_service is None:
+        with _shared_service_lock:
+            if _shared_service is None:
+                _shared_service = EmbeddingService()
+    return _shared_service
@@ -0,0 +1,201 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    context_key TEXT,
+    embedding BLOB
+);
+CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used_at);
+DROP INDEX IF EXISTS llm_cache_context;
+CREATE INDEX IF NOT EXISTS llm_cache_context_recent
+    ON llm_cache (context_key, last_used_at) WHERE embedding IS NOT NULL;
+"""
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed cache of LLM chat responses.
+
+    The database runs in WAL mode so several worker processes can read and
+    write the same file concurrently, and entries survive restarts. Entries
+    expire after a TTL and the least recently used ones are evicted when
+    the cache grows past its size limit.
+
+    First-turn entries can also store an embedding of the user message, so a
+    semantically similar first question can reuse the answer. Only the most
+    recently used entries of a context are compared, so a lookup costs the
+    same however many first turns are stored.
+    """
+
+    def __init__(self,
+                 path: str,
+                 ttl_seconds: int = 86400,
+                 max_entries: int = 10000,
+                 evict_every: int = 100,
+                 semantic_candidates: int = 500):
+        """
+        Args:
+            path: SQLite database file (created if missing).
+            ttl_seconds: Age after which entries are no longer served.
+            max_entries: Number of entries kept after eviction.
+            evict_every: Run eviction once every this many writes.
+            semantic_candidates: Number of most recently used first turns compared by get_similar.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.evict_every = max(1, evict_every)
+        self.semantic_candidates = max(1, semantic_candidates)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._counts = {"hits": 0, "semantic_hits": 0, "misses": 0, "writes": 0}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection (sqlite3 connections are not shared between threads)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: The normalized request hash.
+
+        Returns:
+            The serialized response, or None on a miss or if the entry expired.
+        """
+        now = time.time()
+        row = self._connection().execute(
+            "SELECT response FROM llm_cache WHERE key = ? AND created_at >= ?",
+            (key, now - self.ttl_seconds)
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        self._touch(key, now)
+        self._count("hits")
+        return row[0]
+
+    def get_similar(self, context_key: str, embedding: np.ndarray, threshold: float) -> Optional[str]:
+        """
+        Look up a first-turn response whose user message is semantically similar.
+
+        Only the semantic_candidates most recently used entries of the context
+        are scored; a hit refreshes its entry, so popular answers stay in range.
+
+        Args:
+            context_key: Hash of everything except the user message (model, system prompt, tools).
+            embedding: Normalized embedding of the user message.
+            threshold: Minimum cosine similarity for a hit.
+
+        Returns:
+            The serialized response of the most similar entry, or None.
+        """
+        now = time.time()
+        rows = self._connection().execute(
+            "SELECT key, response, embedding FROM llm_cache "
+            "WHERE context_key = ? AND embedding IS NOT NULL AND created_at >= ? "
+            "ORDER BY last_used_at DESC LIMIT ?",
+            (context_key, now - self.ttl_seconds, self.semantic_candidates)
+        ).fetchall()
+        if not rows:
+            return None
+        matrix = np.vstack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+        similarities = matrix @ embedding.astype(np.float32)
+        best = int(np.argmax(similarities))
+        if similarities[best] < threshold:
+            return None
+        self._touch(rows[best][0], now)
+        self._count("semantic_hits")
+        return rows[best][1]
+
+    def put(self,
+            key: str,
+            model: str,
+            response: str,
+            context_key: Optional[str] = None,
+            embedding: Optional[np.ndarray] = None):
+        """
+        Store a response.
+
+        Args:
+            key: The normalized request hash.
+            model: The model that produced the response.
+            response: The serialized response.
+            context_key: For first-turn entries, the hash used by get_similar.
+            embedding: For first-turn entries, the normalized user message embedding.
+        """
+        now = time.time()
+        blob = embedding.astype(np.float32).tobytes() if embedding is not None else None
+        self._connection().execute(
+            "INSERT OR REPLACE INTO llm_cache "
+            "(key, model, response, created_at, last_used_at, hits, context_key, embedding) "
+            "VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+            (key, model, response, now, now, context_key, blob)
+        )
+        self._count("writes")
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Delete expired entries and trim the cache to max_entries, least recently used first."""
+        connection = self._connection()
+        try:
+            connection.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            connection.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        except sqlite3.OperationalError as e:
+            # Another worker holds the write lock; eviction will run again later
+            logger.warning(f"LLM cache eviction skipped: {e}")
+
+    def _touch(self, key: str, now: float):
+        try:
+            self._connection().execute(
+                "UPDATE llm_cache SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+        except sqlite3.OperationalError:
+            pass
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss and write counts of this process, plus the number of stored entries."""
+        with self._lock:
+            stats = dict(self._counts)
+        stats["entries"] = self._connection().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return stats
@@ -0,0 +1,222 @@
+"""
+Process-pool execution for CPU-bound batch jobs.
+
+Batch scoring (batch search, recommendation materialization) and catalog
+ingestion are mostly Python work that threads serialize on the GIL. With
+PROCESS_POOL_WORKERS > 0 they run on a pool of worker processes instead.
+
+The package matrices are never pickled to the workers. A memory-mapped
+snapshot index is passed as its path, and workers map the same files. Any
+other index is copied once into shared memory blocks, and workers attach
+them by name, and the blocks stay alive until no batch uses them. Workers
+send back row indices and scores only. The parent builds the result rows
+from its own package metadata.
+"""
+import atexit
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config.env_config import config
+from app.services.result_dedup import distinct_positions, similarity_vectors
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA, TravelPackageIndex
+
+logger = logging.getLogger(__name__)
+
+# Indexes a worker keeps attached (the active one and the one being replaced)
+WORKER_INDEX_CACHE = 2
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# Shared memory of the active index (by id) and of replaced indexes still in use (by handle key);
+# each entry is {"handle", "blocks", "users"}
+_shared: Dict[int, Dict[str, Any]] = {}
+_retired: Dict[str, Dict[str, Any]] = {}
+_shared_lock = threading.Lock()
+_worker_indexes: "OrderedDict[str, Tuple[TravelPackageIndex, List[shared_memory.SharedMemory]]]" = OrderedDict()
+
+
+def _unlink(blocks: List[shared_memory.SharedMemory]):
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+def _release_shared():
+    """Unlink the shared memory blocks of this process."""
+    with _shared_lock:
+        for entry in list(_shared.values()) + list(_retired.values()):
+            _unlink(entry["blocks"])
+        _shared.clear()
+        _retired.clear()
+
+
+atexit.register(_release_shared)
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the shared process pool, or None if PROCESS_POOL_WORKERS is 0."""
+    global _pool
+    if config.process_pool_workers <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                context = multiprocessing.get_context(config.process_pool_start_method)
+                _pool = ProcessPoolExecutor(max_workers=config.process_pool_workers, mp_context=context)
+                logger.info(f"Started a pool of {config.process_pool_workers} worker processes")
+    return _pool
+
+
+def reset_process_pool():
+    """Shut down the pool (e.g. after a worker died); the next use starts a new one."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def share_index(index: TravelPackageIndex) -> Dict[str, Any]:
+    """
+    Return a picklable handle workers can attach the index's matrices with.
+
+    Snapshot-backed indexes are passed by path. Others are copied into shared
+    memory once per index. Every handle must be given back with release_index
+    once the tasks using it are done: when a new index is shared, the blocks
+    of the previous one are only unlinked after its last user released them.
+
+    Args:
+        index: The index to share.
+
+    Returns:
+        The handle for attach_index.
+    """
+    if index.snapshot_path is not None:
+        return {"key": index.snapshot_path, "snapshot": index.snapshot_path}
+    with _shared_lock:
+        entry = _shared.get(id(index))
+        if entry is not None and entry["handle"]["version"] == index.version:
+            entry["users"] += 1
+            return entry["handle"]
+        blocks = []
+        arrays = {}
+        for criterion in TRAVEL_PACKAGE_CRITERIA:
+            matrix = np.ascontiguousarray(index.matrices[criterion], dtype=np.float32)
+            block = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+            np.ndarray(matrix.shape, dtype=np.float32, buffer=block.buf)[...] = matrix
+            blocks.append(block)
+            arrays[criterion] = (block.name, matrix.shape)
+        handle = {"key": blocks[0].name, "version": index.version, "size": index.size, "arrays": arrays}
+        for old in _shared.values():
+            if old["users"]:
+                _retired[old["handle"]["key"]] = old
+            else:
+                _unlink(old["blocks"])
+        _shared.clear()
+        _shared[id(index)] = {"handle": handle, "blocks": blocks, "users": 1}
+        logger.info(f"Shared travel package index {index.version} with worker processes")
+        return handle
+
+
+def release_index(handle: Dict[str, Any]):
+    """Give back a share_index handle; a replaced index's blocks are unlinked with its last user."""
+    if "snapshot" in handle:
+        return
+    with _shared_lock:
+        for entry in _shared.values():
+            if entry["handle"]["key"] == handle["key"]:
+                entry["users"] -= 1
+                return
+        entry = _retired.get(handle["key"])
+        if entry is not None:
+            entry["users"] -= 1
+            if entry["users"] <= 0:
+                del _retired[handle["key"]]
+                _unlink(entry["blocks"])
+
+
+def attach_index(handle: Dict[str, Any]) -> TravelPackageIndex:
+    """Attach a shared index in a worker process (cached per handle)."""
+    entry = _worker_indexes.get(handle["key"])
+    if entry is not None:
+        return entry[0]
+    if "snapshot" in handle:
+        from app.vectorstore.catalog_snapshot import open_snapshot
+
+        index, blocks = open_snapshot(handle["snapshot"]), []
+    else:
+        blocks = []
+        matrices = {}
+        for criterion, (name, shape) in handle["arrays"].items():
+            block = shared_memory.SharedMemory(name=name)
+            blocks.append(block)
+            matrices[criterion] = np.ndarray(shape, dtype=np.float32, buffer=block.buf)
+        # Workers only score; package metadata stays in the parent
+        index = TravelPackageIndex(range(handle["size"]), matrices, version=handle["version"])
+    _worker_indexes[handle["key"]] = (index, blocks)
+    while len(_worker_indexes) > WORKER_INDEX_CACHE:
+        _, (_, old_blocks) = _worker_indexes.popitem(last=False)
+        for block in old_blocks:
+            block.close()
+    return index
+
+
+def score_chunk(index: Any,
+                text_vectors: np.ndarray,
+                text_ids: Dict[str, np.ndarray],
+                fetch_counts: Sequence[int],
+                match_counts: Sequence[int],
+                candidate_rows: Sequence[Optional[np.ndarray]],
+                dedup_threshold: Optional[float] = None,
+                dedup_block_size: int = 64) -> List[Tuple]:
+    """
+    Score a chunk of profiles and select each one's best rows.
+
+    Runs in the parent (index is a TravelPackageIndex) or in a worker
+    (index is a share_index handle).
+
+    Args:
+        index: The index, or a handle to attach it.
+        text_vectors: Normalized embeddings of the chunk's distinct preference texts.
+        text_ids: Per criterion, the chunk's (P,) row indices into text_vectors.
+        fetch_counts: Candidates ranked per profile.
+        match_counts: Packages wanted per profile.
+        candidate_rows: Per profile, the only rows to rank (location filter), or None.
+        dedup_threshold: If given, near-duplicates among the candidates are collapsed.
+        dedup_block_size: Candidates compared per matrix product when collapsing.
+
+    Returns:
+        Per profile (rows, scores, dedup), where dedup is None or the
+        (kept, examined, owners) result of distinct_positions over rows.
+    """
+    if isinstance(index, dict):
+        index = attach_index(index)
+    if not index.size:
+        return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), None) for _ in fetch_counts]
+
+    scores = index.score_profiles(text_vectors, text_ids)
+    for row, rows in enumerate(candidate_rows):
+        if rows is not None:
+            kept_scores = scores[row, rows]
+            scores[row] = -np.inf
+            scores[row, rows] = kept_scores
+    best = index.top_k(scores, max(fetch_counts, default=0))
+
+    results = []
+    for row, (fetch_count, match_count) in enumerate(zip(fetch_counts, match_counts)):
+        rows = best[row, :fetch_count]
+        # Rows excluded by the location filter may fill up the tail
+        rows = rows[np.isfinite(scores[row, rows])]
+        dedup = None
+        if dedup_threshold is not None and len(rows):
+            vectors = similarity_vectors({criterion: index.matrices[criterion][rows] for criterion in TRAVEL_PACKAGE_CRITERIA})
+            dedup = distinct_positions(vectors, dedup_threshold, match_count, dedup_block_size)
+        results.append((rows, scores[row, rows], dedup))
+    return results
@@ -0,0 +1,290 @@
+"""
+Materialized per-user travel package recommendations.
+
+A user's saved preferences are the profile they explicitly saved through
+POST /preferences. A daemon thread keeps each user's top
+RECOMMENDATIONS_TOP_N packages for that profile ranked against the active
+catalog, and recomputes a list only when the user's profile changed or
+the catalog swapped to a new version. All stale users are scored together
+with BatchTravelPackageSearch, so a catalog change costs a few matrix
+products rather than one search per user.
+
+A search whose preferences match the stored profile is answered from the
+materialized list without embedding or scoring anything. Lists are ranked
+against the same in-process index as TRAVEL_SEARCH_BACKEND=local searches,
+which is the only backend they are served for.
+
+Saved profiles are also written to a SavedProfileStore shared by all
+workers (RECOMMENDATIONS_PROFILE_PATH), so a worker learns about profiles
+saved through another one: on a lookup that does not match what it has in
+memory, and on each refresh cycle. Materialized lists stay per process.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.config.env_config import config
+from app.services.batch_search import BatchTravelPackageSearch
+from app.services.embeddings import get_embedding_service
+from app.services.saved_profiles import SavedProfileStore
+from app.telemetry.metrics import RECOMMENDATION_LOOKUPS
+from app.tools.search.search_tools import preference_text
+from app.utils.response_utils import project_travel_package
+from app.vectorstore.catalog import catalog_refresher, get_location_gazetteer, get_travel_package_index
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA
+
+logger = logging.getLogger(__name__)
+
+
+def profile_key(profile: Dict[str, Optional[str]]) -> str:
+    """Fingerprint of a preference profile, after the same normalization searches apply."""
+    digest = hashlib.sha256()
+    for criterion in TRAVEL_PACKAGE_CRITERIA:
+        digest.update(preference_text(profile.get(criterion)).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class RecommendationMaterializer:
+    """
+    Keeps a ranked top-N package list per user, refreshed in the background.
+
+    Users are tracked by user ID in LRU order and bounded to max_users. Each entry
+    holds the user's profile, its fingerprint, and the packages and catalog
+    version they were last ranked for; an entry is stale when it has no
+    packages yet or its version is not the active catalog version.
+    """
+
+    def __init__(self,
+                 top_n: int = 50,
+                 refresh_seconds: float = 60.0,
+                 max_users: int = 10000,
+                 store: Optional[SavedProfileStore] = None):
+        """
+        Args:
+            top_n: Packages materialized per user.
+            refresh_seconds: Longest interval between checks for stale users.
+            max_users: Maximum number of users whose recommendations are kept.
+            store: Profiles saved by all workers (None keeps profiles in this process only).
+        """
+        self.top_n = top_n
+        self.refresh_seconds = refresh_seconds
+        self.max_users = max_users
+        self.store = store
+        self._synced_seq = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._refreshed_at: Optional[float] = None
+        self.refreshes = 0
+        self.recomputed = 0
+        self.failures = 0
+        self.lookups: Dict[str, int] = {}
+
+    def _count(self, outcome: str):
+        self.lookups[outcome] = self.lookups.get(outcome, 0) + 1
+        if config.metrics_enabled:
+            RECOMMENDATION_LOOKUPS.labels(outcome).inc()
+
+    def lookup(self, user_id: str, profile: Dict[str, Optional[str]]) -> Optional[List[Dict]]:
+        """
+        Return the materialized packages for a search, if it matches the user's saved profile.
+
+        Args:
+            user_id: The caller's user ID.
+            profile: The search's preference inputs, keyed by criterion.
+
+        Returns:
+            The ranked TravelPackage response dictionaries, or None if the search
+            must run on demand (unknown user, changed profile or stale list).
+        """
+        key = profile_key(profile)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+        if entry is None or entry["profile_key"] != key:
+            # The user may have saved (new) preferences through another worker
+            entry = self._load_saved(user_id) or entry
+        if entry is None:
+            self._count("unknown_user")
+            return None
+        if entry["profile_key"] != key:
+            self._count("profile_changed")
+            return None
+        if entry["packages"] is None or entry["version"] != catalog_refresher.active_version:
+            self._count("stale")
+            return None
+        self._count("hit")
+        return entry["packages"]
+
+    def save_profile(self, user_id: str, profile: Dict[str, Optional[str]]):
+        """
+        Record the preferences a user saved, scheduling a recompute if they changed.
+
+        Args:
+            user_id: The user's ID.
+            profile: The preference inputs, keyed by criterion.
+        """
+        if self.max_users <= 0:
+            return
+        profile = {criterion: profile.get(criterion) for criterion in TRAVEL_PACKAGE_CRITERIA}
+        key = profile_key(profile)
+        if self.store is not None:
+            self.store.save(user_id, profile, key)
+        if self._remember(user_id, profile, key) is not None:
+            self.start()
+            self._wake.set()
+
+    def _remember(self, user_id: str, profile: Dict[str, Optional[str]], key: str) -> Optional[Dict[str, Any]]:
+        """Hold a user's profile in memory; returns the new (stale) entry, or None if it was unchanged."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry["profile_key"] == key:
+                self._entries.move_to_end(user_id)
+                return None
+            entry = {"profile": profile, "profile_key": key, "packages": None, "version": None}
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _load_saved(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Adopt the user's profile from the store if it differs from ours, scheduling a recompute."""
+        if self.store is None or self.max_users <= 0:
+            return None
+        try:
+            saved = self.store.load(user_id)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read saved preferences of {user_id}: {e}")
+            return None
+        if saved is None:
+            return None
+        entry = self._remember(*saved)
+        if entry is not None:
+            self.start()
+            self._wake.set()
+        return entry
+
+    def sync(self) -> int:
+        """
+        Adopt the profiles saved through any worker since the last sync.
+
+        Returns:
+            The number of users whose profile changed.
+        """
+        if self.store is None or self.max_users <= 0:
+            return 0
+        profiles, self._synced_seq = self.store.changes(self._synced_seq, self.max_users)
+        return sum(1 for saved in profiles if self._remember(*saved) is not None)
+
+    def start(self):
+        """Start the background refresh thread (if it is not running)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="recommendation-materializer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.refresh_seconds)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.sync()
+                self.refresh()
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Recommendation refresh failed: {e}")
+
+    def refresh(self) -> int:
+        """
+        Recompute the lists of all stale users against the active catalog.
+
+        Returns:
+            The number of users whose recommendations were recomputed.
+        """
+        self.refreshes += 1
+        index = get_travel_package_index()
+        with self._lock:
+            stale = [
+                (user_id, entry["profile"], entry["profile_key"])
+                for user_id, entry in self._entries.items()
+                if entry["packages"] is None or entry["version"] != index.version
+            ]
+        self._refreshed_at = time.time()
+        if not stale:
+            return 0
+
+        started = time.perf_counter()
+        batch_search = BatchTravelPackageSearch(
+            embedding_service=get_embedding_service(),
+            index=index,
+            chunk_size=config.batch_search_chunk_size,
+            embedding_batch_size=config.embedding_batch_max_size,
+            gazetteer=get_location_gazetteer() if config.location_prefilter_enabled else None
+        )
+        profiles = [profile for _, profile, _ in stale]
+        recomputed = 0
+        for position, packages in batch_search.search(profiles, [self.top_n] * len(profiles)):
+            user_id, _, key = stale[position]
+            projected = [row for row in map(project_travel_package, packages) if row is not None]
+            with self._lock:
+                entry = self._entries.get(user_id)
+                # Skip users who changed their preferences (or were evicted) meanwhile
+                if entry is None or entry["profile_key"] != key:
+                    continue
+                entry["packages"] = projected
+                entry["version"] = index.version
+            recomputed += 1
+        self.recomputed += recomputed
+        logger.info(
+            f"Materialized recommendations for {recomputed} users against catalog {index.version} "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+        return recomputed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of users, how many are current, refresh counters and lookup outcomes."""
+        version = catalog_refresher.active_version
+        with self._lock:
+            current = sum(
+                1 for entry in self._entries.values()
+                if entry["packages"] is not None and entry["version"] == version
+            )
+            users = len(self._entries)
+        return {
+            "users": users,
+            "current": current,
+            "refresh_age_seconds": round(time.time() - self._refreshed_at, 3) if self._refreshed_at else None,
+            "refreshes": self.refreshes,
+            "recomputed": self.recomputed,
+            "failures": self.failures,
+            "lookups": dict(self.lookups),
+        }
+
+
+recommendation_materializer = RecommendationMaterializer(
+    top_n=config.recommendations_top_n,
+    refresh_seconds=config.recommendations_refresh_seconds,
+    max_users=config.recommendations_max_users,
+    store=(
+        SavedProfileStore(config.recommendations_profile_path)
+        if config.recommendations_enabled and config.recommendations_profile_path else None
+    ),
+)
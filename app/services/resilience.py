@@ -0,0 +1,356 @@
+"""
+Timeouts, retries, hedging and circuit breaking for upstream calls.
+
+Every call to OpenAI or Supabase goes through the ResilientCaller of its
+dependency:
+
+- each attempt runs on a shared pool and is abandoned at the dependency's
+  timeout, so a slow upstream no longer holds the caller's thread;
+- retryable failures (timeouts, connection errors, 429 and 5xx) are retried
+  with full-jitter backoff, as long as the process-wide retry budget allows;
+- with hedging, a duplicate request is sent once an attempt has taken longer
+  than the dependency's recent p95 latency, and the first answer wins;
+- after repeated failures the circuit opens and calls go straight to the
+  caller's fallback (or fail fast) until a trial call succeeds.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+import openai
+from postgrest.exceptions import APIError
+
+from app.config.env_config import config
+from app.telemetry.metrics import DEPENDENCY_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# Hedging starts once a dependency has this many latency samples
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+BACKOFF_BASE_SECONDS = 0.1
+BACKOFF_MAX_SECONDS = 2.0
+
+# PostgREST errors raised when the database could not be reached or did not answer in time (503/504)
+RETRYABLE_POSTGREST_CODES = frozenset({"PGRST000", "PGRST001", "PGRST002", "PGRST003"})
+# SQLSTATEs of server-side failures: connection exceptions, insufficient resources, timeouts
+# and shutdowns, system and internal errors, serialization failures and deadlocks
+RETRYABLE_SQLSTATE_CLASSES = ("08", "53", "57", "58", "XX")
+RETRYABLE_SQLSTATES = frozenset({"40001", "40P01"})
+
+# Attempts run here so that callers can give up on them at the deadline
+_attempt_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="upstream")
+
+
+class DependencyTimeoutError(TimeoutError):
+    """An upstream call did not answer within its dependency's timeout."""
+
+
+class CircuitOpenError(RuntimeError):
+    """A dependency's circuit is open and the call has no fallback."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Check whether a failed upstream call may succeed if repeated.
+
+    Timeouts, connection errors, rate limiting (429) and server errors (5xx)
+    are retryable; client errors such as invalid requests are not.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError, openai.APIConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(error, APIError):
+        return _is_retryable_postgrest_error(error)
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+def _is_retryable_postgrest_error(error: APIError) -> bool:
+    """
+    Classify a postgrest APIError, which carries no HTTP status.
+
+    Its code is a PostgREST (PGRST...) or PostgreSQL (SQLSTATE) error code,
+    or the HTTP status itself when the response body was not a PostgREST
+    error (e.g. a gateway's 502 page).
+    """
+    code = str(error.code or "")
+    if code.isdigit() and len(code) == 3:
+        status = int(code)
+        return status == 429 or status >= 500
+    return (code in RETRYABLE_POSTGREST_CODES or code in RETRYABLE_SQLSTATES
+            or code.startswith(RETRYABLE_SQLSTATE_CLASSES))
+
+
+class RetryBudget:
+    """
+    Process-wide limit on retries and hedges.
+
+    Every call deposits ratio tokens and every retry or hedge spends one,
+    so extra load on struggling upstreams stays within ratio of the normal
+    traffic (plus min_per_second, so low-traffic processes can still retry).
+    """
+
+    def __init__(self, ratio: float, min_per_second: float = 1.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.spent = 0
+        self.denied = 0
+
+    def _refill(self, amount: float):
+        now = time.monotonic()
+        amount += (now - self._updated) * self.min_per_second
+        self._updated = now
+        self._tokens = min(self.max_tokens, self._tokens + amount)
+
+    def record_call(self):
+        """Deposit the allowance of one call."""
+        with self._lock:
+            self._refill(self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take a token for one retry or hedge, if the budget has one."""
+        with self._lock:
+            self._refill(0.0)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.spent += 1
+                return True
+            self.denied += 1
+            return False
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Opens after failure_threshold failed calls in a row. While open, calls
+    are refused; after reset_seconds one trial call is let through and its
+    outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Check whether a call may go to the dependency now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self) -> bool:
+        """Count a failed call; returns True if this opened the circuit."""
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self._failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+                return True
+            return False
+
+
+class ResilientCaller:
+    """Timeouts, retries, hedging and a circuit breaker for one upstream dependency."""
+
+    def __init__(self,
+                 name: str,
+                 timeout_seconds: float,
+                 max_retries: int,
+                 hedge: bool,
+                 retry_budget: RetryBudget,
+                 breaker: CircuitBreaker):
+        """
+        Args:
+            name: Dependency name, used in logs and metrics.
+            timeout_seconds: Deadline of each attempt.
+            max_retries: Maximum retries after the first attempt.
+            hedge: Send a duplicate request once an attempt exceeds the recent p95 latency.
+                Only for idempotent calls.
+            retry_budget: Shared budget for retries and hedges.
+            breaker: The dependency's circuit breaker.
+        """
+        self.name = name
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self.retry_budget = retry_budget
+        self.breaker = breaker
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.events: Dict[str, int] = {}
+
+    def _event(self, event: str):
+        self.events[event] = self.events.get(event, 0) + 1
+        if config.metrics_enabled:
+            DEPENDENCY_EVENTS.labels(self.name, event).inc()
+
+    def hedge_delay(self) -> Optional[float]:
+        """The recent p95 latency, after which an attempt is hedged (None if not hedging)."""
+        if not self.hedge or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    def call(self, fn: Callable[..., Any], *args, fallback: Optional[Callable[[], Any]] = None, **kwargs) -> Any:
+        """
+        Call fn(*args, **kwargs) with this dependency's resilience policy.
+
+        Args:
+            fn: The blocking upstream call.
+            fallback: Produces a degraded result (e.g. from a cache or a local
+                index) when the circuit is open or all attempts failed; it may
+                raise if it cannot, and the original error is raised instead.
+
+        Returns:
+            The result of fn, or of the fallback.
+
+        Raises:
+            CircuitOpenError: If the circuit is open and there is no fallback.
+            Exception: The last error of fn if it failed and there is no fallback.
+        """
+        if not self.breaker.allow():
+            self._event("circuit_open")
+            return self._fallback(fallback, CircuitOpenError(f"{self.name} is unavailable (circuit open)"))
+
+        self.retry_budget.record_call()
+        retries = 0
+        while True:
+            try:
+                result = self._attempt(fn, args, kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The dependency answered; the request itself was bad
+                    self.breaker.record_success()
+                    raise
+                if retries < self.max_retries and self.retry_budget.try_spend():
+                    retries += 1
+                    self._event("retry")
+                    time.sleep(random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** retries)))
+                    continue
+                self._event("failure")
+                if self.breaker.record_failure():
+                    logger.warning(f"Circuit for {self.name} opened after repeated failures: {e}")
+                return self._fallback(fallback, e)
+            self.breaker.record_success()
+            return result
+
+    def _attempt(self, fn: Callable[..., Any], args: tuple, kwargs: Dict) -> Any:
+        """Run one (possibly hedged) attempt within the timeout."""
+        started = time.monotonic()
+        deadline = started + self.timeout_seconds
+        context = contextvars.copy_context()
+        primary = _attempt_pool.submit(context.run, fn, *args, **kwargs)
+        pending = {primary}
+
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is not None and hedge_delay < self.timeout_seconds:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done and self.retry_budget.try_spend():
+                self._event("hedge")
+                pending.add(_attempt_pool.submit(contextvars.copy_context().run, fn, *args, **kwargs))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._event("hedge_win")
+                    self._latencies.append(time.monotonic() - started)
+                    return future.result()
+                error = future.exception()
+        if pending:
+            # Abandon the attempt; the client-level timeout ends the request itself
+            for future in pending:
+                future.cancel()
+            self._event("timeout")
+            raise DependencyTimeoutError(f"{self.name} did not answer within {self.timeout_seconds}s")
+        raise error
+
+    def _fallback(self, fallback: Optional[Callable[[], Any]], error: Exception) -> Any:
+        """Return the fallback's result, or raise the original error if there is none or it fails too."""
+        if fallback is None:
+            raise error
+        try:
+            result = fallback()
+        except Exception as fallback_error:
+            logger.warning(f"No fallback for {self.name} ({fallback_error}): {error}")
+            raise error
+        self._event("fallback")
+        logger.warning(f"Using fallback for {self.name}: {error}")
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the circuit state, hedge delay and event counts."""
+        delay = self.hedge_delay()
+        return {
+            "circuit": self.breaker.state,
+            "hedge_delay_ms": round(delay * 1000, 2) if delay is not None else None,
+            "events": dict(self.events),
+        }
+
+
+retry_budget = RetryBudget(config.retry_budget_ratio)
+
+
+def _caller(name: str, timeout_seconds: float, hedge: bool) -> ResilientCaller:
+    return ResilientCaller(
+        name,
+        timeout_seconds=timeout_seconds,
+        max_retries=config.upstream_max_retries,
+        hedge=hedge and config.hedging_enabled,
+        retry_budget=retry_budget,
+        breaker=CircuitBreaker(config.circuit_failure_threshold, config.circuit_reset_seconds),
+    )
+
+
+embedding_calls = _caller("openai_embeddings", config.embedding_timeout_seconds, hedge=True)
+# Chat completions are slow and billed per call: no hedging
+llm_calls = _caller("openai_chat", config.llm_timeout_seconds, hedge=False)
+supabase_calls = _caller("supabase", config.supabase_timeout_seconds, hedge=True)
+
+DEPENDENCIES = {caller.name: caller for caller in (embedding_calls, llm_calls, supabase_calls)}
+
+
+def resilience_stats() -> Dict[str, Any]:
+    """Return per-dependency stats and the retry budget usage."""
+    return {
+        "dependencies": {name: caller.stats() for name, caller in DEPENDENCIES.items()},
+        "retry_budget": {"spent": retry_budget.spent, "denied": retry_budget.denied},
+    }
@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS saved_profiles (
+    user_id TEXT PRIMARY KEY,
+    profile TEXT NOT NULL,
+    profile_key TEXT NOT NULL,
+    saved_at REAL NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS saved_profiles_seq ON saved_profiles (seq);
+"""
+
+SavedProfile = Tuple[str, Dict[str, Optional[str]], str]
+
+
+class SavedProfileStore:
+    """
+    SQLite file holding the preference profiles users saved, shared by all workers.
+
+    The database runs in WAL mode so every worker process can read and write
+    it, and profiles survive restarts. Each write takes the next sequence
+    number under the write lock, so numbers follow commit order and a worker
+    that remembers the highest number it has seen gets every later save,
+    whichever worker made it.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file (created if missing).
+        """
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection (sqlite3 connections are not shared between threads)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def save(self, user_id: str, profile: Dict[str, Optional[str]], profile_key: str):
+        """
+        Store a user's profile, replacing the one they saved before.
+
+        Args:
+            user_id: The user's ID.
+            profile: The preference inputs, keyed by criterion.
+            profile_key: Fingerprint of the profile.
+        """
+        connection = self._connection()
+        # Take the write lock before reading MAX(seq), so concurrent saves get distinct, ordered numbers
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT INTO saved_profiles (user_id, profile, profile_key, saved_at, seq) "
+                "VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM saved_profiles)) "
+                "ON CONFLICT (user_id) DO UPDATE SET profile = excluded.profile, "
+                "profile_key = excluded.profile_key, saved_at = excluded.saved_at, seq = excluded.seq",
+                (user_id, json.dumps(profile), profile_key, time.time())
+            )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def load(self, user_id: str) -> Optional[SavedProfile]:
+        """
+        Look up the profile a user saved.
+
+        Returns:
+            (user_id, profile, profile_key), or None if the user never saved one.
+        """
+        row = self._connection().execute(
+            "SELECT user_id, profile, profile_key FROM saved_profiles WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return (row[0], json.loads(row[1]), row[2]) if row is not None else None
+
+    def changes(self, after: int, limit: int) -> Tuple[List[SavedProfile], int]:
+        """
+        Return the profiles saved since a sequence number.
+
+        Args:
+            after: The highest sequence number already seen (0 for all).
+            limit: Maximum number of profiles returned, the most recently saved ones.
+
+        Returns:
+            The profiles, oldest save first, and the new highest sequence number.
+        """
+        rows = self._connection().execute(
+            "SELECT user_id, profile, profile_key, seq FROM saved_profiles "
+            "WHERE seq > ? ORDER BY seq DESC LIMIT ?",
+            (after, limit)
+        ).fetchall()
+        profiles = [(row[0], json.loads(row[1]), row[2]) for row in reversed(rows)]
+        return profiles, rows[0][3] if rows else after
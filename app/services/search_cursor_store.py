@@ -0,0 +1,133 @@
+import base64
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.config.env_config import config
+
+
+class CursorExpiredError(Exception):
+    """Raised when a pagination cursor is unknown, expired or belongs to another caller."""
+
+
+class SearchCursorStore:
+    """
+    Server-side store of ranked search results for cursor-based pagination.
+
+    The first page of a search stores the ranked package IDs (and the package
+    rows they refer to) under a random search ID. Later pages are sliced from
+    the stored list, so they need neither embeddings nor scoring. Callers
+    store rows projected onto the response fields; raw search rows carry
+    eight embedding vectors each.
+    """
+
+    def __init__(self, ttl_seconds: int = 900, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _owner_key(owner: str) -> str:
+        """Hash the owner (e.g. the bearer token) so it is not kept in memory."""
+        return hashlib.sha256(owner.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def encode_cursor(search_id: str, offset: int) -> str:
+        """Build the opaque cursor string for a page offset."""
+        return base64.urlsafe_b64encode(f"{search_id}:{offset}".encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, int]:
+        """Split an opaque cursor back into its search ID and offset."""
+        try:
+            search_id, offset = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split(":")
+            offset = int(offset)
+        except (ValueError, UnicodeError):
+            raise CursorExpiredError("Malformed cursor")
+        if offset < 0:
+            raise CursorExpiredError("Malformed cursor")
+        return search_id, offset
+
+    def create(self, owner: str, packages: List[Dict], page_size: int) -> Optional[str]:
+        """
+        Store a ranked result list and return the cursor for its second page.
+
+        Args:
+            owner: Identity the cursor is bound to (only this owner may page through it).
+            packages: The ranked package rows (projected onto the response fields), best match first.
+            page_size: Number of packages served on the first page.
+
+        Returns:
+            The cursor for the next page, or None if everything fits on the first page.
+        """
+        if len(packages) <= page_size:
+            return None
+
+        search_id = secrets.token_urlsafe(12)
+        entry = {
+            "owner": self._owner_key(owner),
+            "ids": [package["id"] for package in packages],
+            "packages": {package["id"]: dict(package) for package in packages},
+            "expires_at": time.monotonic() + self.ttl_seconds,
+        }
+        with self._lock:
+            self._evict_expired()
+            self._entries[search_id] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return self.encode_cursor(search_id, page_size)
+
+    def page(self, owner: str, cursor: str, page_size: int) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Serve a page of a stored search.
+
+        Args:
+            owner: Identity of the caller; must match the one that created the search.
+            cursor: The cursor returned with the previous page.
+            page_size: Number of packages to return.
+
+        Returns:
+            The packages of the page and the cursor for the following page (None on the last page).
+
+        Raises:
+            CursorExpiredError: If the cursor is malformed, expired or owned by someone else.
+        """
+        search_id, offset = self.decode_cursor(cursor)
+        with self._lock:
+            entry = self._entries.get(search_id)
+            if entry is None or entry["expires_at"] < time.monotonic():
+                self._entries.pop(search_id, None)
+                raise CursorExpiredError("Cursor has expired")
+            if entry["owner"] != self._owner_key(owner):
+                raise CursorExpiredError("Cursor does not belong to this caller")
+            self._entries.move_to_end(search_id)
+
+        ids = entry["ids"][offset:offset + page_size]
+        # Hand out copies so callers can reshape rows without touching the stored page data
+        packages = [dict(entry["packages"][package_id]) for package_id in ids]
+        next_offset = offset + page_size
+        next_cursor = self.encode_cursor(search_id, next_offset) if next_offset < len(entry["ids"]) else None
+        return packages, next_cursor
+
+    def advance(self, cursor: str, count: int) -> str:
+        """Return the cursor for the page starting `count` packages after `cursor`."""
+        search_id, offset = self.decode_cursor(cursor)
+        return self.encode_cursor(search_id, offset + count)
+
+    def _evict_expired(self):
+        """Drop expired entries (caller must hold the lock)."""
+        now = time.monotonic()
+        expired = [search_id for search_id, entry in self._entries.items() if entry["expires_at"] < now]
+        for search_id in expired:
+            del self._entries[search_id]
+
+
+# Shared store used by the API and the agent
+search_cursor_store = SearchCursorStore(
+    ttl_seconds=config.search_cursor_ttl_seconds,
+    max_entries=config.search_cursor_max_entries
+)
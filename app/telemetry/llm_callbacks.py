@@ -0,0 +1,133 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from llama_index.core.callbacks import CBEventType, EventPayload
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+from llama_index.core.utilities.token_counting import TokenCounter
+
+from app.telemetry.metrics import observe_stage
+
+
+class StageTimingHandler(BaseCallbackHandler):
+    """
+    llama_index callback handler that records each LLM round trip and tool
+    call made by the agent as a stage duration.
+
+    LLM calls are recorded as "llm.chat" and tool calls as "agent.tool".
+    """
+
+    _STAGES = {
+        CBEventType.LLM: "llm.chat",
+        CBEventType.FUNCTION_CALL: "agent.tool",
+    }
+
+    def __init__(self):
+        ignored = [event for event in CBEventType if event not in self._STAGES]
+        super().__init__(event_starts_to_ignore=ignored, event_ends_to_ignore=ignored)
+        self._starts: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def on_event_start(self,
+                       event_type: CBEventType,
+                       payload: Optional[Dict[str, Any]] = None,
+                       event_id: str = "",
+                       parent_id: str = "",
+                       **kwargs: Any) -> str:
+        with self._lock:
+            self._starts[event_id] = time.perf_counter()
+        return event_id
+
+    def on_event_end(self,
+                     event_type: CBEventType,
+                     payload: Optional[Dict[str, Any]] = None,
+                     event_id: str = "",
+                     **kwargs: Any) -> None:
+        with self._lock:
+            started = self._starts.pop(event_id, None)
+        if started is not None and event_type in self._STAGES:
+            observe_stage(self._STAGES[event_type], time.perf_counter() - started)
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        pass
+
+    def end_trace(self,
+                  trace_id: Optional[str] = None,
+                  trace_map: Optional[Dict[str, List[str]]] = None) -> None:
+        pass
+
+
+class PromptTokenCounter(BaseCallbackHandler):
+    """
+    llama_index callback handler that adds up LLM token usage per agent query.
+
+    Counts are kept per thread, since each agent query runs its LLM round
+    trips on the calling thread. Usage reported by the API is used when
+    present; otherwise prompt tokens are estimated with the tokenizer.
+    """
+
+    def __init__(self):
+        ignored = [event for event in CBEventType if event != CBEventType.LLM]
+        super().__init__(event_starts_to_ignore=ignored, event_ends_to_ignore=ignored)
+        self._local = threading.local()
+        self._token_counter = None
+
+    def begin_query(self):
+        """Start counting for a new agent query on this thread."""
+        self._local.usage = {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def query_usage(self) -> Dict[str, int]:
+        """Return the token usage of the current agent query on this thread."""
+        return dict(getattr(self._local, "usage", None) or {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+
+    def on_event_start(self,
+                       event_type: CBEventType,
+                       payload: Optional[Dict[str, Any]] = None,
+                       event_id: str = "",
+                       parent_id: str = "",
+                       **kwargs: Any) -> str:
+        return event_id
+
+    def on_event_end(self,
+                     event_type: CBEventType,
+                     payload: Optional[Dict[str, Any]] = None,
+                     event_id: str = "",
+                     **kwargs: Any) -> None:
+        usage = getattr(self._local, "usage", None)
+        if event_type != CBEventType.LLM or usage is None or payload is None:
+            return
+        raw = getattr(payload.get(EventPayload.RESPONSE), "raw", None)
+        if isinstance(raw, dict) and raw.get("cached"):
+            # Served from the LLM response cache: no tokens were sent
+            return
+        prompt_tokens, completion_tokens = self._response_usage(payload.get(EventPayload.RESPONSE))
+        if not prompt_tokens and payload.get(EventPayload.MESSAGES):
+            prompt_tokens = self._estimate(payload[EventPayload.MESSAGES])
+        usage["llm_calls"] += 1
+        usage["prompt_tokens"] += prompt_tokens
+        usage["completion_tokens"] += completion_tokens
+
+    @staticmethod
+    def _response_usage(response) -> Tuple[int, int]:
+        """Read (prompt, completion) token usage from a chat response, if the API reported it."""
+        usage = getattr(getattr(response, "raw", None), "usage", None)
+        if usage is None and isinstance(getattr(response, "raw", None), dict):
+            usage = response.raw.get("usage")
+        if usage is None:
+            return 0, 0
+        if isinstance(usage, dict):
+            return usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+        return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+
+    def _estimate(self, messages) -> int:
+        if self._token_counter is None:
+            self._token_counter = TokenCounter()
+        return self._token_counter.estimate_tokens_in_messages(messages)
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        pass
+
+    def end_trace(self,
+                  trace_id: Optional[str] = None,
+                  trace_map: Optional[Dict[str, List[str]]] = None) -> None:
+        pass
@@ -0,0 +1,143 @@
+import atexit
+import copy
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+
+import orjson
+
+from app.config.env_config import config
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as one JSON object per line, including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records for the listener thread without formatting them.
+
+    The stock QueueHandler formats each record on the calling thread and
+    drops its exc_info, so tracebacks end up flattened into the message.
+    The queue never leaves the process, so only the message is resolved
+    here (its arguments may change later) and the rest is left to the
+    listener's formatter.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(level: Optional[int] = None, log_format: Optional[str] = None, stream: Optional[TextIO] = None):
+    """
+    Route all logging through a queue to a background writer thread.
+
+    Request threads only enqueue records; formatting and I/O happen on the
+    listener thread. Calling this again replaces the previous configuration.
+
+    Args:
+        level: Root log level (defaults to DEBUG in debug mode, INFO otherwise).
+        log_format: "json" for structured records or "text" for the classic format
+            (defaults to LOG_FORMAT).
+        stream: Where to write records (defaults to stderr).
+    """
+    global _listener
+    if level is None:
+        level = logging.DEBUG if config.debug else logging.INFO
+    log_format = log_format or config.log_format
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+    if _listener is not None:
+        _listener.stop()
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_RecordQueueHandler(log_queue))
+    root.setLevel(level)
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def sample_debug(logger: logging.Logger) -> bool:
+    """
+    Return True if a debug-level payload dump should be emitted.
+
+    Only a LOG_DEBUG_SAMPLE_RATE fraction of dumps is kept, and nothing is
+    sampled when the logger is not enabled for DEBUG.
+    """
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < config.log_debug_sample_rate
+
+
+def summarize_packages(packages: Optional[Iterable[Dict]], max_ids: int = 10) -> Dict[str, Any]:
+    """
+    Summarize travel packages for logging as a count and the first few IDs.
+
+    Args:
+        packages: Travel package dictionaries (rows may include vector columns).
+        max_ids: Maximum number of IDs to include.
+
+    Returns:
+        Dictionary with the package count and IDs.
+    """
+    packages = list(packages or [])
+    return {"count": len(packages), "ids": [package.get("id") for package in packages[:max_ids]]}
+
+
+def strip_vectors(packages: Iterable[Dict]) -> List[Dict]:
+    """Drop embedding columns from package rows so debug dumps stay readable."""
+    return [
+        {key: value for key, value in package.items() if not key.endswith("_vector")}
+        for package in packages
+    ]
+
+
+def summarize_chat_history(messages: Iterable[Any]) -> Dict[str, Any]:
+    """Summarize agent chat history as its message count and the roles of the last few messages."""
+    messages = list(messages)
+    return {
+        "count": len(messages),
+        "recent_roles": [str(getattr(message.role, "value", message.role)) for message in messages[-6:]],
+    }
@@ -0,0 +1,221 @@
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app.config.env_config import config
+
+logger = logging.getLogger(__name__)
+
+# Buckets from 1ms to 60s: covers in-process stages as well as LLM round trips
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_DURATION = Histogram(
+    "travel_buddy_stage_duration_seconds",
+    "Duration of each stage of request processing",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "travel_buddy_stage_errors_total",
+    "Stages that raised an exception",
+    ["stage"],
+)
+AGENT_PROMPT_TOKENS = Histogram(
+    "travel_buddy_agent_prompt_tokens",
+    "Prompt tokens sent to the LLM per agent query (all round trips)",
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000),
+)
+ROUTER_DECISIONS = Counter(
+    "travel_buddy_router_decisions_total",
+    "Agent queries by route: fast_path (direct search) or agent (LLM tool selection)",
+    ["route"],
+)
+ROUTER_LATENCY_SAVED = Counter(
+    "travel_buddy_router_latency_saved_seconds_total",
+    "Estimated latency saved by fast-path answers compared to the average agent query",
+)
+SPECULATION_OUTCOMES = Counter(
+    "travel_buddy_speculative_search_total",
+    "Speculative travel package searches by outcome: hit, mismatch (cancelled) or unused (cancelled)",
+    ["outcome"],
+)
+LLM_CACHE_LOOKUPS = Counter(
+    "travel_buddy_llm_cache_lookups_total",
+    "Agent LLM calls by cache result: hit, semantic_hit or miss",
+    ["result"],
+)
+ADMISSION_DECISIONS = Counter(
+    "travel_buddy_admission_decisions_total",
+    "Requests by worker pool and admission outcome: admitted, rate_limited, queue_full, shed or expired",
+    ["pool", "outcome"],
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "travel_buddy_admission_queue_wait_seconds",
+    "Time admitted requests waited for a worker",
+    ["pool"],
+    buckets=LATENCY_BUCKETS,
+)
+DEPENDENCY_EVENTS = Counter(
+    "travel_buddy_dependency_events_total",
+    "Upstream call events by dependency: retry, hedge, hedge_win, timeout, failure, circuit_open or fallback",
+    ["dependency", "event"],
+)
+RECOMMENDATION_LOOKUPS = Counter(
+    "travel_buddy_recommendation_lookups_total",
+    "First-page searches by materialized recommendation outcome: hit, unknown_user, profile_changed or stale",
+    ["outcome"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "travel_buddy_http_request_duration_seconds",
+    "Duration of HTTP requests",
+    ["method", "path", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+_tracer = None
+
+
+def setup_tracing():
+    """
+    Enable OpenTelemetry trace export if OTEL_EXPORTER_OTLP_ENDPOINT is set.
+
+    The OpenTelemetry SDK and OTLP exporter are optional dependencies; if
+    they are not installed, spans are only recorded as histograms.
+    """
+    global _tracer
+    endpoint = config.otel_exporter_endpoint
+    if not endpoint or _tracer is not None:
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk/exporter are not installed")
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": config.otel_service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=f"{endpoint.rstrip('/')}/v1/traces")))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("travel_buddy")
+    logger.info(f"Exporting traces to {endpoint}")
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    Time a stage of request processing.
+
+    The duration is recorded in the stage histogram and, when tracing is
+    enabled, exported as an OpenTelemetry span nested under the current one.
+
+    Args:
+        stage: Stage name, e.g. "search_tool.embed".
+        attributes: Extra span attributes (only used for trace export).
+    """
+    if not config.metrics_enabled:
+        yield
+        return
+
+    trace_span = _tracer.start_as_current_span(stage, attributes=attributes) if _tracer else nullcontext()
+    start = time.perf_counter()
+    with trace_span:
+        try:
+            yield
+        except BaseException:
+            STAGE_ERRORS.labels(stage).inc()
+            raise
+        finally:
+            STAGE_DURATION.labels(stage).observe(time.perf_counter() - start)
+
+
+def observe_prompt_tokens(tokens: int):
+    """Record the prompt tokens of one agent query."""
+    if config.metrics_enabled:
+        AGENT_PROMPT_TOKENS.observe(tokens)
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage duration measured elsewhere (e.g. by a callback)."""
+    if config.metrics_enabled:
+        STAGE_DURATION.labels(stage).observe(seconds)
+
+
+class StatsCollector:
+    """Expose the in-process counters of the coalescing and batching layers."""
+
+    def describe(self):
+        # Registered at import time, before the services it reads are importable
+        return []
+
+    def collect(self):
+        from app.services.embeddings import EmbeddingService
+        from app.vectorstore.supabase_vectorstore import SupabaseVectorStore
+
+        calls = CounterMetricFamily(
+            "travel_buddy_singleflight_calls", "Calls through a single-flight group", labels=["group"]
+        )
+        coalesced = CounterMetricFamily(
+            "travel_buddy_singleflight_coalesced", "Calls that shared another caller's in-flight result",
+            labels=["group"]
+        )
+        for group, stats in (("embeddings", EmbeddingService.coalescing_stats()),
+                             ("search_travel_packages", SupabaseVectorStore.coalescing_stats())):
+            calls.add_metric([group], stats["calls"])
+            coalesced.add_metric([group], stats["coalesced"])
+        yield calls
+        yield coalesced
+
+        batching: Optional[Dict] = EmbeddingService.batching_stats()
+        if batching is not None:
+            yield CounterMetricFamily("travel_buddy_embedding_batches", "Embedding API calls made by the micro-batcher",
+                                      value=batching["batches"])
+            yield CounterMetricFamily("travel_buddy_embedding_batched_texts", "Texts sent by the micro-batcher",
+                                      value=batching["batched_texts"])
+            yield GaugeMetricFamily("travel_buddy_embedding_batch_fill_ratio", "Average batch size / max batch size",
+                                    value=batching["avg_batch_fill"])
+            yield GaugeMetricFamily("travel_buddy_embedding_queue_delay_avg_seconds",
+                                    "Average time texts waited in the batch queue",
+                                    value=batching["avg_queue_delay_ms"] / 1000.0)
+            yield GaugeMetricFamily("travel_buddy_embedding_queue_depth", "Texts waiting in the batch queue",
+                                    value=batching["queued"])
+
+        from app.services.resilience import DEPENDENCIES
+
+        circuit = GaugeMetricFamily("travel_buddy_circuit_open", "1 while a dependency's circuit is open or half open",
+                                    labels=["dependency"])
+        for name, caller in DEPENDENCIES.items():
+            circuit.add_metric([name], 0 if caller.breaker.state == caller.breaker.CLOSED else 1)
+        yield circuit
+
+        from app.vectorstore.catalog import catalog_refresher
+
+        catalog = catalog_refresher.stats()
+        if catalog["version"] is not None:
+            info = GaugeMetricFamily("travel_buddy_catalog_info", "Active travel package index version",
+                                     labels=["version", "source"])
+            info.add_metric([catalog["version"], catalog["source"]], 1)
+            yield info
+            yield GaugeMetricFamily("travel_buddy_catalog_packages", "Packages in the active travel package index",
+                                    value=catalog["packages"])
+            yield GaugeMetricFamily("travel_buddy_catalog_refresh_age_seconds",
+                                    "Seconds since the catalog was last checked for a new version",
+                                    value=catalog["refresh_age_seconds"])
+            yield CounterMetricFamily("travel_buddy_catalog_swaps", "Catalog versions swapped in by the refresher",
+                                      value=catalog["swaps"])
+            yield CounterMetricFamily("travel_buddy_catalog_refresh_failures", "Failed catalog refresh checks",
+                                      value=catalog["failures"])
+
+
+REGISTRY.register(StatsCollector())
+
+
+def render_metrics():
+    """Render all metrics in the Prometheus text exposition format."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
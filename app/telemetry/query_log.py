@@ -0,0 +1,261 @@
+"""
+Opt-in capture of /ask and /search-travel-packages requests for replay.
+
+With QUERY_LOG_PATH set, a sample of these requests is written as one JSON
+object per line: the arrival time, endpoint, a pseudonymous user id, the
+scrubbed request fields, the response status and the server-side duration.
+benchmarks/replay.py re-runs such a log against a build.
+
+Nothing that identifies the caller is kept. The access token is replaced by
+a keyed hash (QUERY_LOG_SALT, required so that every worker produces the
+same pseudonyms), and e-mail addresses, URLs and long digit
+runs (phone, card and passport numbers) in free text are masked. Names and
+other personal details a user types remain, so the log must be stored like
+the application's other user data.
+
+Lines are written by a background thread to a size-rotated file, so the
+request path only enqueues the entry. Each process writes its own file
+(logs/query_log.jsonl is written as logs/query_log-<pid>.jsonl), since
+several processes rotating one file would lose lines.
+"""
+import atexit
+import glob
+import hashlib
+import hmac
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+
+from app.config.env_config import config
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA
+
+logger = logging.getLogger(__name__)
+
+CAPTURED_PATHS = frozenset({"/ask", "/search-travel-packages"})
+
+# Longest free-text field kept, in characters
+MAX_TEXT_LENGTH = 2000
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_URL = re.compile(r"\b(?:https?://|www\.)\S+", re.IGNORECASE)
+# Digits with optional separators; masked when they hold 9 or more digits
+_DIGIT_RUN = re.compile(r"\+?\d[\d\s().-]{6,}\d")
+
+
+def _mask_digits(match: "re.Match") -> str:
+    """Mask phone, card and ID numbers but keep dates, prices and durations."""
+    text = match.group(0)
+    return "<number>" if sum(char.isdigit() for char in text) >= 9 else text
+
+
+def scrub_text(text: Optional[str]) -> Optional[str]:
+    """
+    Mask e-mail addresses, URLs and long numbers in user text.
+
+    Args:
+        text: A free-text request field.
+
+    Returns:
+        The scrubbed text, truncated to MAX_TEXT_LENGTH characters.
+    """
+    if not text:
+        return text
+    text = _EMAIL.sub("<email>", str(text)[:MAX_TEXT_LENGTH])
+    text = _URL.sub("<url>", text)
+    return _DIGIT_RUN.sub(_mask_digits, text)
+
+
+def scrub_request(endpoint: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Keep the replayable fields of a request body, scrubbed.
+
+    Args:
+        endpoint: The request path.
+        body: The parsed JSON body.
+
+    Returns:
+        The query of an /ask request, or the preference inputs, match_count and
+        whether a cursor was given (cursors themselves are bound to the caller)
+        of a search request.
+    """
+    if endpoint == "/ask":
+        return {"query": scrub_text(body.get("query"))}
+    request = {
+        f"{criterion}_input": scrub_text(body.get(f"{criterion}_input"))
+        for criterion in TRAVEL_PACKAGE_CRITERIA
+    }
+    request["match_count"] = body.get("match_count")
+    request["cursor"] = bool(body.get("cursor"))
+    return request
+
+
+def process_log_path(path: str, pid: int) -> str:
+    """Return the file a process writes a query log to (logs/query_log-<pid>.jsonl)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}-{pid}{ext}"
+
+
+def query_log_files(path: str) -> List[str]:
+    """
+    Return the files of a query log: every process's file and its rotated files.
+
+    Files written to the path itself (by earlier versions) are included too.
+    Each process's rotated files (.1, .2, ...) come before its current file,
+    oldest first; entries are not in time order across processes.
+    """
+    root, ext = os.path.splitext(path)
+    pattern = re.compile(rf"{re.escape(root)}(?:-(\d+))?{re.escape(ext)}(?:\.(\d+))?")
+    files = []
+    for name in glob.glob(f"{glob.escape(root)}*{glob.escape(ext)}*"):
+        match = pattern.fullmatch(name)
+        if match is not None:
+            pid, rotation = match.groups()
+            files.append((int(pid or -1), -int(rotation or 0), name))
+    return [name for _, _, name in sorted(files)]
+
+
+def read_query_log(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the entries of every file of a query log (see query_log_files), skipping unreadable lines."""
+    for name in query_log_files(path):
+        with open(name, "rb") as f:
+            for line in f:
+                try:
+                    yield orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+
+
+class QueryLog:
+    """Writes sampled, scrubbed request entries to a rotating JSONL file."""
+
+    def __init__(self, path: str, sample_rate: float = 1.0, max_bytes: int = 50 * 1024 * 1024,
+                 backups: int = 5, salt: str = ""):
+        """
+        Args:
+            path: Query log path; each process writes its own file derived from
+                it (see process_log_path). Empty disables capture.
+            sample_rate: Share of requests captured.
+            max_bytes: Size at which a file is rotated.
+            backups: Number of rotated files kept per process.
+            salt: Key of the user pseudonyms, shared by all processes.
+
+        Raises:
+            ValueError: If capture is enabled without a salt.
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backups = backups
+        if self.enabled and not salt:
+            raise ValueError("QUERY_LOG_SALT is required when QUERY_LOG_PATH is set")
+        self._salt = salt.encode("utf-8")
+        self._queue: Optional[queue.SimpleQueue] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._lock = threading.Lock()
+        self.captured = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and self.sample_rate > 0
+
+    def should_capture(self, method: str, path: str) -> bool:
+        """Decide whether a request is captured (sampled at sample_rate)."""
+        if not self.enabled or method != "POST" or path not in CAPTURED_PATHS:
+            return False
+        if random.random() < self.sample_rate:
+            return True
+        self.skipped += 1
+        return False
+
+    def pseudonym(self, authorization: Optional[str]) -> Optional[str]:
+        """Keyed hash of the caller's access token."""
+        if not authorization:
+            return None
+        token = authorization.replace("Bearer ", "").strip()
+        return hmac.new(self._salt, token.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+    def capture(self,
+                endpoint: str,
+                body: bytes,
+                authorization: Optional[str],
+                status: int,
+                started_at: float,
+                duration_ms: float):
+        """
+        Queue the entry of a finished request.
+
+        Args:
+            endpoint: The request path.
+            body: The raw request body.
+            authorization: The caller's authorization value.
+            status: The response status code.
+            started_at: Arrival time (seconds since the epoch).
+            duration_ms: Server-side duration of the request.
+        """
+        try:
+            request = scrub_request(endpoint, orjson.loads(body))
+        except (orjson.JSONDecodeError, AttributeError):
+            request = None
+        entry = {
+            "ts": round(started_at, 6),
+            "endpoint": endpoint,
+            "user": self.pseudonym(authorization),
+            "request": request,
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+        }
+        self._writer().put(logging.makeLogRecord({"msg": orjson.dumps(entry).decode("utf-8")}))
+        self.captured += 1
+
+    def _writer(self) -> queue.SimpleQueue:
+        """Return the entry queue, starting the writer thread on first use."""
+        if self._queue is None:
+            with self._lock:
+                if self._queue is None:
+                    directory = os.path.dirname(os.path.abspath(self.path))
+                    os.makedirs(directory, exist_ok=True)
+                    # Opened on first capture, so forked workers each get their own file
+                    path = process_log_path(self.path, os.getpid())
+                    handler = logging.handlers.RotatingFileHandler(
+                        path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8"
+                    )
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    entries = queue.SimpleQueue()
+                    self._listener = logging.handlers.QueueListener(entries, handler)
+                    self._listener.start()
+                    self._queue = entries
+                    logger.info(f"Capturing queries to {path} (sample rate {self.sample_rate})")
+        return self._queue
+
+    def close(self):
+        """Flush queued entries and stop the writer thread."""
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                for handler in self._listener.handlers:
+                    handler.close()
+                self._listener = None
+                self._queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return whether capture is on, and how many requests were captured and sampled out."""
+        return {"enabled": self.enabled, "captured": self.captured, "skipped": self.skipped}
+
+
+query_log = QueryLog(
+    path=config.query_log_path,
+    sample_rate=config.query_log_sample_rate,
+    max_bytes=config.query_log_max_bytes,
+    backups=config.query_log_backups,
+    salt=config.query_log_salt,
+)
+
+atexit.register(query_log.close)
@@ -0,0 +1,210 @@
+import calendar
+import re
+from datetime import date, datetime, timedelta
+from typing import NamedTuple, Optional
+
+_NUMBERS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+_NUMBER = r"(\d+|a|an|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve)"
+_MONTHS = {name.lower(): index for index, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({name.lower(): index for index, name in enumerate(calendar.month_abbr) if name})
+_MONTH = r"(" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + r")\.?"
+_ORDINAL_QUARTERS = {"first": 1, "second": 2, "third": 3, "fourth": 4, "last": 4}
+_ISO_DATE = r"(\d{4}-\d{2}-\d{2})"
+
+
+class DateRange(NamedTuple):
+    """An inclusive range of calendar days, and the text it was parsed from."""
+    start: date
+    end: date
+    text: str = ""
+
+    def contains(self, day: date) -> bool:
+        return self.start <= day <= self.end
+
+    def to_string(self) -> str:
+        return f"{self.start.isoformat()}..{self.end.isoformat()}"
+
+    @classmethod
+    def from_string(cls, value: str) -> Optional["DateRange"]:
+        """Parse "YYYY-MM-DD..YYYY-MM-DD" (either side may be omitted)."""
+        if not value or ".." not in value:
+            return None
+        start, end = (part.strip() for part in value.split("..", 1))
+        try:
+            return cls(
+                date.fromisoformat(start) if start else date.min,
+                date.fromisoformat(end) if end else date.max,
+                value
+            )
+        except ValueError:
+            return None
+
+
+def _number(value: str) -> int:
+    return int(value) if value.isdigit() else _NUMBERS[value]
+
+
+def _month_range(year: int, month: int) -> tuple:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _shift_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _quarter_range(year: int, quarter: int) -> tuple:
+    start_month = 3 * (quarter - 1) + 1
+    return date(year, start_month, 1), _month_range(year, start_month + 2)[1]
+
+
+def _week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def _year(value: Optional[str], start_month: int, today: date) -> int:
+    """Explicit year, else the most recent one in which the period has started."""
+    if value:
+        return int(value)
+    return today.year if start_month <= today.month else today.year - 1
+
+
+def parse_date_range(text: str, today: Optional[date] = None) -> Optional[DateRange]:
+    """
+    Turn the first date expression in a text into a concrete range of days.
+
+    Understands explicit ISO dates and ranges, "today", "yesterday",
+    "this/last/next week|month|quarter|year", "past N days/weeks/months",
+    "N days/weeks/months/years ago", quarters ("Q1", "Q3 2024",
+    "first quarter"), month names ("in March", "March 2024",
+    "since March") and years ("in 2023"). Open-ended expressions
+    ("since ...") end today.
+
+    Args:
+        text: Free text, e.g. a user query.
+        today: Reference day (defaults to the current date).
+
+    Returns:
+        The parsed DateRange, or None if the text has no date expression.
+    """
+    today = today or date.today()
+    lowered = text.lower()
+
+    def found(start: date, end: date, match) -> DateRange:
+        return DateRange(start, end, text[match.start():match.end()])
+
+    match = re.search(rf"(?:from|between)?\s*{_ISO_DATE}\s*(?:to|and|until|-|–|\.\.)\s*{_ISO_DATE}", lowered)
+    if match:
+        return found(date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2)), match)
+    match = re.search(rf"\b(since|after|before|until|on)?\s*{_ISO_DATE}", lowered)
+    if match:
+        day = date.fromisoformat(match.group(2))
+        qualifier = match.group(1)
+        if qualifier in ("since", "after"):
+            return found(day, today, match)
+        if qualifier in ("before", "until"):
+            return found(date.min, day, match)
+        return found(day, day, match)
+
+    match = re.search(r"\b(today|yesterday)\b", lowered)
+    if match:
+        day = today if match.group(1) == "today" else today - timedelta(days=1)
+        return found(day, day, match)
+
+    # "the last quarter of 2023" names a quarter of that year, not the one before this
+    match = re.search(r"\b(this|last|previous|past|next|current)\s+(week|month|quarter|year)\b(?!\s+(?:of\s+)?\d{4})",
+                      lowered)
+    if match:
+        which, unit = match.groups()
+        offset = {"this": 0, "current": 0, "last": -1, "previous": -1, "past": -1, "next": 1}[which]
+        if unit == "week":
+            start = _week_start(today) + timedelta(weeks=offset)
+            return found(start, start + timedelta(days=6), match)
+        if unit == "month":
+            start = _shift_months(today, offset)
+            return found(*_month_range(start.year, start.month), match)
+        if unit == "quarter":
+            index = (today.year * 4 + (today.month - 1) // 3) + offset
+            return found(*_quarter_range(index // 4, index % 4 + 1), match)
+        year = today.year + offset
+        return found(date(year, 1, 1), date(year, 12, 31), match)
+
+    match = re.search(rf"\b(?:in the |over the |during the )?(?:past|last|previous)\s+{_NUMBER}\s+(day|week|month|year)s?\b", lowered)
+    if match:
+        count, unit = _number(match.group(1)), match.group(2)
+        days = {"day": 1, "week": 7}.get(unit)
+        if days:
+            start = today - timedelta(days=count * days)
+        elif unit == "month":
+            start = _shift_months(today, -count).replace(day=min(today.day, 28))
+        else:
+            start = today.replace(year=today.year - count, day=min(today.day, 28))
+        return found(start, today, match)
+
+    match = re.search(rf"\b{_NUMBER}\s+(day|week|month|year)s?\s+ago\b", lowered)
+    if match:
+        count, unit = _number(match.group(1)), match.group(2)
+        if unit == "day":
+            day = today - timedelta(days=count)
+            return found(day, day, match)
+        if unit == "week":
+            start = _week_start(today - timedelta(weeks=count))
+            return found(start, start + timedelta(days=6), match)
+        if unit == "month":
+            start = _shift_months(today, -count)
+            return found(*_month_range(start.year, start.month), match)
+        year = today.year - count
+        return found(date(year, 1, 1), date(year, 12, 31), match)
+
+    match = re.search(r"\bq([1-4])(?:\s*(?:of\s+)?(\d{4}))?\b", lowered) or \
+        re.search(r"\b(first|second|third|fourth|last)\s+quarter(?:\s+(?:of\s+)?(\d{4}))?\b", lowered)
+    if match:
+        quarter = int(match.group(1)) if match.group(1).isdigit() else _ORDINAL_QUARTERS[match.group(1)]
+        year = _year(match.group(2), 3 * (quarter - 1) + 1, today)
+        return found(*_quarter_range(year, quarter), match)
+
+    match = re.search(rf"\b(since|from|in|during|of)?\s*{_MONTH}(?:\s+(\d{{4}}))?\b", lowered)
+    if match and (match.group(1) or match.group(3) or len(match.group(2)) > 3):
+        qualifier, month_name, year = match.groups()
+        # "may" is only a month with a preposition or a year
+        if month_name != "may" or qualifier or year:
+            month = _MONTHS[month_name]
+            start, end = _month_range(_year(year, month, today), month)
+            if qualifier in ("since", "from"):
+                end = today
+            return found(start, end, match)
+
+    match = re.search(r"\b(since|in|during)\s+(\d{4})\b", lowered)
+    if match:
+        year = int(match.group(2))
+        end = today if match.group(1) == "since" else date(year, 12, 31)
+        return found(date(year, 1, 1), end, match)
+
+    return None
+
+
+def strip_date_expression(text: str, date_range: Optional[DateRange]) -> str:
+    """Remove the parsed date expression from a text, leaving the topic for text and vector search."""
+    if not date_range or not date_range.text:
+        return text
+    return " ".join(text.replace(date_range.text, " ").split()) or text
+
+
+def as_date(value) -> Optional[date]:
+    """Convert a date, datetime or ISO string (e.g. a timestamptz column) to a date."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).date()
+    except ValueError:
+        try:
+            return date.fromisoformat(str(value)[:10])
+        except ValueError:
+            return None
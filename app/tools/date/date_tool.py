@@ -1,7 +1,10 @@
 from datetime import datetime
 from typing import Dict, Any
 
+from pydantic import Field
+
 from app.tools.base_tool import BaseTool
+from app.tools.date.date_parser import parse_date_range
 
 
 class DateExtractionTool(BaseTool):
@@ -18,4 +21,30 @@ class DateExtractionTool(BaseTool):
         Returns the current date/time in ISO format.
         This allows the agent to understand time-based queries.
         """
-        return datetime.now().isoformat() 
\ No newline at end of file
+        return datetime.now().isoformat()
+
+
+class DateRangeExtractionTool(BaseTool):
+    """Tool for turning relative date expressions into concrete date ranges."""
+
+    def __init__(self):
+        super().__init__(
+            name="ExtractDateRange",
+            description="Converts a date expression such as 'last week', 'two months ago' or 'Q1' into a "
+                        "concrete YYYY-MM-DD..YYYY-MM-DD range."
+        )
+
+    def __call__(self, text: str = Field(description="Text containing the date expression")) -> str:
+        """
+        Parse the first date expression in a text, relative to today.
+
+        Args:
+            text: The text to parse, e.g. the user's question.
+
+        Returns:
+            The range as "YYYY-MM-DD..YYYY-MM-DD", or a message if no date was found.
+        """
+        date_range = parse_date_range(text)
+        if date_range is None:
+            return f"No date range found; today is {datetime.now().date().isoformat()}."
+        return date_range.to_string()
@@ -1,8 +1,10 @@
+import difflib
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
 from app.tools.base_tool import BaseTool
 from app.config.env_config import config
+from app.services.resilience import llm_calls
 from openai import OpenAI
 
 
@@ -23,7 +25,7 @@ class OrganizationValidationTool(BaseTool):
                        "Returns the exact organization name if found, or None if not found."
         )
         self.organizations = organizations
-        self.openai_client = OpenAI(api_key=config.openai_api_key)
+        self.openai_client = OpenAI(api_key=config.openai_api_key, timeout=config.llm_timeout_seconds, max_retries=0)
     
     def __call__(self, organization_input: str) -> OrganizationValidation:
         """
@@ -34,7 +36,8 @@ class OrganizationValidationTool(BaseTool):
             return OrganizationValidation(organization_name=None)
 
         try:
-            completion = self.openai_client.beta.chat.completions.parse(
+            completion = llm_calls.call(
+                self.openai_client.beta.chat.completions.parse,
                 model=config.llm_model,
                 messages=[
                     {
@@ -52,10 +55,23 @@ class OrganizationValidationTool(BaseTool):
                         "content": f"Find the matching organization for: {organization_input}"
                     }
                 ],
-                response_format=OrganizationValidation
+                response_format=OrganizationValidation,
+                fallback=lambda: self._closest_match(organization_input)
             )
+            if isinstance(completion, OrganizationValidation):
+                return completion
 
             return completion.choices[0].message.parsed
 
         except Exception as e:
-            return OrganizationValidation(organization_name=None) 
\ No newline at end of file
+            return OrganizationValidation(organization_name=None)
+
+    def _closest_match(self, organization_input: str) -> OrganizationValidation:
+        """Match the input against the known organizations locally, for when the LLM is unavailable."""
+        names = {name.casefold(): name for name in self.organizations}
+        text = organization_input.casefold()
+        for key, name in names.items():
+            if key in text:
+                return OrganizationValidation(organization_name=name)
+        matches = difflib.get_close_matches(text, list(names), n=1, cutoff=0.6)
+        return OrganizationValidation(organization_name=names[matches[0]] if matches else None)
@@ -1,9 +1,108 @@
-from typing import Dict, Any, Optional, List
+import threading
+from typing import Callable, Dict, Any, Optional, List
 from pydantic import Field
 
 from app.tools.base_tool import BaseTool
+from app.tools.date.date_parser import DateRange, parse_date_range, strip_date_expression
+from app.config.env_config import config
 from app.services.embeddings import EmbeddingService
+from app.services.result_dedup import near_duplicate_collapser
 from app.vectorstore.supabase_vectorstore import SupabaseVectorStore
+from app.telemetry.metrics import span
+
+
+# Text embedded in place of a missing or too-short preference
+EMPTY_PREFERENCE_TEXT = "empty string"
+
+
+def preference_text(input_str: Optional[str]) -> str:
+    """Return the text to embed for a preference input, substituting empty inputs."""
+    if input_str is not None and len(input_str.strip()) > 1:
+        return input_str
+    return EMPTY_PREFERENCE_TEXT
+
+
+class PreferenceProfile:
+    """
+    The preference texts of a session with their embeddings.
+
+    Preferences build up over a conversation, so most fields of a follow-up
+    search are unchanged; only fields whose text differs from the stored
+    one are sent to the embeddings API.
+    """
+
+    def __init__(self):
+        self._fields: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self.embedded = 0
+        self.reused = 0
+
+    def embed(self, texts: List[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Return the embedding of each field, embedding only the changed ones.
+
+        Args:
+            texts: The preference texts, one per field, in a fixed field order.
+            embed_fn: Embeds a list of texts in one call.
+
+        Returns:
+            One embedding per field.
+        """
+        with self._lock:
+            stored = dict(self._fields)
+        changed = [position for position, text in enumerate(texts)
+                   if position not in stored or stored[position][0] != text]
+        if changed:
+            vectors = embed_fn([texts[position] for position in changed])
+        with self._lock:
+            if changed:
+                for position, vector in zip(changed, vectors):
+                    stored[position] = self._fields[position] = (texts[position], vector)
+            self.embedded += len(changed)
+            self.reused += len(texts) - len(changed)
+        return [stored[position][1] for position in range(len(texts))]
+
+
+def resolve_date_range(user_input: str, start_date: Optional[str], end_date: Optional[str]) -> Optional[DateRange]:
+    """
+    Resolve the date range of a meeting search.
+
+    Explicit start/end dates from the LLM take precedence; otherwise the
+    range is parsed locally from the user input ("last week", "Q1", ...).
+
+    Args:
+        user_input: The user's query string.
+        start_date: Start of the range as YYYY-MM-DD, or empty.
+        end_date: End of the range as YYYY-MM-DD, or empty.
+
+    Returns:
+        The date range, or None if the search is not date restricted.
+    """
+    # Arguments the LLM leaves out arrive as their pydantic Field defaults
+    start_date = start_date.strip() if isinstance(start_date, str) else ""
+    end_date = end_date.strip() if isinstance(end_date, str) else ""
+    if start_date or end_date:
+        date_range = DateRange.from_string(f"{start_date}..{end_date}")
+        if date_range is not None:
+            return date_range
+    return parse_date_range(user_input)
+
+
+def format_meeting_results(results: Optional[List[Dict]], date_range: Optional[DateRange] = None) -> str:
+    """Format meeting rows as numbered documents for the agent."""
+    if not results:
+        if date_range is not None:
+            return f"No documents found between {date_range.start.isoformat()} and {date_range.end.isoformat()}."
+        return "No documents found."
+
+    formatted_results = []
+    for idx, doc in enumerate(results):
+        doc_lines = [f"Document {idx+1}:"]
+        for key, value in doc.items():
+            doc_lines.append(f"  {key}: {value}")
+        formatted_results.append("\n".join(doc_lines))
+
+    return "\n\n".join(formatted_results)
 
 
 class SearchMeetingsTool(BaseTool):
@@ -17,38 +116,41 @@ class SearchMeetingsTool(BaseTool):
         self.vector_store = vector_store
         self.embedding_service = embedding_service
     
-    def __call__(self, user_input: str = Field(
-        description="Input from the user, please include the organization name in the user_input as well. "
-                    "If user mentions date range, please include the date range in the user_input as well."
-    )) -> str:
+    def __call__(self,
+                user_input: str = Field(
+                    description="Input from the user, please include the organization name in the user_input as well. "
+                                "If user mentions date range, please include the date range in the user_input as well."
+                ),
+                start_date: str = Field(
+                    default="",
+                    description="Start of the date range the user mentions, as YYYY-MM-DD (optional)"
+                ),
+                end_date: str = Field(
+                    default="",
+                    description="End of the date range the user mentions, as YYYY-MM-DD (optional)"
+                )) -> str:
         """
         Search for meetings matching the user input.
         
         Args:
             user_input: The user's query string.
+            start_date: Start of the date range (YYYY-MM-DD); parsed from user_input if empty.
+            end_date: End of the date range (YYYY-MM-DD); parsed from user_input if empty.
             
         Returns:
             Formatted search results as a string.
         """
-        query_embedding = self.embedding_service.get_embedding(user_input)
+        date_range = resolve_date_range(user_input, start_date, end_date)
+        query_text = strip_date_expression(user_input, date_range)
+        query_embedding = self.embedding_service.get_embedding(query_text)
         user = self.vector_store.get_user()
         user_id = user.id
         
         # Call the Supabase RPC method for hybrid search
-        results = self.vector_store.search_meetings(user_input, query_embedding, user_id)
+        results = self.vector_store.search_meetings(query_text, query_embedding, user_id, date_range=date_range)
         
         # Process the returned list of documents
-        if not results:
-            return "No documents found."
-        
-        formatted_results = []
-        for idx, doc in enumerate(results):
-            doc_lines = [f"Document {idx+1}:"]
-            for key, value in doc.items():
-                doc_lines.append(f"  {key}: {value}")
-            formatted_results.append("\n".join(doc_lines))
-        
-        return "\n\n".join(formatted_results)
+        return format_meeting_results(results, date_range)
 
 
 class SearchMeetingsByOrganizationTool(BaseTool):
@@ -69,6 +171,14 @@ class SearchMeetingsByOrganizationTool(BaseTool):
                 ),
                 organization_input: str = Field(
                     description="The exact organization name to filter meetings by (should be validated first with ValidateOrganization)"
+                ),
+                start_date: str = Field(
+                    default="",
+                    description="Start of the date range the user mentions, as YYYY-MM-DD (optional)"
+                ),
+                end_date: str = Field(
+                    default="",
+                    description="End of the date range the user mentions, as YYYY-MM-DD (optional)"
                 )) -> str:
         """
         Search for meetings by organization.
@@ -76,43 +186,46 @@ class SearchMeetingsByOrganizationTool(BaseTool):
         Args:
             user_input: The user's query string.
             organization_input: The organization name to filter by.
+            start_date: Start of the date range (YYYY-MM-DD); parsed from user_input if empty.
+            end_date: End of the date range (YYYY-MM-DD); parsed from user_input if empty.
             
         Returns:
             Formatted search results as a string.
         """
-        query_embedding = self.embedding_service.get_embedding(user_input)
+        date_range = resolve_date_range(user_input, start_date, end_date)
+        query_text = strip_date_expression(user_input, date_range)
+        query_embedding = self.embedding_service.get_embedding(query_text)
         user = self.vector_store.get_user()
         user_id = user.id
         
         # Call the Supabase RPC method for organization-specific search
         results = self.vector_store.search_meetings_by_organization(
-            user_input, query_embedding, user_id, organization_input
+            query_text, query_embedding, user_id, organization_input, date_range=date_range
         )
         
         # Process the returned list of documents
-        if not results:
-            return "No documents found."
-        
-        formatted_results = []
-        for idx, doc in enumerate(results):
-            doc_lines = [f"Document {idx+1}:"]
-            for key, value in doc.items():
-                doc_lines.append(f"  {key}: {value}")
-            formatted_results.append("\n".join(doc_lines))
-        
-        return "\n\n".join(formatted_results)
+        return format_meeting_results(results, date_range)
+
+
+SEARCH_TRAVEL_TOOL_NAME = "SearchTravelPackages"
+SEARCH_TRAVEL_TOOL_DESCRIPTION = (
+    "Search for relevant travel packages based on multiple criteria. "
+    "Returns documents formatted from a list of dictionaries."
+)
 
 
 class SearchTravelPackagesTool(BaseTool):
     """Tool for searching travel packages in the database."""
     
-    def __init__(self, vector_store: SupabaseVectorStore, embedding_service: EmbeddingService):
-        super().__init__(
-            name="SearchTravelPackages",
-            description="Search for relevant travel packages based on multiple criteria. Returns documents formatted from a list of dictionaries."
-        )
+    def __init__(self,
+                 vector_store: SupabaseVectorStore,
+                 embedding_service: EmbeddingService,
+                 profile: Optional[PreferenceProfile] = None):
+        super().__init__(name=SEARCH_TRAVEL_TOOL_NAME, description=SEARCH_TRAVEL_TOOL_DESCRIPTION)
         self.vector_store = vector_store
         self.embedding_service = embedding_service
+        # Session preferences; unchanged fields are not re-embedded
+        self.profile = profile
     
     def __call__(self, 
                 location_input: str = Field(description="Location preferences or destination"),
@@ -142,35 +255,87 @@ class SearchTravelPackagesTool(BaseTool):
         Returns:
             List of travel package dictionaries matching the search criteria
         """
-        # Helper function to check if input is valid
-        def is_valid_input(input_str: str) -> bool:
-            return input_str is not None and len(input_str.strip()) > 1
-
-        # Get embeddings for each input, using "empty string" embedding if input is invalid
-        location_embedding = self.embedding_service.get_embedding(location_input) if is_valid_input(location_input) else self.embedding_service.get_embedding("empty string")
-        duration_embedding = self.embedding_service.get_embedding(duration_input) if is_valid_input(duration_input) else self.embedding_service.get_embedding("empty string")
-        budget_embedding = self.embedding_service.get_embedding(budget_input) if is_valid_input(budget_input) else self.embedding_service.get_embedding("empty string")
-        transportation_embedding = self.embedding_service.get_embedding(transportation_input) if is_valid_input(transportation_input) else self.embedding_service.get_embedding("empty string")
-        accommodation_embedding = self.embedding_service.get_embedding(accommodation_input) if is_valid_input(accommodation_input) else self.embedding_service.get_embedding("empty string")
-        food_embedding = self.embedding_service.get_embedding(food_input) if is_valid_input(food_input) else self.embedding_service.get_embedding("empty string")
-        activities_embedding = self.embedding_service.get_embedding(activities_input) if is_valid_input(activities_input) else self.embedding_service.get_embedding("empty string")
-        notes_embedding = self.embedding_service.get_embedding(notes_input) if is_valid_input(notes_input) else self.embedding_service.get_embedding("empty string")
-        
-        # Call the Supabase RPC method for travel package search
-        results = self.vector_store.search_travel_packages(
-            location_vector=location_embedding,
-            duration_vector=duration_embedding,
-            budget_vector=budget_embedding,
-            transportation_vector=transportation_embedding,
-            accommodation_vector=accommodation_embedding,
-            food_vector=food_embedding,
-            activities_vector=activities_embedding,
-            notes_vector=notes_embedding,
-            match_count=match_count
-        )
-        
+        embeddings = self.embed_preferences([location_input, duration_input, budget_input, transportation_input,
+                                             accommodation_input, food_input, activities_input, notes_input])
+        results = self.search_with_embeddings(embeddings, match_count, location_input=location_input)
+
         # Return the list of dictionaries directly
         if not results:
             return [] # Return empty list if no results
         
-        return results # Return the raw list of dictionaries 
\ No newline at end of file
+        return results # Return the raw list of dictionaries
+
+    def embed_preferences(self, inputs: List[Optional[str]]) -> List[List[float]]:
+        """
+        Embed the eight preference inputs in one batch.
+
+        Args:
+            inputs: Location, duration, budget, transportation, accommodation, food,
+                activities and notes preferences, in that order.
+
+        Returns:
+            One embedding per input; invalid inputs get the "empty string" embedding.
+            With a session profile, inputs unchanged since the last call reuse
+            their stored embedding.
+        """
+        texts = [preference_text(text) for text in inputs]
+        with span("search_tool.embed"):
+            if self.profile is not None:
+                return self.profile.embed(texts, self.embedding_service.get_embeddings)
+            return self.embedding_service.get_embeddings(texts)
+
+    def search_with_embeddings(self,
+                               embeddings: List[List[float]],
+                               match_count: int = 10,
+                               location_input: Optional[str] = None) -> List[Dict]:
+        """
+        Search travel packages with already computed preference embeddings.
+
+        Args:
+            embeddings: The eight preference embeddings from embed_preferences.
+            match_count: Number of results to return.
+            location_input: The location preference, used to pre-filter candidates by location.
+
+        Returns:
+            List of travel package dictionaries, best match first. With DEDUP_ENABLED,
+            near-duplicates are collapsed into their best-ranked package (listed in
+            its duplicate_ids).
+        """
+        # Without vectors to compare, over-fetching would only cost bigger RPC responses
+        if not config.dedup_enabled or not self.vector_store.travel_package_vectors_available():
+            return self._vector_search(embeddings, match_count, location_input)
+
+        # Over-fetch so that match_count packages remain once near-duplicates are collapsed
+        fetch_count = near_duplicate_collapser.fetch_count(match_count)
+        max_fetch_count = near_duplicate_collapser.max_fetch_count(match_count)
+        while True:
+            results = self._vector_search(embeddings, fetch_count, location_input)
+            with span("search_tool.dedup", candidates=len(results or [])):
+                vectors = self.vector_store.travel_package_vectors(results) if results else None
+                if vectors is None:
+                    return results[:match_count] if results else results
+                distinct = near_duplicate_collapser.collapse(results, vectors, match_count)
+            if len(distinct) >= match_count or len(results) < fetch_count or fetch_count >= max_fetch_count:
+                return distinct
+            fetch_count = min(fetch_count * 2, max_fetch_count)
+            near_duplicate_collapser.refetches += 1
+
+    def _vector_search(self, embeddings: List[List[float]], match_count: int, location_input: Optional[str]) -> List[Dict]:
+        """Run the vector search for match_count ranked packages."""
+        (location_embedding, duration_embedding, budget_embedding, transportation_embedding,
+         accommodation_embedding, food_embedding, activities_embedding, notes_embedding) = embeddings
+
+        # Call the Supabase RPC method for travel package search
+        with span("search_tool.vector_search", match_count=match_count):
+            return self.vector_store.search_travel_packages(
+                location_vector=location_embedding,
+                duration_vector=duration_embedding,
+                budget_vector=budget_embedding,
+                transportation_vector=transportation_embedding,
+                accommodation_vector=accommodation_embedding,
+                food_vector=food_embedding,
+                activities_vector=activities_embedding,
+                notes_vector=notes_embedding,
+                match_count=match_count,
+                location_input=location_input
+            )
@@ -1,4 +1,5 @@
 import base64
+import hashlib
 import os
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives import padding
@@ -68,4 +69,16 @@ def decrypt_password(encrypted_password: str) -> str:
     unpadder = padding.PKCS7(128).unpadder()
     data = unpadder.update(padded_data) + unpadder.finalize()
     
-    return data.decode('utf-8') 
\ No newline at end of file
+    return data.decode('utf-8') 
+
+def hash_token(token: str) -> str:
+    """
+    Hash an access token for use as a cache key, so the token itself is not kept.
+
+    Args:
+        token: The access token.
+
+    Returns:
+        The SHA-256 hex digest of the token.
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
@@ -1,4 +1,6 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+
+from app.models.request_models import TRAVEL_PACKAGE_REQUIRED_FIELDS, parse_highlights_value
 
 
 def create_response(message: Any, status_code: int, error: bool = False) -> Dict[str, Any]:
@@ -34,4 +36,34 @@ def validate_params(params: Dict[str, Any], required_params: List[str]) -> bool:
     for param in required_params:
         if param not in params:
             return False
-    return True 
\ No newline at end of file
+    return True 
+
+def project_travel_package(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Convert a raw travel package row into a TravelPackage response dictionary.
+
+    This is the precompiled equivalent of TravelPackage(**row).dict(): it keeps
+    only the response fields, coerces their types and parses highlights through
+    the shared cache, without building a Pydantic model per row.
+
+    Args:
+        row: A travel package row (extra columns such as vectors are ignored).
+
+    Returns:
+        The response dictionary, or None if a required field is missing or null.
+    """
+    for key in TRAVEL_PACKAGE_REQUIRED_FIELDS:
+        if row.get(key) is None:
+            return None
+    image_url = row.get('image_url')
+    return {
+        'id': str(row['id']),
+        'title': str(row['title']),
+        'provider_id': str(row['provider_id']),
+        'location_id': str(row['location_id']),
+        'price': float(row['price']),
+        'duration_days': int(row['duration_days']),
+        'highlights': parse_highlights_value(row['highlights']),
+        'description': str(row['description']),
+        'image_url': str(image_url) if image_url is not None else None,
+    }
@@ -0,0 +1,15 @@
+"""Helpers for reading free-text preferences."""
+import re
+from typing import Optional
+
+# Negations and exclusions ("I hate museums", "anywhere but Vietnam", "no flights")
+NEGATION_PATTERN = re.compile(
+    r"\b(?:not|no|never|none|nothing|without|hate|dislike|avoid(?:ing)?|except|excluding|"
+    r"anywhere but|other than|rather than|\w+n't)\b",
+    re.I
+)
+
+
+def is_negated(text: Optional[str]) -> bool:
+    """Whether a text negates or excludes something, so its terms must not be read as wishes."""
+    return bool(text) and NEGATION_PATTERN.search(text) is not None
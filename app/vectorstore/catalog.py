@@ -0,0 +1,337 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.config.env_config import config
+from app.config.supabase_config import get_service_supabase_client
+from app.services.process_pool import get_process_pool
+from app.vectorstore.catalog_snapshot import current_snapshot, open_snapshot
+from app.vectorstore.location_gazetteer import LocationGazetteer
+from app.vectorstore.meeting_search_engine import LocalMeetingVectorStore, MeetingSearchEngine
+from app.vectorstore.supabase_vectorstore import get_vector_store
+from app.vectorstore.travel_package_index import TravelPackageIndex
+
+logger = logging.getLogger(__name__)
+
+class CatalogRefresher:
+    """
+    Keeps the shared travel package index current without stalling searches.
+
+    Only the first load runs on a caller's thread. After that a daemon
+    thread checks every CATALOG_REFRESH_SECONDS for a new snapshot in
+    CATALOG_SNAPSHOT_DIR (or, without snapshots, a changed travel_packages
+    table), builds or maps the new index off to the side and publishes it
+    with a single reference assignment. Searches keep using the previous
+    index until the swap and never wait for a refresh.
+
+    The table is read with the service key, never a caller's token, so every
+    user searches the same catalog whoever triggered the load.
+    """
+
+    def __init__(self):
+        self._index: Optional[TravelPackageIndex] = None
+        self._snapshot_path: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._refreshed_at: Optional[float] = None
+        self._swapped_at: Optional[float] = None
+        self.checks = 0
+        self.swaps = 0
+        self.failures = 0
+
+    def get(self) -> TravelPackageIndex:
+        """
+        Return the active index, loading it on first use.
+
+        Returns:
+            The active TravelPackageIndex.
+        """
+        index = self._index
+        if index is not None:
+            return index
+        with self._lock:
+            if self._index is None:
+                self._index = self._load(None)
+                self._refreshed_at = self._swapped_at = time.time()
+                logger.info(f"Travel package index ready: {self._index.stats()}")
+            self.start()
+        return self._index
+
+    def start(self):
+        """Start the background refresh thread (if it is not running)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="catalog-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(config.catalog_refresh_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Catalog refresh failed, keeping version {self.active_version}: {e}")
+
+    def refresh(self) -> bool:
+        """
+        Check for a new catalog version and swap it in if there is one.
+
+        Returns:
+            True if a new index was swapped in.
+        """
+        self.checks += 1
+        index = self._load(self._index)
+        self._refreshed_at = time.time()
+        if index is None:
+            return False
+        previous = self._index
+        # Atomic reference swap: in-flight searches finish on the previous index
+        self._index = index
+        self._swapped_at = self._refreshed_at
+        self.swaps += 1
+        logger.info(
+            f"Swapped travel package index {previous.version if previous else None} -> {index.version}: "
+            f"{index.stats()}"
+        )
+        return True
+
+    def _load(self, current: Optional[TravelPackageIndex]) -> Optional[TravelPackageIndex]:
+        """Build the latest index, or return None if it is already the current one."""
+        snapshot_dir = config.catalog_snapshot_dir
+        path = current_snapshot(snapshot_dir) if snapshot_dir else None
+        if path is not None:
+            if current is not None and path == self._snapshot_path:
+                return None
+            started = time.perf_counter()
+            index = open_snapshot(path)
+            self._snapshot_path = path
+            logger.info(f"Mapped catalog snapshot {path} in {(time.perf_counter() - started) * 1000:.1f}ms")
+            return index
+
+        if snapshot_dir:
+            logger.warning(f"No catalog snapshot in {snapshot_dir}; loading travel packages from Supabase")
+        client = get_service_supabase_client()
+        if current is not None:
+            version = self._table_version(client)
+            if version is not None and version == current.version:
+                return None
+        self._snapshot_path = None
+        return TravelPackageIndex.load_from_supabase(
+            client,
+            page_size=config.catalog_page_size,
+            executor=get_process_pool(),
+            chunk_size=config.ingest_chunk_size
+        )
+
+    @staticmethod
+    def _table_version(client) -> Optional[str]:
+        """Return the version load_from_supabase would assign to the table now (row count and last update)."""
+        try:
+            response = (
+                client.table("travel_packages").select("last_updated", count="exact")
+                .order("last_updated", desc=True).limit(1).execute()
+            )
+        except Exception as e:
+            logger.warning(f"Could not read the travel_packages version, reloading the table: {e}")
+            return None
+        last_updated = (response.data or [{}])[0].get("last_updated")
+        if response.count is None or not last_updated:
+            return None
+        return f"{response.count}:{last_updated}"
+
+    @property
+    def active_version(self) -> Optional[str]:
+        """Version of the index searches currently use."""
+        return self._index.version if self._index is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the active version, refresh ages (seconds) and refresh counters."""
+        now = time.time()
+        index = self._index
+        return {
+            "version": self.active_version,
+            "packages": index.size if index is not None else 0,
+            "source": "snapshot" if self._snapshot_path else "supabase",
+            "snapshot": self._snapshot_path,
+            "refresh_age_seconds": round(now - self._refreshed_at, 3) if self._refreshed_at else None,
+            "version_age_seconds": round(now - self._swapped_at, 3) if self._swapped_at else None,
+            "checks": self.checks,
+            "swaps": self.swaps,
+            "failures": self.failures,
+        }
+
+
+catalog_refresher = CatalogRefresher()
+
+
+def get_travel_package_index() -> TravelPackageIndex:
+    """
+    Return the shared in-process travel package index, loading it if needed.
+
+    The index is kept current in the background by catalog_refresher; see
+    CatalogRefresher.
+
+    Returns:
+        The active TravelPackageIndex.
+    """
+    return catalog_refresher.get()
+
+
+_gazetteer: Optional[LocationGazetteer] = None
+_gazetteer_loaded_at = 0.0
+_gazetteer_lock = threading.Lock()
+
+
+def get_location_gazetteer() -> LocationGazetteer:
+    """
+    Return the shared location gazetteer, loading it if needed.
+
+    It is read with the service key and reloaded once it is older than
+    CATALOG_REFRESH_SECONDS. If the locations table cannot be read, an
+    empty gazetteer (which filters nothing) is used until the next reload.
+
+    Returns:
+        The current LocationGazetteer.
+    """
+    global _gazetteer, _gazetteer_loaded_at
+    if _gazetteer is not None and time.monotonic() - _gazetteer_loaded_at < config.catalog_refresh_seconds:
+        return _gazetteer
+
+    with _gazetteer_lock:
+        if _gazetteer is None or time.monotonic() - _gazetteer_loaded_at >= config.catalog_refresh_seconds:
+            try:
+                _gazetteer = LocationGazetteer.load_from_supabase(
+                    get_service_supabase_client(), table=config.location_table, page_size=config.catalog_page_size
+                )
+            except Exception as e:
+                logger.warning(f"Could not load the location gazetteer, searching without location filtering: {e}")
+                if _gazetteer is None:
+                    _gazetteer = LocationGazetteer({}, {})
+            _gazetteer_loaded_at = time.monotonic()
+    return _gazetteer
+
+
+class MeetingEngineRefresher:
+    """
+    Keeps the shared meeting search engine current without stalling searches.
+
+    As with CatalogRefresher, only the first load runs on a caller's thread.
+    A daemon thread then reloads the meeting table with the service key every
+    CATALOG_REFRESH_SECONDS and swaps the new engine in; if a reload fails,
+    searches keep using the previous engine.
+    """
+
+    def __init__(self):
+        self._engine: Optional[MeetingSearchEngine] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loaded_at: Optional[float] = None
+        self.reloads = 0
+        self.failures = 0
+
+    def get(self) -> MeetingSearchEngine:
+        """
+        Return the active engine, loading it on first use.
+
+        Returns:
+            The active MeetingSearchEngine.
+        """
+        engine = self._engine
+        if engine is not None:
+            return engine
+        with self._lock:
+            if self._engine is None:
+                self.refresh()
+            self.start()
+        return self._engine
+
+    def start(self):
+        """Start the background reload thread (if it is not running)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="meeting-engine-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background reload thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(config.catalog_refresh_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Meeting search engine reload failed, keeping the previous engine: {e}")
+
+    def refresh(self):
+        """Reload the meeting table and swap the new engine in."""
+        engine = MeetingSearchEngine.load_from_supabase(
+            get_service_supabase_client(), table=config.meeting_table, page_size=config.catalog_page_size,
+            date_columns=config.meeting_date_columns
+        )
+        # Atomic reference swap: in-flight searches finish on the previous engine
+        self._engine = engine
+        self._loaded_at = time.time()
+        self.reloads += 1
+        logger.info(f"Meeting search engine ready: {engine.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the engine's size, the age of the last reload (seconds) and reload counters."""
+        engine = self._engine
+        return {
+            **(engine.stats() if engine is not None else {}),
+            "age_seconds": round(time.time() - self._loaded_at, 3) if self._loaded_at else None,
+            "reloads": self.reloads,
+            "failures": self.failures,
+        }
+
+
+meeting_engine_refresher = MeetingEngineRefresher()
+
+
+def get_meeting_search_engine() -> MeetingSearchEngine:
+    """
+    Return the shared in-process meeting search engine, loading it if needed.
+
+    It is kept current in the background by meeting_engine_refresher. It
+    holds every user's meetings; searches are restricted to the caller's
+    partition.
+
+    Returns:
+        The active MeetingSearchEngine.
+    """
+    return meeting_engine_refresher.get()
+
+
+def get_meeting_vector_store(auth: str):
+    """
+    Return the store meeting search tools should use for a caller.
+
+    With MEETING_SEARCH_BACKEND=local, searches run in the in-process
+    hybrid engine; otherwise they go to the Supabase RPCs.
+
+    Args:
+        auth: The caller's access token (without the 'Bearer ' prefix).
+
+    Returns:
+        A SupabaseVectorStore or a LocalMeetingVectorStore.
+    """
+    store = get_vector_store(auth)
+    if config.meeting_search_backend != "local":
+        return store
+    # The engine is loaded on the first search, not when the store is created
+    return LocalMeetingVectorStore(
+        engine_provider=get_meeting_search_engine, user_resolver=store.get_user
+    )
@@ -0,0 +1,228 @@
+"""
+Memory-mapped snapshots of the travel package index.
+
+A snapshot is a directory with one normalized float32 ``<criterion>.npy``
+matrix per preference criterion, a columnar metadata file and a manifest::
+
+    <root>/CURRENT                      name of the active snapshot
+    <root>/<name>/manifest.json         version, size, dimensions, columns
+    <root>/<name>/<criterion>.npy       (N, d) float32, L2-normalized rows
+    <root>/<name>/metadata.npy          uint8, JSON values column by column
+    <root>/<name>/metadata_offsets.npy  (columns, N + 1) int64 offsets
+
+Workers open snapshots with ``np.load(mmap_mode="r")``, so opening costs
+no parsing and every worker on a host shares one physical copy of the
+matrices through the page cache. Package rows are decoded only when a
+search returns them.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import orjson
+
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA, TravelPackageIndex
+
+logger = logging.getLogger(__name__)
+
+# 2: metadata offsets record the start of every column (format 1 misread row 0 of all but the first)
+SNAPSHOT_FORMAT = 2
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+METADATA_FILE = "metadata.npy"
+OFFSETS_FILE = "metadata_offsets.npy"
+
+
+class ColumnarPackages(Sequence):
+    """
+    Read-only list of package rows backed by the columnar metadata file.
+
+    Each value is stored as JSON in a per-column block of one byte array;
+    rows are materialized as dicts on access.
+    """
+
+    def __init__(self, columns: List[str], data: np.ndarray, offsets: np.ndarray):
+        """
+        Args:
+            columns: Column names, in storage order.
+            data: uint8 array of JSON-encoded values.
+            offsets: (columns, N + 1) start offsets of each value in data.
+        """
+        self.columns = columns
+        self._data = data
+        self._offsets = offsets
+        self._size = offsets.shape[1] - 1 if offsets.ndim == 2 else 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def column(self, name: str) -> List:
+        """Decode one column for every row (None where a row has no value)."""
+        if name not in self.columns:
+            return [None] * self._size
+        column_index = self.columns.index(name)
+        offsets = self._offsets[column_index]
+        return [
+            orjson.loads(self._data[offsets[row]:offsets[row + 1]].tobytes()) if offsets[row + 1] > offsets[row] else None
+            for row in range(self._size)
+        ]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        row = {}
+        for column_index, column in enumerate(self.columns):
+            start, end = self._offsets[column_index, index], self._offsets[column_index, index + 1]
+            if end > start:
+                row[column] = orjson.loads(self._data[start:end].tobytes())
+        return row
+
+
+def _snapshot_name(version: str) -> str:
+    """Directory name for a catalog version (versions may contain ':' and timestamps)."""
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", version)
+
+
+def write_snapshot(index: TravelPackageIndex, root: str) -> str:
+    """
+    Write an index as a new snapshot and make it the current one.
+
+    The snapshot is written to a temporary directory and renamed into place,
+    then CURRENT is replaced atomically, so readers never see a partial
+    snapshot.
+
+    Args:
+        index: The index to write (matrices must be normalized).
+        root: The snapshot root directory.
+
+    Returns:
+        The path of the new snapshot directory.
+    """
+    os.makedirs(root, exist_ok=True)
+    base = name = _snapshot_name(index.version)
+    attempt = 1
+    while os.path.exists(os.path.join(root, name)):
+        attempt += 1
+        name = f"{base}-{attempt}"
+    path = os.path.join(root, name)
+    staging = os.path.join(root, f".{name}.tmp-{os.getpid()}")
+    os.makedirs(staging)
+
+    for criterion in TRAVEL_PACKAGE_CRITERIA:
+        matrix = np.ascontiguousarray(index.matrices[criterion], dtype=np.float32)
+        np.save(os.path.join(staging, f"{criterion}.npy"), matrix)
+
+    columns: List[str] = []
+    for package in index.packages:
+        for column in package:
+            if column not in columns:
+                columns.append(column)
+    blocks = []
+    offsets = np.zeros((len(columns), index.size + 1), dtype=np.int64)
+    position = 0
+    for column_index, column in enumerate(columns):
+        offsets[column_index, 0] = position
+        for row, package in enumerate(index.packages):
+            value = orjson.dumps(package[column]) if column in package else b""
+            blocks.append(value)
+            position += len(value)
+            offsets[column_index, row + 1] = position
+    np.save(os.path.join(staging, METADATA_FILE), np.frombuffer(b"".join(blocks), dtype=np.uint8))
+    np.save(os.path.join(staging, OFFSETS_FILE), offsets)
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": index.version,
+        "size": index.size,
+        "dimensions": index.dimensions,
+        "criteria": TRAVEL_PACKAGE_CRITERIA,
+        "columns": columns,
+        "created_at": time.time(),
+    }
+    with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+    os.rename(staging, path)
+    current = os.path.join(root, f".{CURRENT_FILE}.tmp-{os.getpid()}")
+    with open(current, "w") as f:
+        f.write(name)
+    os.replace(current, os.path.join(root, CURRENT_FILE))
+    logger.info(f"Wrote catalog snapshot {name}: {index.size} packages")
+    return path
+
+
+def current_snapshot(root: str) -> Optional[str]:
+    """Return the path of the current snapshot under a root, or None if there is none."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(root, name) if name else None
+
+
+def open_snapshot(path: str) -> TravelPackageIndex:
+    """
+    Open a snapshot directory as a read-only, memory-mapped index.
+
+    Args:
+        path: A snapshot directory (or a root containing CURRENT).
+
+    Returns:
+        A TravelPackageIndex whose matrices and metadata are memory-mapped.
+    """
+    if os.path.isfile(os.path.join(path, CURRENT_FILE)):
+        path = current_snapshot(path)
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported catalog snapshot format {manifest.get('format')} in {path}")
+
+    matrices: Dict[str, np.ndarray] = {
+        criterion: np.load(os.path.join(path, f"{criterion}.npy"), mmap_mode="r")
+        for criterion in manifest["criteria"]
+    }
+    packages = ColumnarPackages(
+        manifest["columns"],
+        np.load(os.path.join(path, METADATA_FILE), mmap_mode="r"),
+        np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r"),
+    )
+    index = TravelPackageIndex(packages, matrices, version=manifest["version"])
+    index.snapshot_path = path
+    return index
+
+
+def prune_snapshots(root: str, keep: int = 2):
+    """
+    Delete old snapshots, keeping the current one and the newest others.
+
+    Workers still mapping a deleted snapshot keep reading it until they
+    reopen, since unlinked files stay valid while mapped.
+
+    Args:
+        root: The snapshot root directory.
+        keep: Number of snapshots to keep, including the current one.
+    """
+    current = current_snapshot(root)
+    snapshots = sorted(
+        (os.path.join(root, name) for name in os.listdir(root)
+         if not name.startswith(".") and os.path.isfile(os.path.join(root, name, MANIFEST_FILE))),
+        key=os.path.getmtime, reverse=True
+    )
+    kept = [current] if current else []
+    for path in snapshots:
+        if path in kept:
+            continue
+        if len(kept) < keep:
+            kept.append(path)
+        else:
+            shutil.rmtree(path, ignore_errors=True)
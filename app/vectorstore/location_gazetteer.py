@@ -0,0 +1,186 @@
+"""
+Location gazetteer for structured geographic filtering of travel packages.
+
+Built from the locations table as a country -> region -> city hierarchy.
+Every node is reachable by its name and aliases. A location preference
+such as "Da Nang or Hoi An" or "somewhere in Vietnam" resolves to the set
+of location_ids under the names it mentions. The in-process index then
+scores only packages at those locations.
+
+A place name only filters when it is used as a place: "Nice" or "beaches
+in Nice" do, but "a nice beach" does not, and neither does a negated
+preference such as "anywhere but Vietnam".
+"""
+import logging
+import re
+import unicodedata
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from app.utils.text_utils import is_negated
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+# Words after which a name is used as a place ("beaches in Nice", "a trip to Bali")
+_LOCATIVE_WORDS = frozenset({
+    "in", "to", "near", "around", "at", "visit", "visiting", "explore", "exploring", "across", "throughout",
+})
+# Words that may surround place names without changing what they name
+# ("somewhere in Vietnam", "Da Nang or Hoi An", "the south of France")
+_FILLER_WORDS = _LOCATIVE_WORDS | frozenset({
+    "or", "and", "the", "a", "of", "somewhere", "anywhere", "maybe", "either", "city", "region", "area",
+    "country", "north", "south", "east", "west", "central", "northern", "southern", "eastern", "western",
+})
+
+
+def normalize_place(text: str) -> Tuple[str, ...]:
+    """Lowercase, strip accents and punctuation, and split a place name into tokens."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).replace("đ", "d").replace("Đ", "D")
+    return tuple(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def _values(value) -> List[str]:
+    """A text or text[] column as a list of non-empty strings."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(",") if part.strip()]
+    return [str(part).strip() for part in value if str(part).strip()]
+
+
+class LocationGazetteer:
+    """
+    Alias lookup over the location hierarchy.
+
+    Names are stored as token tuples in a hash map. A text is resolved by
+    scanning its tokens for the longest known name at each position, so
+    multi-word names ("Ho Chi Minh City") win over their parts. A name
+    counts when it follows a locative word ("in", "to", ...) or another
+    counted name joined by "or"/"and", or when the text names nothing but
+    places.
+    """
+
+    def __init__(self, aliases: Dict[Tuple[str, ...], FrozenSet[str]], hierarchy: Dict[str, Dict[str, Set[str]]]):
+        """
+        Args:
+            aliases: Normalized name -> location_ids it covers.
+            hierarchy: Country -> region -> city names (for stats and debugging).
+        """
+        self.aliases = aliases
+        self.hierarchy = hierarchy
+        self.max_tokens = max((len(alias) for alias in aliases), default=0)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict]) -> "LocationGazetteer":
+        """
+        Build the gazetteer from locations rows.
+
+        Uses the id, name and country columns, plus region and aliases
+        (text or text[]) where the table has them.
+
+        Args:
+            rows: Rows of the locations table.
+
+        Returns:
+            A new LocationGazetteer.
+        """
+        aliases: Dict[Tuple[str, ...], Set[str]] = {}
+        hierarchy: Dict[str, Dict[str, Set[str]]] = {}
+
+        def add(name: str, location_id: str):
+            key = normalize_place(name)
+            if key:
+                aliases.setdefault(key, set()).add(location_id)
+
+        for row in rows:
+            location_id = row.get("id")
+            name = row.get("name")
+            if location_id is None or not name:
+                continue
+            location_id = str(location_id)
+            country = row.get("country") or ""
+            region = row.get("region") or ""
+            hierarchy.setdefault(country, {}).setdefault(region, set()).add(name)
+            for alias in [name, country, region] + _values(row.get("aliases")):
+                if alias:
+                    add(alias, location_id)
+
+        logger.info(f"Location gazetteer ready: {len(hierarchy)} countries, {len(aliases)} names")
+        return cls({key: frozenset(ids) for key, ids in aliases.items()}, hierarchy)
+
+    @classmethod
+    def load_from_supabase(cls, client, table: str = "locations", page_size: int = 1000) -> "LocationGazetteer":
+        """
+        Load the locations table, page by page.
+
+        Args:
+            client: A Supabase client allowed to read the table.
+            table: Name of the locations table.
+            page_size: Number of rows fetched per request.
+
+        Returns:
+            A new LocationGazetteer.
+        """
+        rows = []
+        start = 0
+        while True:
+            response = client.table(table).select("*").range(start, start + page_size - 1).execute()
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                break
+            start += page_size
+        return cls.from_rows(rows)
+
+    def resolve(self, text: Optional[str]) -> Optional[FrozenSet[str]]:
+        """
+        Resolve a location preference to location_ids.
+
+        Args:
+            text: The user's location input.
+
+        Returns:
+            The location_ids of every place named in the text, or None if it
+            names no known place, uses names as ordinary words, or is negated
+            (the search should not be filtered).
+        """
+        if not text or not self.aliases or is_negated(text):
+            return None
+        tokens = normalize_place(text)
+        located: Set[str] = set()
+        found: Set[str] = set()
+        places_only = True
+        # Whether a name at this position is used as a place
+        locative = False
+        position = 0
+        while position < len(tokens):
+            for length in range(min(self.max_tokens, len(tokens) - position), 0, -1):
+                ids = self.aliases.get(tokens[position:position + length])
+                if ids is not None:
+                    found.update(ids)
+                    if locative:
+                        located.update(ids)
+                    position += length
+                    break
+            else:
+                token = tokens[position]
+                if token in _LOCATIVE_WORDS:
+                    locative = True
+                elif token not in ("or", "and"):
+                    locative = False
+                places_only = places_only and token in _FILLER_WORDS
+                position += 1
+        if found and places_only:
+            return frozenset(found)
+        return frozenset(located) if located else None
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of countries, regions, cities and names."""
+        return {
+            "countries": len(self.hierarchy),
+            "regions": sum(1 for regions in self.hierarchy.values() for region in regions if region),
+            "cities": sum(len(cities) for regions in self.hierarchy.values() for cities in regions.values()),
+            "names": len(self.aliases),
+        }
@@ -0,0 +1,410 @@
+import logging
+import re
+from collections import Counter
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.tools.date.date_parser import DateRange, as_date
+from app.vectorstore.travel_package_index import normalize_rows, parse_vector
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Day number stored for meetings without a date
+_NO_DATE = -1
+_EMPTY = np.zeros(0, dtype=np.int64)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+    "about what when where which who how did do does we our you your i me my".split()
+)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lower-case word tokens of a text, without stopwords."""
+    return [token for token in _TOKEN_PATTERN.findall((text or "").lower()) if token not in _STOPWORDS]
+
+
+class BM25Index:
+    """
+    Inverted index with Okapi BM25 scoring.
+
+    Postings are stored as flat NumPy arrays sorted by term, so scoring a
+    query is a few vectorized operations per query term.
+    """
+
+    def __init__(self, documents: Sequence[List[str]], k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            documents: Tokenized documents.
+            k1: Term frequency saturation.
+            b: Document length normalization.
+        """
+        self.k1 = k1
+        self.b = b
+        self.size = len(documents)
+        self.vocabulary: Dict[str, int] = {}
+        term_ids, doc_ids, frequencies = [], [], []
+        for doc_id, tokens in enumerate(documents):
+            for token, count in Counter(tokens).items():
+                term_ids.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+                doc_ids.append(doc_id)
+                frequencies.append(count)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)[order]
+        self.frequencies = np.asarray(frequencies, dtype=np.float32)[order]
+        self.offsets = np.searchsorted(term_ids[order], np.arange(len(self.vocabulary) + 1))
+
+        self.doc_lengths = np.asarray([len(tokens) for tokens in documents], dtype=np.float32)
+        average_length = float(self.doc_lengths.mean()) if self.size else 0.0
+        self._length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / (average_length or 1.0))
+        document_frequency = np.diff(self.offsets).astype(np.float32)
+        self.idf = np.log1p((self.size - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def score(self, query_tokens: Iterable[str]) -> np.ndarray:
+        """
+        Score every document against a tokenized query.
+
+        Args:
+            query_tokens: Query tokens (repeated tokens count once).
+
+        Returns:
+            (N,) float32 BM25 scores; 0 for documents without any query term.
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        for token in set(query_tokens):
+            term_id = self.vocabulary.get(token)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.frequencies[start:end]
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self._length_norm[docs])
+        return scores
+
+
+def reciprocal_rank_fusion(rankings: Sequence[np.ndarray], k: int = 60) -> Dict[int, float]:
+    """
+    Fuse ranked lists of document indices with reciprocal rank fusion.
+
+    Args:
+        rankings: Ranked document indices, best first, one array per retriever.
+        k: RRF constant; larger values flatten the contribution of top ranks.
+
+    Returns:
+        Fused score per document index.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking.tolist(), start=1):
+            fused[doc] = fused.get(doc, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+class MeetingSearchEngine:
+    """
+    In-process hybrid (BM25 + vector) search over meeting documents.
+
+    Documents are partitioned by organization, by user and by calendar
+    month, so filtered searches only score their own partitions. Keyword
+    and vector rankings are combined with reciprocal rank fusion.
+    """
+
+    def __init__(self,
+                 rows: Sequence[Dict],
+                 text_columns: Sequence[str] = ("title", "content"),
+                 embedding_column: str = "embedding",
+                 organization_column: str = "organization",
+                 user_column: str = "user_id",
+                 date_columns: Sequence[str] = ("meeting_date", "created_at"),
+                 candidate_count: int = 100,
+                 rrf_k: int = 60):
+        """
+        Args:
+            rows: Meeting rows, e.g. as returned by PostgREST.
+            text_columns: Columns indexed for keyword search.
+            embedding_column: Column holding the meeting embedding (pgvector string or list).
+            organization_column: Column used for the per-organization partitions.
+            user_column: Column used for the per-user partitions.
+            date_columns: Columns holding the meeting date, in order of preference;
+                used for the per-month partitions.
+            candidate_count: Number of results taken from each retriever before fusion.
+            rrf_k: Reciprocal rank fusion constant.
+        """
+        self.candidate_count = candidate_count
+        self.rrf_k = rrf_k
+        self.documents: List[Dict] = []
+        vectors = []
+        for row in rows:
+            vector = parse_vector(row.get(embedding_column))
+            if vector is None:
+                logger.warning(f"Skipping meeting {row.get('id')} without an embedding")
+                continue
+            vectors.append(vector)
+            self.documents.append({key: value for key, value in row.items() if key != embedding_column})
+
+        self.size = len(self.documents)
+        self.vectors = normalize_rows(np.vstack(vectors)) if vectors else np.zeros((0, 0), dtype=np.float32)
+        self.bm25 = BM25Index([
+            tokenize(" ".join(str(document.get(column) or "") for column in text_columns))
+            for document in self.documents
+        ])
+        self.organizations = self._partition(organization_column, normalize=True)
+        self.users = self._partition(user_column)
+        self._has_users = bool(self.users)
+        self._partition_dates(date_columns)
+
+    def _partition(self, column: str, normalize: bool = False) -> Dict[str, np.ndarray]:
+        groups: Dict[str, List[int]] = {}
+        for index, document in enumerate(self.documents):
+            value = document.get(column)
+            if value is None:
+                continue
+            key = self._normalize_key(value) if normalize else str(value)
+            groups.setdefault(key, []).append(index)
+        return {key: np.asarray(indices, dtype=np.int64) for key, indices in groups.items()}
+
+    def _partition_dates(self, date_columns: Sequence[str]):
+        """Build the per-month partitions: month number (year * 12 + month - 1) -> document indices."""
+        days = np.full(self.size, _NO_DATE, dtype=np.int64)
+        for index, document in enumerate(self.documents):
+            day = next((as_date(document[column]) for column in date_columns if document.get(column)), None)
+            if day is not None:
+                days[index] = day.toordinal()
+        self.days = days
+
+        groups: Dict[int, List[int]] = {}
+        for index in np.flatnonzero(days != _NO_DATE).tolist():
+            day = date.fromordinal(int(days[index]))
+            groups.setdefault(day.year * 12 + day.month - 1, []).append(index)
+        self.months = {month: np.asarray(indices, dtype=np.int64) for month, indices in groups.items()}
+        self._month_keys = np.asarray(sorted(self.months), dtype=np.int64)
+        self._undated = np.flatnonzero(days == _NO_DATE)
+
+    def _in_date_range(self, date_range: DateRange) -> np.ndarray:
+        """
+        Sorted indices of the documents a date-filtered search may return.
+
+        Dated documents are read from the overlapping month partitions.
+        Undated documents are always included, since they cannot be ruled
+        out; the Supabase backend keeps them too.
+        """
+        first = date_range.start.year * 12 + date_range.start.month - 1
+        last = date_range.end.year * 12 + date_range.end.month - 1
+        keys = self._month_keys[(self._month_keys >= first) & (self._month_keys <= last)]
+        if keys.size == 0:
+            return self._undated
+        indices = np.sort(np.concatenate([self.months[int(key)] for key in keys]))
+        # Only the first and last month can hold documents outside the range
+        days = self.days[indices]
+        dated = indices[(days >= date_range.start.toordinal()) & (days <= date_range.end.toordinal())]
+        return np.union1d(dated, self._undated)
+
+    @staticmethod
+    def _normalize_key(value: Any) -> str:
+        return " ".join(str(value).casefold().split())
+
+    def _candidates(self, user_id: Optional[str], organization: Optional[str],
+                    date_range: Optional[DateRange] = None) -> Optional[np.ndarray]:
+        """Document indices a search may return, or None for all documents."""
+        candidates = None
+        if user_id is not None:
+            # The engine is loaded with the service key and holds every user's
+            # meetings: without owners to partition by, nothing is returned.
+            if not self._has_users:
+                logger.warning("Meeting rows have no owner column, refusing a per-user search")
+                return _EMPTY
+            candidates = self.users.get(str(user_id), _EMPTY)
+        if organization is not None:
+            members = self.organizations.get(self._normalize_key(organization), _EMPTY)
+            candidates = members if candidates is None else np.intersect1d(candidates, members, assume_unique=True)
+        if date_range is not None:
+            members = self._in_date_range(date_range)
+            candidates = members if candidates is None else np.intersect1d(candidates, members, assume_unique=True)
+        return candidates
+
+    def search(self,
+               query_text: str,
+               query_embedding: Sequence[float],
+               user_id: Optional[str] = None,
+               organization: Optional[str] = None,
+               match_count: int = 20,
+               date_range: Optional[DateRange] = None) -> List[Dict]:
+        """
+        Hybrid search within the caller's partition.
+
+        Args:
+            query_text: The text query (keyword retriever).
+            query_embedding: The query embedding (vector retriever).
+            user_id: Restrict to this user's meetings (none are returned if meetings have no owners).
+            organization: Restrict to this organization's meetings.
+            match_count: Maximum number of results.
+            date_range: Restrict to meetings dated within this range (undated meetings are kept).
+
+        Returns:
+            Matching meeting rows, best first, each with its fused "score".
+        """
+        candidates = self._candidates(user_id, organization, date_range)
+        if self.size == 0 or (candidates is not None and candidates.size == 0):
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        query = query / norm if norm else query
+        text_scores = self.bm25.score(tokenize(query_text))
+        if candidates is None:
+            vector_scores = self.vectors @ query
+        else:
+            # Only the candidate partitions are scored against the query vector
+            text_scores, vector_scores = text_scores[candidates], self.vectors[candidates] @ query
+
+        rankings = [
+            self._top(vector_scores, self.candidate_count),
+            self._top(text_scores, self.candidate_count, positive_only=True),
+        ]
+        fused = reciprocal_rank_fusion(rankings, self.rrf_k)
+        best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:match_count]
+
+        results = []
+        for position, score in best:
+            index = int(candidates[position]) if candidates is not None else position
+            results.append(dict(self.documents[index], score=score))
+        return results
+
+    @staticmethod
+    def _top(scores: np.ndarray, k: int, positive_only: bool = False) -> np.ndarray:
+        """Positions of the k highest scores, best first."""
+        if positive_only:
+            positions = np.flatnonzero(scores > 0)
+            if positions.size > k:
+                positions = positions[np.argpartition(-scores[positions], k - 1)[:k]]
+            return positions[np.argsort(-scores[positions], kind="stable")]
+        k = min(k, scores.size)
+        positions = np.argpartition(-scores, k - 1)[:k] if scores.size > k else np.arange(scores.size)
+        return positions[np.argsort(-scores[positions], kind="stable")]
+
+    @classmethod
+    def load_from_supabase(cls, client, table: str = "meetings", page_size: int = 1000, **kwargs) -> "MeetingSearchEngine":
+        """
+        Load a meeting table page by page and index it.
+
+        Args:
+            client: A Supabase client allowed to read the table.
+            table: The meeting table name.
+            page_size: Number of rows fetched per request.
+            kwargs: Column and fusion settings for the engine.
+
+        Returns:
+            A new MeetingSearchEngine.
+        """
+        rows = []
+        start = 0
+        while True:
+            page = client.table(table).select("*").range(start, start + page_size - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                break
+            start += page_size
+        logger.info(f"Loaded {len(rows)} meetings into the in-process search engine")
+        return cls(rows, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of indexed meetings, terms and partitions."""
+        return {
+            "meetings": self.size,
+            "terms": len(self.bm25.vocabulary),
+            "organizations": len(self.organizations),
+            "users": len(self.users),
+            "months": len(self.months),
+        }
+
+
+class LocalMeetingVectorStore:
+    """
+    Drop-in replacement for the meeting methods of SupabaseVectorStore,
+    answered by an in-process MeetingSearchEngine.
+
+    Unlike the RPCs, the user ID passed by the search tools is honoured:
+    results are restricted to the user's partition.
+    """
+
+    def __init__(self, engine: Optional[MeetingSearchEngine] = None, user: Any = None, user_resolver=None,
+                 engine_provider: Optional[Callable[[], MeetingSearchEngine]] = None):
+        """
+        Args:
+            engine: The meeting search engine.
+            user: Fixed user object returned by get_user (e.g. in tests).
+            user_resolver: Callable returning the current user (e.g. SupabaseVectorStore.get_user).
+            engine_provider: Callable returning the current engine, used instead of `engine`
+                so that each search sees the latest reload.
+        """
+        self._engine = engine
+        self._engine_provider = engine_provider
+        self._user = user
+        self._user_resolver = user_resolver
+
+    @property
+    def engine(self) -> MeetingSearchEngine:
+        """The engine searches run against."""
+        return self._engine_provider() if self._engine_provider is not None else self._engine
+
+    def get_user(self):
+        """
+        Return the current user.
+
+        Raises:
+            PermissionError: If there is no user; a search without one would
+                not be restricted to the caller's partition.
+        """
+        if self._user is None and self._user_resolver is not None:
+            self._user = self._user_resolver()
+        if self._user is None or getattr(self._user, "id", None) is None:
+            raise PermissionError("No signed-in user to restrict the meeting search to")
+        return self._user
+
+    def search_meetings(self, query_text: str, query_embedding: list,
+                        user_id: str, match_count: int = 20,
+                        date_range: Optional[DateRange] = None):
+        """
+        Perform a hybrid search on the content.
+
+        Args:
+            query_text: The text query.
+            query_embedding: The embedding vector for the query.
+            user_id: The ID of the current user.
+            match_count: The maximum number of results to return.
+            date_range: Only return meetings dated within this range.
+
+        Returns:
+            List of matching documents.
+        """
+        return self.engine.search(
+            query_text, query_embedding, user_id=user_id, match_count=match_count, date_range=date_range
+        )
+
+    def search_meetings_by_organization(self, query_text: str, query_embedding: list,
+                                        user_id: str,
+                                        organization_input: str,
+                                        match_count: int = 20,
+                                        date_range: Optional[DateRange] = None):
+        """
+        Perform search by organization.
+
+        Args:
+            query_text: The text query.
+            query_embedding: The embedding vector for the query.
+            user_id: The ID of the current user.
+            organization_input: The organization name to filter by.
+            match_count: The maximum number of results to return.
+            date_range: Only return meetings dated within this range.
+
+        Returns:
+            List of matching documents.
+        """
+        return self.engine.search(
+            query_text, query_embedding, user_id=user_id,
+            organization=organization_input, match_count=match_count, date_range=date_range
+        )
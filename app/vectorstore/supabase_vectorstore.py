@@ -2,11 +2,26 @@ import logging
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
+import numpy as np
+
+from app.config.env_config import config
 from app.config.supabase_config import get_supabase_client
+from app.services.resilience import supabase_calls
+from app.tools.date.date_parser import DateRange, as_date
+from app.utils.crypto_utils import hash_token
+from app.utils.lru import TTLCache
+from app.utils.single_flight import SingleFlight
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA, normalize_rows
+from app.telemetry.metrics import span
 
 
 class SupabaseVectorStore:
     """Interface to Supabase vector store for meeting data."""
+
+    # Shared across instances: a new store is created per request, but identical
+    # concurrent travel package searches should still hit the RPC only once.
+    # travel_packages is a shared catalog, so the key does not include the caller.
+    _travel_search_inflight = SingleFlight("search_travel_packages")
     
     def __init__(self, url: str, key: str, auth: str = None):
         self.url = url
@@ -21,18 +36,21 @@ class SupabaseVectorStore:
         If an auth header is provided, add it to the global headers so that row-level security (RLS)
         policies are applied using the user's context.
         """
-        return get_supabase_client(self.auth)
+        with span("vector_store.create_client"):
+            return get_supabase_client(self.auth)
 
     def get_user(self):
         """
         Retrieve the user from Supabase Auth.
         """
         token = self.auth.replace("Bearer ", "")
-        user_response = self.client.auth.get_user(token)        
+        with span("vector_store.get_user"):
+            user_response = supabase_calls.call(self.client.auth.get_user, token)
         return user_response.user
 
     def search_meetings(self, query_text: str, query_embedding: list, 
-                        user_id: str, match_count: int = 20):
+                        user_id: str, match_count: int = 20,
+                        date_range: Optional[DateRange] = None):
         """
         Perform a hybrid search on the content.
         
@@ -41,22 +59,25 @@ class SupabaseVectorStore:
             query_embedding: The embedding vector for the query.
             user_id: The ID of the current user.
             match_count: The maximum number of results to return.
+            date_range: Only return meetings dated within this range.
             
         Returns:
             List of matching documents.
         """
-        response = self.client.rpc("hybrid_search_meetings", {
-            "query_text": query_text,
-            "query_embedding": query_embedding,
-            # "user_id_input": user_id,
-            "match_count": match_count
-        }).execute()
-        return response.data
+        with span("vector_store.search_meetings"):
+            response = supabase_calls.call(self.client.rpc("hybrid_search_meetings", {
+                "query_text": query_text,
+                "query_embedding": query_embedding,
+                # "user_id_input": user_id,
+                "match_count": self._fetch_count(match_count, date_range)
+            }).execute)
+        return self._filter_by_date(response.data, date_range, match_count)
     
     def search_meetings_by_organization(self, query_text: str, query_embedding: list, 
                                         user_id: str, 
                                         organization_input: str, 
-                                        match_count: int = 20):
+                                        match_count: int = 20,
+                                        date_range: Optional[DateRange] = None):
         """
         Perform search by organization.
         
@@ -66,18 +87,52 @@ class SupabaseVectorStore:
             user_id: The ID of the current user.
             organization_input: The organization name to filter by.
             match_count: The maximum number of results to return.
+            date_range: Only return meetings dated within this range.
             
         Returns:
             List of matching documents.
         """
-        response = self.client.rpc("hybrid_search_meetings_organization", {
-            "query_text": query_text,
-            "query_embedding": query_embedding,
-            "match_count": match_count,
-            "organization_input": organization_input
-            # "user_id_input": user_id,
-        }).execute()
-        return response.data 
+        with span("vector_store.search_meetings_by_organization"):
+            response = supabase_calls.call(self.client.rpc("hybrid_search_meetings_organization", {
+                "query_text": query_text,
+                "query_embedding": query_embedding,
+                "match_count": self._fetch_count(match_count, date_range),
+                "organization_input": organization_input
+                # "user_id_input": user_id,
+            }).execute)
+        return self._filter_by_date(response.data, date_range, match_count)
+
+    @staticmethod
+    def _fetch_count(match_count: int, date_range: Optional[DateRange]) -> int:
+        """Over-fetch when results are date filtered after the RPC (the RPCs take no date arguments)."""
+        return match_count * config.meeting_date_overfetch if date_range else match_count
+
+    @staticmethod
+    def _filter_by_date(rows: Optional[List[Dict]], date_range: Optional[DateRange], match_count: int) -> List[Dict]:
+        """
+        Keep the meetings dated within a range.
+
+        Rows without a date in any of MEETING_DATE_COLUMNS are kept, since
+        they cannot be ruled out.
+
+        Args:
+            rows: Meeting rows returned by an RPC.
+            date_range: The requested range, or None to keep every row.
+            match_count: The maximum number of rows to return.
+
+        Returns:
+            At most match_count rows, in RPC order.
+        """
+        if not rows or date_range is None:
+            return rows or []
+        kept = []
+        for row in rows:
+            day = next((as_date(row[column]) for column in config.meeting_date_columns if row.get(column)), None)
+            if day is None or date_range.contains(day):
+                kept.append(row)
+                if len(kept) == match_count:
+                    break
+        return kept
 
     def search_travel_packages(self, 
                              location_vector: list,
@@ -88,7 +143,8 @@ class SupabaseVectorStore:
                              food_vector: list,
                              activities_vector: list,
                              notes_vector: list,
-                             match_count: int = 10):
+                             match_count: int = 10,
+                             location_input: Optional[str] = None):
         """
         Search for travel packages based on multiple vector criteria.
         
@@ -102,11 +158,14 @@ class SupabaseVectorStore:
             activities_vector: Vector embedding for activities preferences
             notes_vector: Vector embedding for additional notes/preferences
             match_count: Maximum number of results to return
+            location_input: The location preference text. Only the local backend uses
+                it, to score just the packages at the locations it names; the RPC
+                has no location argument, so with the default backend it is unused.
             
         Returns:
             List of matching travel packages
         """
-        response = self.client.rpc("search_travel_packages", {
+        params = {
             "location_vector_input": location_vector,
             "duration_vector_input": duration_vector,
             "budget_vector_input": budget_vector,
@@ -116,5 +175,143 @@ class SupabaseVectorStore:
             "activities_vector_input": activities_vector,
             "notes_vector_input": notes_vector,
             "match_count": match_count
-        }).execute()
-        return response.data 
\ No newline at end of file
+        }
+        if config.travel_search_backend == "local":
+            return self._local_search_travel_packages(params, location_input)
+        if not config.single_flight_enabled:
+            return self._rpc_search_travel_packages(params)
+
+        key = tuple(
+            tuple(value) if isinstance(value, list) else value
+            for value in params.values()
+        )
+        results = self._travel_search_inflight.do(key, self._rpc_search_travel_packages, params)
+        # Coalesced callers share the leader's rows; hand each caller its own
+        # copies so that per-request mutation (e.g. popping combined_score) is safe.
+        return [dict(row) for row in results] if results else results
+
+    def _rpc_search_travel_packages(self, params: Dict[str, Any]):
+        """
+        Execute the search_travel_packages RPC.
+
+        While Supabase is unavailable, the in-process travel package index
+        answers instead if it has already been loaded.
+        """
+        with span("vector_store.search_travel_packages_rpc", match_count=params["match_count"]):
+            request = self.client.rpc("search_travel_packages", params)
+            # Leave out the eight vector columns: they are most of each row's size
+            if config.travel_search_rpc_columns:
+                request = request.select(config.travel_search_rpc_columns)
+            response = supabase_calls.call(
+                request.execute,
+                fallback=lambda: self._fallback_search_travel_packages(params)
+            )
+        return response if isinstance(response, list) else response.data
+
+    def _fallback_search_travel_packages(self, params: Dict[str, Any]):
+        """Search the in-process index, without loading it (loading needs Supabase too)."""
+        from app.vectorstore.catalog import catalog_refresher
+
+        if catalog_refresher.active_version is None:
+            raise LookupError("the travel package index is not loaded")
+        return self._local_search_travel_packages(params)
+
+    def _local_search_travel_packages(self, params: Dict[str, Any], location_input: Optional[str] = None):
+        """
+        Rank the in-process (memory-mapped) travel package index with the RPC's weights.
+
+        With a location_input that names known places, only packages at those
+        locations are scored (see TravelPackageIndex.candidate_rows).
+        """
+        # Imported here: the catalog module builds SupabaseVectorStore instances
+        from app.vectorstore.catalog import get_location_gazetteer, get_travel_package_index
+
+        index = get_travel_package_index()
+        query_vectors = {
+            criterion: normalize_rows(np.asarray([params[f"{criterion}_vector_input"]], dtype=np.float32))
+            for criterion in TRAVEL_PACKAGE_CRITERIA
+        }
+        rows = None
+        if location_input and config.location_prefilter_enabled:
+            location_ids = get_location_gazetteer().resolve(location_input)
+            rows = index.candidate_rows(location_ids, params["match_count"])
+        with span("vector_store.search_travel_packages_local", match_count=params["match_count"],
+                  candidates=index.size if rows is None else len(rows)):
+            return index.search(query_vectors, params["match_count"], rows=rows)[0]
+
+    @staticmethod
+    def travel_package_vectors_available() -> bool:
+        """
+        Whether search results can be given similarity vectors for near-duplicate collapsing.
+
+        They are looked up in the in-process index, which is used when it is
+        loaded already or cheap to load (local backend or a catalog snapshot).
+        The RPC rows themselves carry no vectors.
+        """
+        from app.vectorstore.catalog import catalog_refresher
+
+        return (catalog_refresher.active_version is not None or config.travel_search_backend == "local"
+                or bool(config.catalog_snapshot_dir))
+
+    def travel_package_vectors(self, packages: List[Dict]) -> Optional[np.ndarray]:
+        """
+        Return similarity vectors of search results for near-duplicate collapsing.
+
+        Args:
+            packages: Ranked search results.
+
+        Returns:
+            The (M, D) similarity vectors from the in-process index, or None if
+            they are not available (see travel_package_vectors_available).
+        """
+        from app.services.result_dedup import package_vectors_from_index
+        from app.vectorstore.catalog import catalog_refresher
+
+        if not self.travel_package_vectors_available():
+            return None
+        return package_vectors_from_index(catalog_refresher.get(), packages)
+
+    @classmethod
+    def coalescing_stats(cls) -> Dict[str, int]:
+        """Return how many travel package searches were executed and how many were coalesced."""
+        return cls._travel_search_inflight.stats()
+
+
+# Token-bound stores and user IDs, keyed by a hash of the token so that raw
+# tokens are not used as cache keys. Entries expire after AUTH_CACHE_TTL_SECONDS,
+# so a revoked or refreshed token stops being served from the cache.
+_vector_stores = TTLCache(config.auth_cache_max_entries, config.auth_cache_ttl_seconds)
+_user_ids = TTLCache(config.auth_cache_max_entries, config.auth_cache_ttl_seconds)
+
+
+def get_vector_store(auth: str) -> SupabaseVectorStore:
+    """
+    Return a SupabaseVectorStore for an auth token, reusing it across requests.
+
+    Args:
+        auth: The caller's access token (without the 'Bearer ' prefix).
+
+    Returns:
+        A cached SupabaseVectorStore bound to that token.
+    """
+    return _vector_stores.get_or_create(hash_token(auth), lambda: SupabaseVectorStore(
+        url=config.supabase_url,
+        key=config.supabase_anon_key,
+        auth=auth
+    ))
+
+
+def resolve_user_id(auth: str) -> str:
+    """
+    Return the ID of the user an access token belongs to, verified with Supabase Auth.
+
+    Args:
+        auth: The caller's access token (without the 'Bearer ' prefix).
+
+    Returns:
+        The user's ID, cached per token for AUTH_CACHE_TTL_SECONDS.
+
+    Raises:
+        Exception: The Supabase Auth error if the token is invalid or expired.
+    """
+    return _user_ids.get_or_create(hash_token(auth), lambda: str(get_vector_store(auth).get_user().id))
@@ -0,0 +1,387 @@
+import logging
+import time
+from concurrent.futures import Executor
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.request_models import parse_highlights_value
+
+
+# Preference criteria, in the order used by the search_travel_packages RPC
+TRAVEL_PACKAGE_CRITERIA = [
+    "location", "duration", "budget", "transportation",
+    "accommodation", "food", "activities", "notes"
+]
+
+# Weights of each criterion's cosine similarity in the combined score
+# (accommodation and notes share the 9.0% accommodation & notes weight)
+TRAVEL_PACKAGE_WEIGHTS = {
+    "location": 0.455,
+    "duration": 0.182,
+    "budget": 0.091,
+    "transportation": 0.091,
+    "accommodation": 0.045,
+    "food": 0.045,
+    "activities": 0.045,
+    "notes": 0.045,
+}
+
+VECTOR_COLUMNS = [f"{criterion}_vector" for criterion in TRAVEL_PACKAGE_CRITERIA]
+
+logger = logging.getLogger(__name__)
+
+
+def parse_vector(value: Any) -> Optional[np.ndarray]:
+    """
+    Parse a pgvector column value into a float32 array.
+
+    PostgREST returns vector columns as strings such as "[0.1,0.2,...]".
+
+    Args:
+        value: The raw column value (string, list or None).
+
+    Returns:
+        The vector as a float32 array, or None if the value is empty.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+        return np.fromstring(value.strip("[]"), dtype=np.float32, sep=",")
+    return np.asarray(value, dtype=np.float32)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so that dot products are cosine similarities."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def parse_rows(rows: List[Dict]) -> Tuple[List[Dict], Dict[str, np.ndarray]]:
+    """
+    Parse travel_packages rows into package metadata and normalized vectors.
+
+    Module-level so that it can run in a process pool during ingestion.
+
+    Args:
+        rows: Rows of the travel_packages table; rows missing any vector are skipped.
+
+    Returns:
+        The package rows without vector columns (highlights parsed), and a
+        normalized float32 (n, d) matrix per criterion.
+    """
+    packages = []
+    vectors = {criterion: [] for criterion in TRAVEL_PACKAGE_CRITERIA}
+    for row in rows:
+        parsed = [parse_vector(row.get(column)) for column in VECTOR_COLUMNS]
+        if any(vector is None for vector in parsed):
+            logger.warning(f"Skipping travel package {row.get('id')} with missing vectors")
+            continue
+        for criterion, vector in zip(TRAVEL_PACKAGE_CRITERIA, parsed):
+            vectors[criterion].append(vector)
+        package = {key: value for key, value in row.items() if key not in VECTOR_COLUMNS}
+        # Parse highlights once at ingestion instead of on every response
+        if "highlights" in package:
+            package["highlights"] = parse_highlights_value(package["highlights"])
+        packages.append(package)
+
+    matrices = {
+        criterion: (normalize_rows(np.vstack(rows_)).astype(np.float32, copy=False) if rows_
+                    else np.zeros((0, 0), dtype=np.float32))
+        for criterion, rows_ in vectors.items()
+    }
+    return packages, matrices
+
+
+class TravelPackageIndex:
+    """
+    In-process copy of the travel package catalog for matrix scoring.
+
+    Holds one normalized (N, d) float32 matrix per preference criterion and the
+    package metadata (without vector columns). Scoring many preference profiles
+    at once is a handful of matrix multiplications instead of one RPC per profile.
+    """
+
+    def __init__(self,
+                 packages: Sequence[Dict],
+                 matrices: Dict[str, np.ndarray],
+                 version: Optional[str] = None):
+        """
+        Args:
+            packages: Package metadata rows, aligned with the matrix rows.
+            matrices: Normalized (N, d) matrix per criterion in TRAVEL_PACKAGE_CRITERIA.
+            version: Identifier of the catalog state this index was built from.
+        """
+        self.packages = packages
+        self.matrices = matrices
+        self.version = version or str(int(time.time()))
+        self.size = len(packages)
+        self.dimensions = matrices[TRAVEL_PACKAGE_CRITERIA[0]].shape[1] if self.size else 0
+        self._rows_by_location: Optional[Dict[str, np.ndarray]] = None
+        # Set when the index is memory-mapped from a snapshot (see catalog_snapshot.open_snapshot)
+        self.snapshot_path: Optional[str] = None
+        self._rows_by_id: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_rows(cls,
+                  rows: List[Dict],
+                  version: Optional[str] = None,
+                  executor: Optional[Executor] = None,
+                  chunk_size: int = 2000) -> "TravelPackageIndex":
+        """
+        Build an index from travel_packages rows that include vector columns.
+
+        Rows missing any vector are skipped.
+
+        Args:
+            rows: Rows of the travel_packages table.
+            version: Identifier of the catalog state.
+            executor: If given (e.g. a process pool), rows are parsed in chunks on it.
+            chunk_size: Rows parsed per task when an executor is given.
+
+        Returns:
+            A new TravelPackageIndex.
+        """
+        if executor is not None and len(rows) > chunk_size:
+            chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+            parts = list(executor.map(parse_rows, chunks))
+        else:
+            parts = [parse_rows(rows)]
+
+        packages = [package for part_packages, _ in parts for package in part_packages]
+        if packages:
+            matrices = {
+                criterion: np.concatenate([part[criterion] for _, part in parts if len(part[criterion])])
+                for criterion in TRAVEL_PACKAGE_CRITERIA
+            }
+        else:
+            matrices = {criterion: np.zeros((0, 0), dtype=np.float32) for criterion in TRAVEL_PACKAGE_CRITERIA}
+        return cls(packages, matrices, version=version)
+
+    @classmethod
+    def load_from_supabase(cls,
+                           client,
+                           page_size: int = 1000,
+                           executor: Optional[Executor] = None,
+                           chunk_size: int = 2000) -> "TravelPackageIndex":
+        """
+        Load the whole travel_packages table, page by page.
+
+        Args:
+            client: A Supabase client allowed to read travel_packages.
+            page_size: Number of rows fetched per request.
+            executor: If given, rows are parsed in chunks on it (see from_rows).
+            chunk_size: Rows parsed per task when an executor is given.
+
+        Returns:
+            A new TravelPackageIndex.
+        """
+        rows = []
+        start = 0
+        while True:
+            response = client.table("travel_packages").select("*").range(start, start + page_size - 1).execute()
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                break
+            start += page_size
+
+        last_updated = max((row.get("last_updated") or "" for row in rows), default="")
+        version = f"{len(rows)}:{last_updated}" if last_updated else None
+        logger.info(f"Loaded {len(rows)} travel packages into the in-process index")
+        return cls.from_rows(rows, version=version, executor=executor, chunk_size=chunk_size)
+
+    def score(self, query_vectors: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Compute combined scores of P preference profiles against every package.
+
+        Args:
+            query_vectors: Normalized (P, d) matrix per criterion.
+
+        Returns:
+            A (P, N) float32 matrix of weighted cosine similarity scores.
+        """
+        scores = None
+        for criterion in TRAVEL_PACKAGE_CRITERIA:
+            part = query_vectors[criterion] @ self.matrices[criterion].T
+            part *= TRAVEL_PACKAGE_WEIGHTS[criterion]
+            if scores is None:
+                scores = part
+            else:
+                scores += part
+        return scores
+
+    def score_profiles(self, text_vectors: np.ndarray, text_ids: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Compute combined scores for profiles that share preference texts.
+
+        Each distinct text is scored against the catalog once per criterion and
+        the rows are then gathered per profile, so common texts (such as empty
+        preferences) cost one row of work no matter how many profiles use them.
+
+        Args:
+            text_vectors: Normalized (U, d) embeddings of the distinct preference texts.
+            text_ids: Per criterion, a (P,) array of row indices into text_vectors.
+
+        Returns:
+            A (P, N) float32 matrix of weighted cosine similarity scores.
+        """
+        scores = None
+        for criterion in TRAVEL_PACKAGE_CRITERIA:
+            unique_ids, inverse = np.unique(text_ids[criterion], return_inverse=True)
+            part = text_vectors[unique_ids] @ self.matrices[criterion].T
+            part *= TRAVEL_PACKAGE_WEIGHTS[criterion]
+            part = part[inverse]
+            if scores is None:
+                scores = part
+            else:
+                scores += part
+        return scores
+
+    def rank(self, scores: np.ndarray, match_counts: Sequence[int]) -> List[List[Dict]]:
+        """
+        Turn a (P, N) score matrix into ranked package lists.
+
+        Args:
+            scores: Combined scores, one row per profile.
+            match_counts: Number of packages to return for each row.
+
+        Returns:
+            For each row, the best packages (with combined_score), best first.
+        """
+        if not self.size:
+            return [[] for _ in match_counts]
+        best = self.top_k(scores, max(match_counts, default=0))
+        results = []
+        for row, (indices, match_count) in enumerate(zip(best, match_counts)):
+            results.append([
+                dict(self.packages[i], combined_score=float(scores[row, i]))
+                for i in indices[:match_count]
+            ])
+        return results
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Return the column indices of the k best scores of each row, best first.
+
+        Args:
+            scores: A (P, N) score matrix.
+            k: Number of indices per row.
+
+        Returns:
+            A (P, min(k, N)) array of column indices.
+        """
+        n = scores.shape[1]
+        k = min(k, n)
+        if k <= 0:
+            return np.zeros((scores.shape[0], 0), dtype=np.int64)
+        if k < n:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(n), (scores.shape[0], 1))
+        order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+        return np.take_along_axis(candidates, order, axis=1)
+
+    def location_rows(self, location_ids: FrozenSet[str]) -> np.ndarray:
+        """
+        Return the sorted row indices of the packages at any of the given locations.
+
+        The location_id -> rows map is built on first use.
+
+        Args:
+            location_ids: Locations resolved from a location preference.
+
+        Returns:
+            An int64 array of row indices.
+        """
+        if self._rows_by_location is None:
+            column = getattr(self.packages, "column", None)
+            values = column("location_id") if column else [package.get("location_id") for package in self.packages]
+            rows: Dict[str, List[int]] = {}
+            for row, location_id in enumerate(values):
+                if location_id is not None:
+                    rows.setdefault(str(location_id), []).append(row)
+            self._rows_by_location = {key: np.asarray(value, dtype=np.int64) for key, value in rows.items()}
+        parts = [self._rows_by_location[key] for key in location_ids if key in self._rows_by_location]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts))
+
+    def rows_for_ids(self, ids: Sequence[Any]) -> np.ndarray:
+        """
+        Return the row index of each package id (-1 for ids not in the index).
+
+        The id -> row map is built on first use.
+        """
+        if self._rows_by_id is None:
+            column = getattr(self.packages, "column", None)
+            values = column("id") if column else [package.get("id") for package in self.packages]
+            self._rows_by_id = {str(value): row for row, value in enumerate(values)}
+        return np.asarray([self._rows_by_id.get(str(package_id), -1) for package_id in ids], dtype=np.int64)
+
+    def candidate_rows(self, location_ids: Optional[FrozenSet[str]], match_count: int) -> Optional[np.ndarray]:
+        """
+        Return the rows a location-filtered search should score, or None to score all packages.
+
+        The filter is only applied when the locations have at least match_count
+        packages; otherwise the full ranking (where those locations still score
+        highest on location similarity) fills the result.
+
+        Args:
+            location_ids: Locations resolved from the location preference, if any.
+            match_count: Number of packages the search returns.
+
+        Returns:
+            Sorted row indices, or None.
+        """
+        if not location_ids:
+            return None
+        rows = self.location_rows(location_ids)
+        return rows if len(rows) >= max(1, match_count) else None
+
+    def search(self,
+               query_vectors: Dict[str, np.ndarray],
+               match_count: int = 10,
+               rows: Optional[np.ndarray] = None) -> List[List[Dict]]:
+        """
+        Rank the catalog for each of P preference profiles.
+
+        Args:
+            query_vectors: Normalized (P, d) matrix per criterion.
+            match_count: Number of packages returned per profile.
+            rows: Only score these packages (e.g. from location_rows).
+
+        Returns:
+            For each profile, the best packages (with combined_score), best first.
+        """
+        count = len(query_vectors[TRAVEL_PACKAGE_CRITERIA[0]])
+        if rows is not None and self.size:
+            scores = None
+            for criterion in TRAVEL_PACKAGE_CRITERIA:
+                part = query_vectors[criterion] @ self.matrices[criterion][rows].T
+                part *= TRAVEL_PACKAGE_WEIGHTS[criterion]
+                if scores is None:
+                    scores = part
+                else:
+                    scores += part
+            best = self.top_k(scores, match_count)
+            return [
+                [dict(self.packages[int(rows[i])], combined_score=float(scores[row, i])) for i in indices]
+                for row, indices in enumerate(best)
+            ]
+        scores = self.score(query_vectors) if self.size else None
+        return self.rank(scores, [match_count] * count)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the size and version of the index."""
+        return {
+            "version": self.version,
+            "packages": self.size,
+            "dimensions": self.dimensions,
+            "bytes": int(sum(matrix.nbytes for matrix in self.matrices.values())),
+        }
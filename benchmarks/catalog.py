@@ -0,0 +1,100 @@
+"""
+Synthetic travel package catalog for offline benchmarks.
+"""
+import hashlib
+from typing import Dict, List
+
+import numpy as np
+
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA, normalize_rows
+
+LOCATIONS = [
+    ("Da Nang", "Vietnam"), ("Hoi An", "Vietnam"), ("Hanoi", "Vietnam"), ("Ha Long Bay", "Vietnam"),
+    ("Sapa", "Vietnam"), ("Phu Quoc", "Vietnam"), ("Ho Chi Minh City", "Vietnam"), ("Nha Trang", "Vietnam"),
+    ("Bangkok", "Thailand"), ("Chiang Mai", "Thailand"), ("Phuket", "Thailand"), ("Bali", "Indonesia"),
+    ("Siem Reap", "Cambodia"), ("Luang Prabang", "Laos"), ("Kuala Lumpur", "Malaysia"), ("Singapore", "Singapore"),
+]
+THEMES = ["Beach", "Food", "Trekking", "Culture", "Island", "Family", "Luxury", "Backpacker"]
+HIGHLIGHTS = [
+    "street food tour", "snorkeling", "cooking class", "temple visit", "sunset cruise",
+    "mountain trek", "homestay", "spa access", "night market", "kayaking", "cave exploration",
+]
+
+
+def text_vector(text: str, dimensions: int) -> np.ndarray:
+    """
+    Deterministic stand-in embedding for a text.
+
+    The same text always maps to the same unit vector, so repeated preference
+    strings behave like real embeddings for caching and coalescing.
+    """
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class SyntheticCatalog:
+    """
+    A generated travel package catalog held as columns and per-criterion matrices.
+
+    Package rows are only materialized for the packages a request returns,
+    so catalogs of up to ~1M packages fit in memory at small dimensions.
+    """
+
+    def __init__(self, size: int, dimensions: int = 64, seed: int = 7):
+        """
+        Args:
+            size: Number of packages (1k to 1M).
+            dimensions: Embedding dimensions of the package vectors.
+            seed: Random seed, so runs on different commits see the same catalog.
+        """
+        self.size = size
+        self.dimensions = dimensions
+        rng = np.random.default_rng(seed)
+        self.location_ids = rng.integers(0, len(LOCATIONS), size)
+        self.themes = rng.integers(0, len(THEMES), size)
+        self.prices = np.round(rng.uniform(80, 2500, size), 2)
+        self.durations = rng.integers(1, 15, size)
+        self.highlights = rng.integers(0, len(HIGHLIGHTS), (size, 3))
+        self.matrices: Dict[str, np.ndarray] = {}
+        for criterion in TRAVEL_PACKAGE_CRITERIA:
+            matrix = np.empty((size, dimensions), dtype=np.float32)
+            # Generate in chunks to keep peak memory close to the final matrix size
+            for start in range(0, size, 100_000):
+                end = min(start + 100_000, size)
+                matrix[start:end] = rng.standard_normal((end - start, dimensions), dtype=np.float32)
+            self.matrices[criterion] = normalize_rows(matrix)
+
+    def row(self, i: int, with_vectors: bool = False) -> Dict:
+        """Materialize package i as a travel_packages row."""
+        city, country = LOCATIONS[self.location_ids[i]]
+        theme = THEMES[self.themes[i]]
+        row = {
+            "id": f"00000000-0000-4000-8000-{i:012d}",
+            "title": f"{city} {theme} Escape #{i}",
+            "provider_id": f"provider-{i % 97}",
+            "location_id": f"location-{self.location_ids[i]}",
+            "price": float(self.prices[i]),
+            "duration_days": int(self.durations[i]),
+            "highlights": [HIGHLIGHTS[h] for h in self.highlights[i]],
+            "description": f"A {self.durations[i]}-day {theme.lower()} trip in {city}, {country}. " * 3,
+            "image_url": f"https://images.example.com/packages/{i}.jpg",
+            "last_updated": "2025-01-01T00:00:00+00:00",
+        }
+        if with_vectors:
+            for criterion, matrix in self.matrices.items():
+                row[f"{criterion}_vector"] = "[" + ",".join(f"{x:.6f}" for x in matrix[i]) + "]"
+        return row
+
+    @staticmethod
+    def locations() -> List[Dict]:
+        """The locations table rows the packages refer to."""
+        return [
+            {"id": f"location-{i}", "name": city, "country": country}
+            for i, (city, country) in enumerate(LOCATIONS)
+        ]
+
+    def rows(self, start: int, end: int, with_vectors: bool = True) -> List[Dict]:
+        """Materialize a range of packages as rows (used to answer table selects)."""
+        return [self.row(i, with_vectors) for i in range(start, min(end, self.size))]
+
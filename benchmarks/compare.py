@@ -0,0 +1,51 @@
+"""
+Compare two benchmark result files (e.g. from two commits).
+
+Usage:
+    python -m benchmarks.compare bench_results/base.json bench_results/head.json [--threshold 10]
+
+Exits with status 1 if any scenario's p95 latency regressed by more than
+--threshold percent.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "throughput_rps"]
+
+
+def change(base: float, head: float) -> float:
+    """Relative change from base to head, in percent."""
+    return 100.0 * (head - base) / base if base else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed p95 regression in percent")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base {base.get('commit')}  ->  head {head.get('commit')}")
+    regressions = []
+    for scenario in sorted(set(base["results"]) & set(head["results"])):
+        print(f"\n{scenario}")
+        for metric in METRICS:
+            before = base["results"][scenario][metric]
+            after = head["results"][scenario][metric]
+            print(f"  {metric:15s} {before:10.2f} -> {after:10.2f}  ({change(before, after):+6.1f}%)")
+        if change(base["results"][scenario]["p95_ms"], head["results"][scenario]["p95_ms"]) > args.threshold:
+            regressions.append(scenario)
+
+    if regressions:
+        print(f"\np95 regressed by more than {args.threshold}% in: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Local stand-ins for the OpenAI and Supabase (PostgREST) APIs.
+
+Both servers run in background threads on localhost with configurable
+latency, so the application can be benchmarked without credentials or
+network access. They implement only the endpoints the application calls.
+"""
+import base64
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from app.agent.preference_extractor import PREFERENCE_SLOTS, PreferenceExtractor
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA, TRAVEL_PACKAGE_WEIGHTS
+from benchmarks.catalog import SyntheticCatalog, text_vector
+
+
+class FakeServer:
+    """Base class: an HTTP server in a daemon thread with simulated latency."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self, "GET")
+
+            def do_POST(self):
+                server._handle(self, "POST")
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self) -> "FakeServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _sleep(self, latency_ms: float):
+        """Simulate upstream latency (plus uniform jitter)."""
+        delay = latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str):
+        parsed = urlparse(handler.path)
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = json.loads(handler.rfile.read(length) or b"null") if length else None
+        with self._lock:
+            self.requests[parsed.path] += 1
+        headers = {}
+        try:
+            status, payload, *extra = self.route(method, parsed.path, parse_qs(parsed.query), body)
+            if extra:
+                headers = extra[0]
+        except Exception as e:
+            status, payload = 500, {"message": str(e)}
+        data = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def route(self, method: str, path: str, query: Dict, body) -> tuple:
+        """Return (status, payload) or (status, payload, extra response headers)."""
+        raise NotImplementedError
+
+
+class FakeOpenAIServer(FakeServer):
+    """
+    Stand-in for the OpenAI embeddings and chat completions endpoints.
+
+    Embeddings are deterministic per text. Chat completions emulate the agent's
+    two round trips: the first answers with a SearchTravelPackages tool call
+    built from the user message, the second (after the tool result) with text.
+    The tool call uses the arguments registered for the message with
+    expect_tool_call, like a model filling them independently; unregistered
+    messages fall back to the app's own extractor.
+    """
+
+    def __init__(self, dimensions: int = 64, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 chat_latency_ms: Optional[float] = None):
+        super().__init__(latency_ms, jitter_ms)
+        self.dimensions = dimensions
+        self.chat_latency_ms = latency_ms if chat_latency_ms is None else chat_latency_ms
+        self.embedded_texts = 0
+        self.extractor = PreferenceExtractor()
+        self.tool_arguments: Dict[str, Dict[str, str]] = {}
+
+    def expect_tool_call(self, message: str, arguments: Dict[str, str]):
+        """Answer the user message with a SearchTravelPackages call with these arguments."""
+        with self._lock:
+            self.tool_arguments[message] = dict(arguments)
+
+    def route(self, method, path, query, body):
+        if path.endswith("/embeddings"):
+            self._sleep(self.latency_ms)
+            return 200, self._embeddings(body)
+        if path.endswith("/chat/completions"):
+            self._sleep(self.chat_latency_ms)
+            return 200, self._chat(body)
+        return 404, {"error": {"message": f"Unknown path {path}"}}
+
+    def _embeddings(self, body):
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        with self._lock:
+            self.embedded_texts += len(texts)
+        data = []
+        for i, text in enumerate(texts):
+            vector = text_vector(text, self.dimensions)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(text.split()) for text in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def _chat(self, body):
+        messages = body.get("messages", [])
+        last = messages[-1] if messages else {}
+        tools = {tool["function"]["name"] for tool in body.get("tools") or []}
+        prompt_tokens = sum(len(str(message.get("content") or "").split()) for message in messages)
+
+        if last.get("role") == "user" and "SearchTravelPackages" in tools:
+            text = last.get("content") or ""
+            with self._lock:
+                expected = self.tool_arguments.get(text)
+            if expected is not None:
+                arguments = {slot: expected.get(slot, "") for slot in PREFERENCE_SLOTS}
+            else:
+                # With the app's own extractor the speculative search hit rate
+                # measured here is an upper bound
+                arguments = self.extractor.extract(text)
+                if not arguments["location_input"]:
+                    arguments["location_input"] = text
+            arguments["match_count"] = 5
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": f"call_{random.getrandbits(48):012x}",
+                    "type": "function",
+                    "function": {"name": "SearchTravelPackages", "arguments": json.dumps(arguments)},
+                }],
+            }
+            finish_reason = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": "Here are a few packages you might enjoy!"}
+            finish_reason = "stop"
+
+        return {
+            "id": f"chatcmpl-{random.getrandbits(48):012x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 20, "total_tokens": prompt_tokens + 20},
+        }
+
+
+class FakeSupabaseServer(FakeServer):
+    """
+    Stand-in for the PostgREST and auth endpoints used by the application.
+
+    The search_travel_packages RPC is answered by scoring the synthetic
+    catalog with the same weights as the database function.
+    """
+
+    def __init__(self, catalog: SyntheticCatalog, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        super().__init__(latency_ms, jitter_ms)
+        self.catalog = catalog
+
+    def route(self, method, path, query, body):
+        self._sleep(self.latency_ms)
+        if path == "/rest/v1/rpc/search_travel_packages":
+            rows = self._search_travel_packages(body)
+            columns = query.get("select", ["*"])[0]
+            if columns != "*":
+                rows = [{column: row.get(column) for column in columns.split(",")} for row in rows]
+            return 200, rows
+        if path == "/rest/v1/travel_packages" and method == "GET":
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query.get("limit", [str(self.catalog.size)])[0])
+            rows = self.catalog.rows(offset, offset + limit)
+            # PostgREST reports the total row count when asked with Prefer: count=exact
+            content_range = f"{offset}-{offset + len(rows) - 1}/{self.catalog.size}" if rows else f"*/{self.catalog.size}"
+            return 200, rows, {"Content-Range": content_range}
+        if path == "/rest/v1/locations" and method == "GET":
+            offset = int(query.get("offset", ["0"])[0])
+            locations = self.catalog.locations()
+            limit = int(query.get("limit", [str(len(locations))])[0])
+            return 200, locations[offset:offset + limit]
+        if path == "/auth/v1/user":
+            return 200, {"id": "00000000-0000-4000-8000-000000000001", "aud": "authenticated",
+                         "role": "authenticated", "email": "bench@example.com",
+                         "app_metadata": {}, "user_metadata": {}, "created_at": "2025-01-01T00:00:00Z"}
+        return 404, {"message": f"Unknown path {path}"}
+
+    def _search_travel_packages(self, body):
+        scores = None
+        for criterion in TRAVEL_PACKAGE_CRITERIA:
+            query = np.asarray(body[f"{criterion}_vector_input"], dtype=np.float32)
+            part = self.catalog.matrices[criterion] @ query
+            part *= TRAVEL_PACKAGE_WEIGHTS[criterion]
+            if scores is None:
+                scores = part
+            else:
+                scores += part
+        k = min(int(body.get("match_count") or 10), self.catalog.size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [dict(self.catalog.row(int(i)), combined_score=float(scores[i])) for i in best]
@@ -0,0 +1,297 @@
+"""
+Replay a captured query log (QUERY_LOG_PATH) against this build.
+
+Starts the API offline against the local OpenAI and Supabase stand-ins,
+re-sends every captured /ask and /search-travel-packages request at its
+original arrival offset (divided by --speed), and reports the latency
+distribution and cache hit rates of the replay next to the latencies that
+were captured. Captured users are replayed as distinct callers, and search
+cursors are followed from the same user's previous replayed page.
+
+Usage:
+    python -m benchmarks.replay logs/query_log.jsonl --speed 4 --output bench_results/replay-head.json
+    python -m benchmarks.replay logs/query_log.jsonl --baseline bench_results/replay-base.json
+
+The files every worker process wrote for the given path
+(query_log-<pid>.jsonl) and their rotated files are replayed, merged in
+arrival order. Results use the benchmarks.run format, so two
+replays can also be diffed with benchmarks/compare.py.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from benchmarks.catalog import SyntheticCatalog
+from benchmarks.fake_upstreams import FakeOpenAIServer, FakeSupabaseServer
+from benchmarks.run import BENCH_TOKEN, configure_environment, git_commit, percentile_summary, start_api_server
+
+REPLAYED_ENDPOINTS = ["/ask", "/search-travel-packages"]
+
+
+def load_entries(log_entries: Iterable[Dict], limit: Optional[int] = None) -> List[Dict]:
+    """Keep the replayable entries of a query log, in arrival order."""
+    entries = [
+        entry for entry in log_entries
+        if entry.get("endpoint") in REPLAYED_ENDPOINTS and entry.get("request") is not None
+    ]
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries[:limit] if limit else entries
+
+
+def wait_until_ready(api_url: str, timeout_seconds: float = 600.0):
+    """Wait for the API's readiness probe (the startup warm-up) to pass."""
+    import httpx
+
+    deadline = time.monotonic() + timeout_seconds
+    while httpx.get(f"{api_url}/ready").status_code != 200:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{api_url} did not become ready within {timeout_seconds}s")
+        time.sleep(0.1)
+
+
+def ratio(numerator: float, denominator: float) -> Optional[float]:
+    return round(numerator / denominator, 4) if denominator else None
+
+
+class Replayer:
+    """Sends captured requests on schedule and records each one's latency."""
+
+    def __init__(self, api_url: str, speed: float, concurrency: int):
+        import httpx
+
+        self.api_url = api_url
+        self.speed = speed
+        self.local = threading.local()
+        self.pool = ThreadPoolExecutor(max_workers=concurrency)
+        self.cursors: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {endpoint: [] for endpoint in REPLAYED_ENDPOINTS}
+        self.errors: Dict[str, int] = {endpoint: 0 for endpoint in REPLAYED_ENDPOINTS}
+        self.statuses: Dict[str, int] = {}
+        self.skipped = 0
+        self.max_lag_ms = 0.0
+        self._httpx = httpx
+
+    def client(self):
+        if not hasattr(self.local, "client"):
+            self.local.client = self._httpx.Client(base_url=self.api_url, timeout=120)
+        return self.local.client
+
+    def send(self, entry: Dict):
+        endpoint = entry["endpoint"]
+        user = entry.get("user") or "anonymous"
+        params = {"authorization": f"Bearer {BENCH_TOKEN}-{user}"}
+        if endpoint == "/ask":
+            body = {"query": entry["request"]["query"] or ""}
+        else:
+            body = {key: value for key, value in entry["request"].items() if key != "cursor" and value is not None}
+            if entry["request"].get("cursor"):
+                with self.lock:
+                    cursor = self.cursors.get(user)
+                if cursor is None:
+                    with self.lock:
+                        self.skipped += 1
+                    return
+                body["cursor"] = cursor
+
+        start = time.perf_counter()
+        try:
+            response = self.client().post(endpoint, params=params, json=body)
+        except Exception as e:
+            logging.getLogger(__name__).debug(f"Replayed request failed: {e}")
+            with self.lock:
+                self.errors[endpoint] += 1
+            return
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            status = str(response.status_code)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if response.status_code >= 400:
+                self.errors[endpoint] += 1
+                return
+            self.latencies[endpoint].append(elapsed)
+            if endpoint == "/search-travel-packages":
+                next_cursor = response.json().get("next_cursor")
+                if next_cursor:
+                    self.cursors[user] = next_cursor
+
+    def run(self, entries: List[Dict]) -> float:
+        """Replay the entries on their (scaled) schedule; returns the wall time in seconds."""
+        first = entries[0]["ts"]
+        wall_start = time.perf_counter()
+        futures = []
+        for entry in entries:
+            due = wall_start + (entry["ts"] - first) / self.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # The replay fell behind schedule (client or server saturated)
+                self.max_lag_ms = max(self.max_lag_ms, -delay * 1000)
+            futures.append(self.pool.submit(self.send, entry))
+        for future in futures:
+            future.result()
+        return time.perf_counter() - wall_start
+
+
+def cache_hit_rates(counters: Dict) -> Dict[str, Optional[float]]:
+    """Hit rates of the application's caches and request coalescing during the replay."""
+    llm = counters.get("llm_cache") or {}
+    lookups = (counters.get("recommendations") or {}).get("lookups", {})
+    cache = counters.get("embedding_cache") or {}
+    embeddings = counters.get("embedding_coalescing") or {}
+    searches = counters.get("search_coalescing") or {}
+    return {
+        "llm_cache": ratio(llm.get("hits", 0) + llm.get("semantic_hits", 0),
+                           llm.get("hits", 0) + llm.get("semantic_hits", 0) + llm.get("misses", 0)),
+        "recommendations": ratio(lookups.get("hit", 0), sum(lookups.values())),
+        "embedding_cache": ratio(cache.get("hits", 0), cache.get("hits", 0) + cache.get("misses", 0)),
+        "embedding_coalescing": ratio(embeddings.get("coalesced", 0), embeddings.get("calls", 0)),
+        "search_coalescing": ratio(searches.get("coalesced", 0), searches.get("calls", 0)),
+    }
+
+
+def print_report(report: Dict, baseline: Optional[Dict]):
+    """Print captured, replayed (and baseline) latencies and hit rates side by side."""
+    header = f"{'':34s}{'captured':>12s}{'replayed':>12s}"
+    if baseline:
+        header += f"{'baseline':>12s}"
+    print(header)
+    for endpoint in REPLAYED_ENDPOINTS:
+        replayed = report["results"].get(endpoint)
+        if replayed is None:
+            continue
+        captured = report["captured"][endpoint]
+        base = (baseline or {}).get("results", {}).get(endpoint)
+        for metric in ["count", "errors", "p50_ms", "p95_ms", "p99_ms", "throughput_rps"]:
+            line = f"{endpoint + ' ' + metric:34s}{captured[metric]:12.1f}{replayed[metric]:12.1f}"
+            if baseline:
+                line += f"{base[metric]:12.1f}" if base else f"{'-':>12s}"
+            print(line)
+    for name, rate in report["hit_rates"].items():
+        line = f"{name + ' hit rate':34s}{'-':>12s}{rate if rate is not None else '-':>12}"
+        if baseline:
+            base_rate = baseline.get("hit_rates", {}).get(name)
+            line += f"{base_rate if base_rate is not None else '-':>12}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="Query log file (rotated siblings are included)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay rate relative to the capture (2 = twice as fast)")
+    parser.add_argument("--limit", type=int, default=None, help="Replay only the first N requests")
+    parser.add_argument("--concurrency", type=int, default=64, help="Maximum requests in flight")
+    parser.add_argument("--packages", type=int, default=10000, help="Synthetic catalog size")
+    parser.add_argument("--dimensions", type=int, default=64, help="Embedding dimensions")
+    parser.add_argument("--embedding-latency-ms", type=float, default=30.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--rpc-latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--cold", action="store_true",
+                        help="Start without loading the catalog first (measures a cold start)")
+    parser.add_argument("--warmup-log", default=None,
+                        help="Query log the startup embedding warm-up reads (default: none, a cold start)")
+    parser.add_argument("--baseline", default=None, help="Earlier replay result to show alongside")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench_results/replay.json", help="Where to write the JSON results")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    catalog = SyntheticCatalog(args.packages, args.dimensions, seed=args.seed)
+    openai_server = FakeOpenAIServer(
+        args.dimensions, latency_ms=args.embedding_latency_ms,
+        jitter_ms=args.jitter_ms, chat_latency_ms=args.chat_latency_ms
+    ).start()
+    supabase_server = FakeSupabaseServer(catalog, latency_ms=args.rpc_latency_ms, jitter_ms=args.jitter_ms).start()
+    configure_environment(openai_server.url, supabase_server.url)
+    # Do not capture the replay itself; warm up only from an explicitly given log
+    os.environ["QUERY_LOG_PATH"] = ""
+    os.environ["EMBEDDING_WARMUP_QUERY_LOG"] = args.warmup_log or ""
+
+    # Import the application only once the environment is set
+    from app.telemetry.query_log import query_log_files, read_query_log
+
+    paths = query_log_files(args.log)
+    entries = load_entries(read_query_log(args.log), args.limit)
+    if not entries:
+        parser.error(f"No replayable requests in {args.log}")
+    print(f"Loaded {len(entries)} requests from {len(paths)} file(s), "
+          f"spanning {entries[-1]['ts'] - entries[0]['ts']:.1f}s")
+
+    import main as api
+    from app.services.embeddings import EmbeddingService
+    from app.services.recommendation_materializer import recommendation_materializer
+    from app.vectorstore.supabase_vectorstore import SupabaseVectorStore
+
+    logging.getLogger().setLevel(logging.WARNING)
+    api_url = start_api_server(api.app)
+    if any(entry["endpoint"] == "/ask" for entry in entries):
+        api.agent_initializer.setup_agent(BENCH_TOKEN)
+    if not args.cold:
+        api.load_search_catalog(BENCH_TOKEN)
+    wait_until_ready(api_url)
+
+    replayer = Replayer(api_url, args.speed, args.concurrency)
+    upstream_before = openai_server.requests + supabase_server.requests
+    wall_seconds = replayer.run(entries)
+
+    captured_span = max(entries[-1]["ts"] - entries[0]["ts"], 1e-9)
+    results, captured = {}, {}
+    for endpoint in REPLAYED_ENDPOINTS:
+        endpoint_entries = [entry for entry in entries if entry["endpoint"] == endpoint]
+        if not endpoint_entries:
+            continue
+        results[endpoint] = percentile_summary(replayer.latencies[endpoint], replayer.errors[endpoint], wall_seconds)
+        ok = [entry["duration_ms"] / 1000.0 for entry in endpoint_entries if entry.get("status", 200) < 400]
+        span = endpoint_entries[-1]["ts"] - endpoint_entries[0]["ts"]
+        captured[endpoint] = percentile_summary(ok, len(endpoint_entries) - len(ok), span)
+
+    counters = {
+        "embedding_cache": EmbeddingService.cache_stats(),
+        "embedding_coalescing": EmbeddingService.coalescing_stats(),
+        "search_coalescing": SupabaseVectorStore.coalescing_stats(),
+        "llm_cache": api.agent_initializer.gpt4_llm.cache_stats(),
+        "recommendations": recommendation_materializer.stats(),
+        "upstream_requests": dict(openai_server.requests + supabase_server.requests - upstream_before),
+        "statuses": replayer.statuses,
+        "skipped_cursor_requests": replayer.skipped,
+        "max_schedule_lag_ms": round(replayer.max_lag_ms, 1),
+    }
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "log": {"files": paths, "requests": len(entries), "span_seconds": round(captured_span, 3)},
+        "results": results,
+        "captured": captured,
+        "hit_rates": cache_hit_rates(counters),
+        "counters": counters,
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    openai_server.stop()
+    supabase_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Offline benchmark suite for the Travel Buddy API.
+
+Runs the application against local stand-ins for OpenAI and Supabase and
+measures latency percentiles and throughput of the search endpoint, the
+agent endpoint and the individual EmbeddingService and SupabaseVectorStore
+calls. Results are written as JSON so runs on different commits can be
+compared with benchmarks/compare.py.
+
+Usage:
+    python -m benchmarks.run --packages 10000 --requests 500 --concurrency 8 \
+        --output bench_results/head.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.catalog import SyntheticCatalog
+from benchmarks.fake_upstreams import FakeOpenAIServer, FakeSupabaseServer
+
+SCENARIOS = ["embedding_service", "vector_store", "search_endpoint", "ask_endpoint", "logging",
+             "batch_scoring", "ingestion"]
+
+BENCH_TOKEN = "benchmark-token"
+
+PROFILE_VALUES = {
+    "location_input": ["Da Nang", "beach in Vietnam", "Hoi An old town", "Bangkok", "Bali", "Sapa mountains",
+                       "somewhere warm", "Ha Long Bay cruise", "Phu Quoc island", "Chiang Mai"],
+    "duration_input": ["", "3 days", "5 days", "a week", "weekend", "10 days"],
+    "budget_input": ["", "under $500", "around $1000", "mid-range", "luxury"],
+    "transportation_input": ["", "flights included", "private car", "train"],
+    "accommodation_input": ["", "beach resort", "boutique hotel", "homestay"],
+    "food_input": ["", "local street food", "vegetarian", "seafood"],
+    "activities_input": ["", "snorkeling", "hiking", "cooking class", "temples and museums"],
+    "notes_input": ["", "traveling with kids", "honeymoon", "quiet places"],
+}
+
+
+def make_profiles(count: int, seed: int) -> List[Dict[str, str]]:
+    """Generate distinct-ish preference profiles for the workload."""
+    rng = np.random.default_rng(seed)
+    return [
+        {field: values[rng.integers(len(values))] for field, values in PROFILE_VALUES.items()}
+        for _ in range(count)
+    ]
+
+
+class Workload:
+    """Picks preference profiles with a Zipf-like popularity skew, like real traffic spikes."""
+
+    def __init__(self, distinct_profiles: int, skew: float, seed: int):
+        self.profiles = make_profiles(distinct_profiles, seed)
+        ranks = np.arange(1, distinct_profiles + 1, dtype=np.float64)
+        weights = 1.0 / ranks ** skew
+        self.probabilities = weights / weights.sum()
+        self.rng = np.random.default_rng(seed + 1)
+        self._lock = threading.Lock()
+
+    def next_profile(self) -> Dict[str, str]:
+        with self._lock:
+            return self.profiles[self.rng.choice(len(self.profiles), p=self.probabilities)]
+
+
+def percentile_summary(latencies: List[float], errors: int, wall_seconds: float) -> Dict[str, float]:
+    """Summarize latencies (seconds) into milliseconds percentiles and throughput."""
+    values = np.asarray(latencies) * 1000.0 if latencies else np.zeros(1)
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+        "throughput_rps": len(latencies) / wall_seconds if wall_seconds > 0 else 0.0,
+    }
+
+
+def run_load(operation: Callable[[], None], requests: int, concurrency: int) -> Dict[str, float]:
+    """Run `requests` operations on `concurrency` threads and summarize their latency."""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed():
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            operation()
+        except Exception as e:
+            logging.getLogger(__name__).debug(f"Benchmark operation failed: {e}")
+            with lock:
+                errors += 1
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(timed) for _ in range(requests)]:
+            future.result()
+    return percentile_summary(latencies, errors, time.perf_counter() - wall_start)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def configure_environment(openai_url: str, supabase_url: str):
+    """Point the application's clients at the local stand-ins."""
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": f"{openai_url}/v1",
+        "OPENAI_API_BASE": f"{openai_url}/v1",
+        "VITE_PUBLIC_BASE_URL": supabase_url,
+        "VITE_VITE_APP_SUPABASE_ANON_KEY": "benchmark-anon-key",
+        "SUPABASE_SERVICE_KEY": "benchmark-service-key",
+        "JWT_PRIVATE_KEY": "benchmark-jwt-key",
+        # Start every run with a cold LLM response cache
+        "LLM_CACHE_PATH": os.path.join(tempfile.mkdtemp(prefix="travel-buddy-bench-"), "llm_cache.sqlite3"),
+        # One synthetic user drives all the load: keep queue limits, lift per-user rate limits
+        "ASK_RATE_LIMIT_PER_MINUTE": "1000000",
+        "ASK_RATE_LIMIT_BURST": "1000000",
+        "SEARCH_RATE_LIMIT_PER_MINUTE": "1000000",
+        "SEARCH_RATE_LIMIT_BURST": "1000000",
+    })
+
+
+def start_api_server(app) -> str:
+    """Run the FastAPI app with uvicorn in a background thread and return its base URL."""
+    import uvicorn
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packages", type=int, default=10000, help="Synthetic catalog size (1k-1M)")
+    parser.add_argument("--dimensions", type=int, default=64, help="Embedding dimensions")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients per scenario")
+    parser.add_argument("--ask-concurrency", type=int, default=1,
+                        help="Concurrent clients for /ask (the agent keeps one shared conversation)")
+    parser.add_argument("--distinct-profiles", type=int, default=200, help="Distinct preference profiles")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of profile popularity")
+    parser.add_argument("--embedding-latency-ms", type=float, default=30.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--rpc-latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--log-level", default="WARNING", help="Application log level during the run")
+    parser.add_argument("--log-format", default="json", choices=["json", "text"], help="Application log format")
+    parser.add_argument("--log-file", default=os.devnull,
+                        help="Where application logs are written (default: discarded, but still formatted)")
+    parser.add_argument("--batch-profiles", type=int, default=256,
+                        help="Profiles ranked per batch_scoring request")
+    parser.add_argument("--batch-requests", type=int, default=20,
+                        help="Requests of the batch_scoring and ingestion scenarios")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench_results/latest.json", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    catalog = SyntheticCatalog(args.packages, args.dimensions, seed=args.seed)
+    print(f"Generated {args.packages} packages in {time.perf_counter() - started:.1f}s")
+
+    openai_server = FakeOpenAIServer(
+        args.dimensions, latency_ms=args.embedding_latency_ms,
+        jitter_ms=args.jitter_ms, chat_latency_ms=args.chat_latency_ms
+    ).start()
+    supabase_server = FakeSupabaseServer(catalog, latency_ms=args.rpc_latency_ms, jitter_ms=args.jitter_ms).start()
+    configure_environment(openai_server.url, supabase_server.url)
+
+    # Import the application only once the environment points at the stand-ins
+    import httpx
+    import main as api
+    from app.services.embeddings import EmbeddingService, get_embedding_service
+    from app.vectorstore.supabase_vectorstore import SupabaseVectorStore, get_vector_store
+    from app.tools.search.search_tools import preference_text
+    from app.telemetry.log_config import setup_logging, summarize_packages
+    from app.agent.speculative_search import speculative_search
+    from app.services.admission_control import ask_admission, search_admission
+    from app.services.batch_search import BatchTravelPackageSearch
+    from app.services.process_pool import get_process_pool
+    from app.vectorstore.catalog import get_travel_package_index
+    from app.vectorstore.travel_package_index import TravelPackageIndex
+    from app.config.env_config import config
+
+    log_stream = open(args.log_file, "a")
+    setup_logging(logging.getLevelName(args.log_level.upper()), args.log_format, log_stream)
+    api_url = start_api_server(api.app)
+    workload = Workload(args.distinct_profiles, args.skew, args.seed)
+    local = threading.local()
+
+    def http_client() -> "httpx.Client":
+        if not hasattr(local, "client"):
+            local.client = httpx.Client(base_url=api_url, timeout=120)
+        return local.client
+
+    def embedding_call():
+        profile = workload.next_profile()
+        get_embedding_service().get_embeddings([preference_text(value) for value in profile.values()])
+
+    vectors = [list(map(float, np.random.default_rng(i).standard_normal(args.dimensions))) for i in range(8)]
+
+    def vector_store_call():
+        get_vector_store(BENCH_TOKEN).search_travel_packages(*vectors, match_count=10)
+
+    def search_call():
+        response = http_client().post(
+            "/search-travel-packages", params={"authorization": f"Bearer {BENCH_TOKEN}"},
+            json=dict(workload.next_profile(), match_count=10)
+        )
+        response.raise_for_status()
+
+    def ask_call():
+        profile = workload.next_profile()
+        query = f"I want a trip to {profile['location_input']} {profile['duration_input']} {profile['activities_input']}"
+        # The fake model fills the tool call from the profile, independently of the
+        # app's extractor, so the speculative search hit rate is a fair estimate
+        openai_server.expect_tool_call(query, {
+            slot: profile[slot] for slot in ("location_input", "duration_input", "activities_input")
+        })
+        response = http_client().post(
+            "/ask", params={"authorization": f"Bearer {BENCH_TOKEN}"}, json={"query": query}
+        )
+        response.raise_for_status()
+
+    # Caller-side cost of one INFO record on the search hot path (summary of a result page)
+    hot_path_logger = logging.getLogger("benchmarks.hot_path")
+    hot_path_logger.setLevel(logging.INFO)
+    sample_packages = [catalog.row(i, with_vectors=False) for i in range(min(50, args.packages))]
+
+    def logging_call():
+        hot_path_logger.info("Travel package search completed",
+                             extra={"packages": summarize_packages(sample_packages)})
+
+    # CPU-bound jobs: one request at a time, spread over PROCESS_POOL_WORKERS processes
+    batch_profiles = make_profiles(args.batch_profiles, args.seed)
+
+    def batch_scoring_call():
+        batch_search = BatchTravelPackageSearch(
+            embedding_service=get_embedding_service(),
+            index=get_travel_package_index(),
+            chunk_size=config.batch_search_chunk_size,
+            embedding_batch_size=config.embedding_batch_max_size,
+        )
+        for _ in batch_search.search(batch_profiles, [50] * len(batch_profiles)):
+            pass
+
+    ingestion_rows = []
+
+    def ingestion_call():
+        if not ingestion_rows:
+            ingestion_rows.extend(catalog.rows(0, args.packages))
+        TravelPackageIndex.from_rows(ingestion_rows, executor=get_process_pool(), chunk_size=config.ingest_chunk_size)
+
+    operations = {
+        "embedding_service": (embedding_call, args.concurrency, args.requests),
+        "vector_store": (vector_store_call, args.concurrency, args.requests),
+        "search_endpoint": (search_call, args.concurrency, args.requests),
+        "ask_endpoint": (ask_call, args.ask_concurrency, args.requests),
+        "logging": (logging_call, args.concurrency, args.requests),
+        "batch_scoring": (batch_scoring_call, 1, args.batch_requests),
+        "ingestion": (ingestion_call, 1, args.batch_requests),
+    }
+
+    results = {}
+    for name in [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]:
+        if name not in operations:
+            parser.error(f"Unknown scenario {name}; choose from {', '.join(SCENARIOS)}")
+        if name == "ask_endpoint":
+            api.agent_initializer.setup_agent(BENCH_TOKEN)
+        operation, concurrency, requests = operations[name]
+        upstream_before = openai_server.requests + supabase_server.requests
+        summary = run_load(operation, requests, concurrency)
+        summary["upstream_requests"] = dict(openai_server.requests + supabase_server.requests - upstream_before)
+        results[name] = summary
+        print(f"{name:18s} p50={summary['p50_ms']:8.1f}ms p95={summary['p95_ms']:8.1f}ms "
+              f"p99={summary['p99_ms']:8.1f}ms {summary['throughput_rps']:8.1f} req/s errors={summary['errors']}")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": results,
+        "counters": {
+            "embedding_cache": EmbeddingService.cache_stats(),
+            "embedding_coalescing": EmbeddingService.coalescing_stats(),
+            "embedding_batching": EmbeddingService.batching_stats(),
+            "search_coalescing": SupabaseVectorStore.coalescing_stats(),
+            "query_router": api.agent_initializer.query_router.stats(),
+            "speculative_search": speculative_search.stats(),
+            "llm_cache": api.agent_initializer.gpt4_llm.cache_stats(),
+            "admission": {"ask": ask_admission.stats(), "search": search_admission.stats()},
+            "embedded_texts": openai_server.embedded_texts,
+        },
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    openai_server.stop()
+    supabase_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
-from typing import Annotated, List, Dict
+from typing import Annotated, Iterator, List, Dict, Optional
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, ORJSONResponse, Response
 from pydantic import BaseModel
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import orjson
+import time
+from starlette.concurrency import run_in_threadpool
 import logging
 
 # Import from our application structure
@@ -12,24 +14,35 @@ from app.agent.agent_rag import AgentRag
 from app.models.request_models import (
     QueryRequest, 
     SignInRequest, 
+    SavedPreferencesRequest,
     TravelPackageSearchRequest,
+    TravelPackageBatchSearchRequest,
     TravelPackageSearchResponse,
-    TravelPackage
+    TRAVEL_PACKAGE_REQUIRED_FIELDS
 )
-from app.utils.response_utils import create_response, validate_params
-from app.utils.crypto_utils import encrypt_password, decrypt_password
+from app.utils.response_utils import create_response, validate_params, project_travel_package
+from app.utils.crypto_utils import encrypt_password, decrypt_password, hash_token
+from app.utils.lru import TTLCache
 from app.history.history_module import HistoryModule
 from app.config.supabase_config import get_supabase_client
 from app.config.env_config import config
-from app.services.embeddings import EmbeddingService
-from app.vectorstore.supabase_vectorstore import SupabaseVectorStore
-from app.tools.search.search_tools import SearchTravelPackagesTool
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG if config.debug else logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from app.services.embeddings import get_embedding_service
+from app.vectorstore.supabase_vectorstore import get_vector_store, resolve_user_id
+from app.tools.search.search_tools import PreferenceProfile, SearchTravelPackagesTool
+from app.services.search_cursor_store import search_cursor_store, CursorExpiredError
+from app.services.batch_search import BatchTravelPackageSearch
+from app.services.admission_control import AdmissionRejectedError, ask_admission, search_admission
+from app.services.resilience import CircuitOpenError, is_retryable
+from app.services.recommendation_materializer import recommendation_materializer
+from app.services.embedding_warmup import embedding_warmup
+from app.vectorstore.catalog import catalog_refresher, get_location_gazetteer, get_travel_package_index
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA
+from app.telemetry.metrics import HTTP_REQUEST_DURATION, render_metrics, setup_tracing, span
+from app.telemetry.log_config import sample_debug, setup_logging, strip_vectors, summarize_packages
+from app.telemetry.query_log import query_log
+
+# Configure logging: records are written by a background thread, not the request path
+setup_logging()
 
 # Create FastAPI app
 app = FastAPI(
@@ -47,7 +60,68 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-executor = ThreadPoolExecutor(max_workers=4)
+@app.exception_handler(AdmissionRejectedError)
+async def admission_rejected(request: Request, exc: AdmissionRejectedError):
+    """Answer rate-limited and shed requests with 429/503 and a Retry-After hint."""
+    return ORJSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": exc.retry_after_header}
+    )
+
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    """Record the duration of every request, labelled by route template."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        if config.metrics_enabled:
+            route = request.scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                request.method, route.path if route else "unmatched", str(status)
+            ).observe(time.perf_counter() - start)
+
+@app.middleware("http")
+async def capture_queries(request: Request, call_next):
+    """Write sampled /ask and search requests to the query log (QUERY_LOG_PATH) for replay."""
+    if not query_log.should_capture(request.method, request.url.path):
+        return await call_next(request)
+    started_at = time.time()
+    start = time.perf_counter()
+    # Starlette caches the body, so the endpoint can still read it
+    body = await request.body()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        query_log.capture(
+            request.url.path,
+            body,
+            request.query_params.get("authorization"),
+            status,
+            started_at,
+            (time.perf_counter() - start) * 1000
+        )
+
+@app.on_event("startup")
+async def start_embedding_warmup():
+    """Pre-fill the embedding cache with frequent preference strings; /ready waits for it."""
+    embedding_warmup.start()
+
+@app.on_event("startup")
+async def start_recommendations():
+    """Pick up preferences saved through other workers (or before a restart) in the background."""
+    if config.recommendations_enabled:
+        recommendation_materializer.start()
+
+# Export traces to a local collector when OTEL_EXPORTER_OTLP_ENDPOINT is set
+setup_tracing()
 
 # Create Supabase client
 supabase = get_supabase_client()
@@ -89,7 +163,7 @@ async def authenticate(command: str, payload: SignInRequest):
                 'email': params['email'],
                 'password': password
             })
-            agent_initializer.setup_agent(response.session.access_token)
+            agent_initializer.setup_agent(response.session.access_token, response.user.id)
             logger.info(f"Agent initialized for user: {params['email']}")
             return create_response(response, 200)
         
@@ -127,17 +201,19 @@ async def authenticate(command: str, payload: SignInRequest):
         raise HTTPException(status_code=404, detail=f"Authentication type '{command}' not recognized")
 
 # A helper function to process the query synchronously
-def process_query(query: str) -> str:
+def process_query(query: str, user_id: str, token: str) -> str:
     """
     Process a user query using the agent.
     
     Args:
         query: The user's question
+        user_id: The caller's user ID
+        token: The caller's access token
     
     Returns:
         The agent's response
     """
-    response = agent_initializer.agent_query(query)
+    response = agent_initializer.agent_query(query, user_id, token)
     return response
     
 # Define a POST endpoint to receive user queries
@@ -154,12 +230,15 @@ async def ask_query(payload: QueryRequest, authorization: str):
         The agent's response
     """
     query = payload.query
-    auth_header = authorization
+    token = authorization.replace("Bearer ", "").strip()
     logger.debug(f"Processing query: {query}")
     
-    # Offload the blocking agent call to a thread pool to avoid blocking the event loop
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(executor, process_query, query)
+    # Rate limits are per user, however many tokens they hold
+    user_id = await resolve_caller(token)
+    
+    # Run the blocking agent call on the agent pool, unless the caller is over
+    # their rate limit or the queue is too long to answer within the SLO
+    result = await ask_admission.run(user_id, process_query, query, user_id, token)
     
     if not result:
         raise HTTPException(status_code=500, detail="Failed to process query")
@@ -177,8 +256,7 @@ def process_travel_search(
     activities_input: str,
     notes_input: str,
     match_count: int,
-    vector_store: SupabaseVectorStore,
-    embedding_service: EmbeddingService
+    search_tool: SearchTravelPackagesTool
 ) -> List[Dict]:
     """
     Process a travel package search using the search tool.
@@ -193,17 +271,11 @@ def process_travel_search(
         activities_input: Activities preferences
         notes_input: Additional notes or preferences
         match_count: Number of results to return
-        vector_store: The Supabase vector store instance
-        embedding_service: The embedding service instance
+        search_tool: The travel package search tool for the caller
     
     Returns:
         List of travel package dictionaries
     """
-    search_tool = SearchTravelPackagesTool(
-        vector_store=vector_store,
-        embedding_service=embedding_service
-    )
-    
     # Get the raw results (list of dictionaries) directly from the search tool
     packages = search_tool(
         location_input=location_input,
@@ -217,12 +289,80 @@ def process_travel_search(
         match_count=match_count
     )
 
-    logger.info(f"Raw packages from search tool: {packages}")
+    logger.info("Travel package search completed", extra={"packages": summarize_packages(packages)})
+    if sample_debug(logger):
+        logger.debug("Travel package search results", extra={"packages": strip_vectors(packages or [])})
     
     # No need to parse string results anymore
     # Simply return the list of dictionaries
     return packages
 
+# Search tools are bound to a token (RLS), preference profiles to the user, so
+# a profile survives token refresh while a tool expires with its token
+travel_search_tools = TTLCache(config.auth_cache_max_entries, config.auth_cache_ttl_seconds)
+preference_profiles = TTLCache(
+    config.preference_profile_max_entries, config.preference_profile_ttl_seconds, sliding=True
+)
+
+async def resolve_caller(token: str) -> str:
+    """
+    Get the caller's user ID, verifying the token with Supabase Auth (cached per token).
+    
+    Args:
+        token: The caller's access token
+    
+    Returns:
+        The caller's user ID
+    """
+    try:
+        return await run_in_threadpool(resolve_user_id, token)
+    except Exception as e:
+        if isinstance(e, CircuitOpenError) or is_retryable(e):
+            raise HTTPException(status_code=503, detail="Authentication service is unavailable")
+        raise HTTPException(status_code=401, detail="Invalid or expired access token")
+
+def get_travel_search_tool(token: str, user_id: str) -> SearchTravelPackagesTool:
+    """
+    Get the travel package search tool for a caller, built once per token.
+    
+    Args:
+        token: The caller's access token
+        user_id: The caller's user ID
+    
+    Returns:
+        A SearchTravelPackagesTool sharing the process-wide embedding service,
+        with the user's preference profile
+    """
+    profile = preference_profiles.get_or_create(user_id, PreferenceProfile)
+    return travel_search_tools.get_or_create(hash_token(token), lambda: SearchTravelPackagesTool(
+        vector_store=get_vector_store(token),
+        embedding_service=get_embedding_service(),
+        profile=profile
+    ))
+
+def complete_packages(packages: List[Dict]) -> List[Dict]:
+    """
+    Project package rows onto the TravelPackage response fields, skipping incomplete rows.
+    
+    Args:
+        packages: List of travel package dictionaries
+    
+    Returns:
+        List of TravelPackage response dictionaries, in input order
+    """
+    valid_packages = []
+    for pkg in packages:
+        # Drops combined_score and vector columns, and coerces field types
+        projected = project_travel_package(pkg)
+        if projected is not None:
+            valid_packages.append(projected)
+        else:
+            # Log a warning or handle the incomplete package data
+            missing_keys = {key for key in TRAVEL_PACKAGE_REQUIRED_FIELDS if pkg.get(key) is None}
+            logger.warning(f"Skipping incomplete package {pkg.get('id')}. Missing required keys: {missing_keys}")
+
+    return valid_packages
+
 # Define a POST endpoint to search travel packages
 @app.post("/search-travel-packages", response_model=TravelPackageSearchResponse)
 async def search_travel_packages(
@@ -252,18 +392,44 @@ async def search_travel_packages(
     # Remove 'Bearer ' prefix and any extra spaces
     token = auth_header.replace("Bearer ", "").strip()
     
-    # Initialize vector store and embedding service
-    vector_store = SupabaseVectorStore(
-        url=config.supabase_url,
-        key=config.supabase_anon_key,
-        auth=token  # Pass the clean token without 'Bearer ' prefix
-    )
-    embedding_service = EmbeddingService()
+    page_size = payload.match_count or 10
+    user_id = await resolve_caller(token)
+
+    # Later pages are served from the ranked list stored with the first page
+    if payload.cursor:
+        try:
+            packages, next_cursor = await search_admission.run(
+                user_id, search_cursor_store.page, token, payload.cursor, page_size
+            )
+        except CursorExpiredError as e:
+            raise HTTPException(status_code=410, detail=str(e))
+        return ORJSONResponse({
+            "packages": packages,
+            "total_count": len(packages),
+            "next_cursor": next_cursor
+        })
+
+    # Searches for the user's saved preferences are served from the materialized list
+    if config.recommendations_enabled:
+        profile = {criterion: getattr(payload, f"{criterion}_input") for criterion in TRAVEL_PACKAGE_CRITERIA}
+        recommended = recommendation_materializer.lookup(user_id, profile)
+        if recommended is not None and page_size <= recommendation_materializer.top_n:
+            next_cursor = search_cursor_store.create(token, recommended, page_size)
+            travel_packages = recommended[:page_size]
+            return ORJSONResponse({
+                "packages": travel_packages,
+                "total_count": len(travel_packages),
+                "next_cursor": next_cursor
+            })
+
+    search_tool = get_travel_search_tool(token, user_id)
     
-    # Offload the blocking search to a thread pool
-    loop = asyncio.get_event_loop()
-    packages = await loop.run_in_executor(
-        executor,
+    # Fetch enough ranked results for later pages in the same search
+    fetch_count = max(page_size, config.search_cursor_max_results)
+
+    # Run the blocking search on the search pool (separate from agent queries)
+    packages = await search_admission.run(
+        user_id,
         process_travel_search,
         payload.location_input,
         payload.duration_input,
@@ -273,38 +439,102 @@ async def search_travel_packages(
         payload.food_input,
         payload.activities_input,
         payload.notes_input,
-        payload.match_count,
-        vector_store,
-        embedding_service
+        fetch_count,
+        search_tool
     )
     
+    cpu_start = time.thread_time()
+    with span("search_endpoint.build_response", rows=len(packages)):
+        valid_packages = complete_packages(packages)
+        next_cursor = search_cursor_store.create(token, valid_packages, page_size)
+        travel_packages = valid_packages[:page_size]
 
-    valid_packages = []
-    # Get required field names (works for Pydantic v1 and v2)
-    required_keys = {name for name, field in TravelPackage.__fields__.items() if field.is_required}
-    # For Pydantic v2 specifically, you could use:
-    # required_keys = {name for name, field_info in TravelPackage.model_fields.items() if field_info.is_required()}
-    # We'll use the __fields__ approach for broader compatibility for now.
-
-    for pkg in packages:
-        # Remove the combined_score if it exists
-        pkg.pop('combined_score', None)
-
-        # Check if all required keys are present
-        if all(key in pkg for key in required_keys):
-            # Optional: Add further checks here if needed, e.g., ensure values are not None
-            valid_packages.append(pkg)
-        else:
-            # Log a warning or handle the incomplete package data
-            missing_keys = required_keys - pkg.keys()
-            logger.warning(f"Skipping incomplete package data: {pkg}. Missing required keys: {missing_keys}")
-
-    travel_packages = [TravelPackage(**pkg) for pkg in valid_packages]
+        # Rows are already projected onto TravelPackage, so serialize them
+        # straight to JSON bytes instead of re-validating through Pydantic
+        response = ORJSONResponse({
+            "packages": travel_packages,
+            "total_count": len(travel_packages),
+            "next_cursor": next_cursor
+        })
+    logger.debug(
+        f"Built search response for {len(packages)} rows in "
+        f"{(time.thread_time() - cpu_start) * 1000:.2f} ms CPU"
+    )
+    return response
 
-    return TravelPackageSearchResponse(
-        packages=travel_packages,
-        total_count=len(travel_packages)
+def process_batch_search(profiles: List[Dict[str, Optional[str]]], match_counts: List[int]) -> Iterator[bytes]:
+    """
+    Score many preference profiles against the in-process catalog index.
+    
+    Args:
+        profiles: Preference inputs of each request, keyed by criterion
+        match_counts: Number of packages wanted for each request
+    
+    Yields:
+        NDJSON lines, one per request as its chunk is scored: its position, packages and total count
+    """
+    batch_search = BatchTravelPackageSearch(
+        embedding_service=get_embedding_service(),
+        index=get_travel_package_index(),
+        chunk_size=config.batch_search_chunk_size,
+        embedding_batch_size=config.embedding_batch_max_size,
+        gazetteer=get_location_gazetteer() if config.location_prefilter_enabled else None
     )
+    for position, packages in batch_search.search(profiles, match_counts):
+        travel_packages = complete_packages(packages)
+        yield orjson.dumps({
+            "index": position,
+            "packages": travel_packages,
+            "total_count": len(travel_packages)
+        }) + b"\n"
+
+# Define a POST endpoint to search travel packages for many preference profiles
+@app.post("/search-travel-packages/batch")
+async def search_travel_packages_batch(
+    authorization: str,
+    payload: TravelPackageBatchSearchRequest
+):
+    """
+    Search travel packages for many preference profiles in one call.
+    
+    All preference strings are deduplicated and batch-embedded, and the
+    profiles are scored against the in-process catalog index as matrix
+    operations. Cursors are not supported; each profile gets its top
+    match_count packages.
+    
+    Args:
+        payload: The list of travel package search requests
+    
+    Returns:
+        NDJSON stream with one line per request: its position, packages and total count
+    """
+    auth_header = authorization
+    
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(
+            status_code=401,
+            detail="Valid Authorization header with Bearer token is required"
+        )
+    
+    token = auth_header.replace("Bearer ", "").strip()
+    
+    if len(payload.requests) > config.batch_search_max_profiles:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {config.batch_search_max_profiles} requests are allowed per batch"
+        )
+    
+    user_id = await resolve_caller(token)
+    profiles = [
+        {criterion: getattr(request, f"{criterion}_input") for criterion in TRAVEL_PACKAGE_CRITERIA}
+        for request in payload.requests
+    ]
+    match_counts = [request.match_count or 10 for request in payload.requests]
+    
+    # Embedding and scoring run on the search pool, and the batch holds its
+    # admission slot until the last line has been streamed
+    lines = await search_admission.stream(user_id, process_batch_search, profiles, match_counts)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 # Add a simple health check endpoint
 @app.get("/health")
@@ -312,6 +542,54 @@ async def health_check():
     """Simple health check endpoint to verify the API is running."""
     return {"status": "ok"}
 
+# Readiness probe: unlike /health, fails until the startup warm-up is done (or out of time)
+@app.get("/ready")
+async def readiness_check():
+    """Report ready once the embedding cache warm-up has finished or hit its time cap."""
+    stats = embedding_warmup.stats()
+    return ORJSONResponse(status_code=200 if stats["ready"] else 503, content=stats)
+
+# Report which travel package catalog version is being served and how fresh it is
+@app.get("/catalog/status")
+async def catalog_status():
+    """Active catalog version and refresh ages (null until the catalog is first loaded)."""
+    return catalog_refresher.stats()
+
+# Save the caller's preferences so their recommendations are kept ranked in the background
+@app.post("/preferences")
+async def save_preferences(authorization: str, payload: SavedPreferencesRequest):
+    """
+    Save the caller's travel preferences for materialized recommendations.
+    
+    Args:
+        payload: The preference inputs to save
+    
+    Returns:
+        Confirmation that the preferences were saved
+    """
+    if not config.recommendations_enabled:
+        raise HTTPException(status_code=404, detail="Recommendations are disabled")
+    token = authorization.replace("Bearer ", "").strip()
+    user_id = await resolve_caller(token)
+    profile = {criterion: getattr(payload, f"{criterion}_input") for criterion in TRAVEL_PACKAGE_CRITERIA}
+    recommendation_materializer.save_profile(user_id, profile)
+    return {"saved": True}
+
+# Report how many users have current materialized recommendations
+@app.get("/recommendations/status")
+async def recommendations_status():
+    """Materialized recommendation counts, refresh age and lookup outcomes."""
+    return recommendation_materializer.stats()
+
+# Expose per-stage latency histograms and service counters to Prometheus
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint."""
+    if not config.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    data, content_type = render_metrics()
+    return Response(content=data, media_type=content_type)
+
 # ------------------------------------------------------------
 # Main Function
 # ------------------------------------------------------------
@@ -0,0 +1,53 @@
+"""
+Write a memory-mapped snapshot of the travel package catalog.
+
+Run after each ingestion of provider data (from the repository root):
+
+    python -m scripts.build_catalog_snapshot --output /var/lib/travel-buddy/catalog
+
+Workers started with CATALOG_SNAPSHOT_DIR pointing at the same directory
+map the new snapshot on their next catalog refresh.
+"""
+import argparse
+import logging
+import time
+
+from app.config.env_config import config
+from app.config.supabase_config import get_service_supabase_client, get_supabase_client
+from app.services.process_pool import get_process_pool
+from app.vectorstore.catalog_snapshot import prune_snapshots, write_snapshot
+from app.vectorstore.travel_package_index import TravelPackageIndex
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=config.catalog_snapshot_dir,
+                        help="Snapshot root directory (default: CATALOG_SNAPSHOT_DIR)")
+    parser.add_argument("--auth", default=None,
+                        help="Authorization header used to read travel_packages (default: SUPABASE_SERVICE_KEY)")
+    parser.add_argument("--page-size", type=int, default=config.catalog_page_size)
+    parser.add_argument("--keep", type=int, default=2, help="Number of snapshots to keep")
+    args = parser.parse_args()
+    if not args.output:
+        parser.error("--output or CATALOG_SNAPSHOT_DIR is required")
+
+    started = time.perf_counter()
+    index = TravelPackageIndex.load_from_supabase(
+        get_supabase_client(args.auth) if args.auth else get_service_supabase_client(),
+        page_size=args.page_size,
+        executor=get_process_pool(),
+        chunk_size=config.ingest_chunk_size
+    )
+    path = write_snapshot(index, args.output)
+    prune_snapshots(args.output, keep=args.keep)
+    logger.info(f"Snapshot {path} ready in {time.perf_counter() - started:.1f}s: {index.stats()}")
+
+
+if __name__ == "__main__":
+    main()
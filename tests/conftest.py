@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Run from any directory: the application is imported as the top-level `app` package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Module-level clients read these at import time; the tests never reach the network
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("VITE_PUBLIC_BASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("VITE_VITE_APP_SUPABASE_ANON_KEY", "test-anon-key")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
+os.environ.setdefault("JWT_PRIVATE_KEY", "test-jwt-key")
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.admission_control import AdmissionController, AdmissionRejectedError, RateLimiter, TokenBucket
+
+
+def test_token_bucket_allows_a_burst_then_waits_for_refill():
+    bucket = TokenBucket(rate=2.0, burst=3)
+    now = bucket.updated
+
+    assert [bucket.try_acquire(now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire(now) == pytest.approx(0.5)
+    assert bucket.try_acquire(now + 0.5) == 0.0
+
+
+def test_token_bucket_never_holds_more_than_its_burst():
+    bucket = TokenBucket(rate=10.0, burst=2)
+    now = bucket.updated + 60
+
+    assert [bucket.try_acquire(now) for _ in range(2)] == [0.0, 0.0]
+    assert bucket.try_acquire(now) > 0
+
+
+def test_rate_limiter_keeps_one_bucket_per_user():
+    limiter = RateLimiter(per_minute=60, burst=1)
+
+    assert limiter.check("user-1") == 0.0
+    assert limiter.check("user-1") > 0
+    assert limiter.check("user-2") == 0.0
+
+
+def test_rate_limiter_forgets_the_least_recently_seen_user():
+    limiter = RateLimiter(per_minute=60, burst=1, max_users=1)
+    limiter.check("user-1")
+    limiter.check("user-2")
+
+    assert limiter.check("user-1") == 0.0
+
+
+def test_admission_rejects_callers_over_their_rate_limit():
+    controller = AdmissionController("test", max_workers=1, max_queue=10, slo_seconds=10,
+                                     rate_limiter=RateLimiter(per_minute=60, burst=1))
+
+    assert asyncio.run(controller.run("user-1", lambda: "done")) == "done"
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        asyncio.run(controller.run("user-1", lambda: "done"))
+    assert rejected.value.status_code == 429
+    assert rejected.value.retry_after_header == "1"
+    assert controller.stats()["rejected"] == {"rate_limited": 1}
+
+
+def test_admission_rejects_when_the_queue_is_full():
+    controller = AdmissionController("test", max_workers=1, max_queue=0, slo_seconds=10)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(controller.run(None, release.wait))
+        await asyncio.sleep(0.05)
+        try:
+            with pytest.raises(AdmissionRejectedError) as rejected:
+                await controller.run(None, lambda: "done")
+        finally:
+            release.set()
+            await running
+        return rejected.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert controller.stats()["pending"] == 0
+
+
+def test_streams_hold_their_slot_until_exhausted():
+    controller = AdmissionController("test", max_workers=1, max_queue=10, slo_seconds=10)
+
+    async def scenario():
+        lines = await controller.stream(None, lambda: iter(["a", "b"]))
+        received = []
+        async for line in lines:
+            received.append((line, controller.stats()["pending"]))
+        return received
+
+    assert asyncio.run(scenario()) == [("a", 1), ("b", 1)]
+    assert controller.stats()["pending"] == 0
+
+
+def test_closing_a_stream_releases_its_slot_and_stops_the_generator():
+    controller = AdmissionController("test", max_workers=1, max_queue=10, slo_seconds=10)
+    produced = []
+
+    def generate():
+        for line in range(100):
+            produced.append(line)
+            yield line
+
+    async def scenario():
+        lines = await controller.stream(None, generate)
+        assert await lines.__anext__() == 0
+        await lines.aclose()
+
+    asyncio.run(scenario())
+    assert produced == [0]
+    assert controller.stats()["pending"] == 0
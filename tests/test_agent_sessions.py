@@ -0,0 +1,90 @@
+from contextlib import contextmanager
+
+import pytest
+
+from app.agent import agent_rag
+from app.agent.agent_rag import AgentRag
+from app.services.search_cursor_store import CursorExpiredError, search_cursor_store
+
+
+def package(number):
+    return {"id": f"p{number}", "title": f"Trip {number}", "provider_id": "1", "location_id": "1",
+            "price": 100.0, "duration_days": 3, "highlights": [], "description": "A trip."}
+
+
+@pytest.fixture(scope="module")
+def agent():
+    return AgentRag(history_module=None)
+
+
+def session_of(agent, user_id):
+    return agent.sessions._entries[user_id][1]
+
+
+@contextmanager
+def answering(user_id, auth=None):
+    """Answer as a caller, the way agent_query sets it up."""
+    caller, caller_auth = agent_rag._caller.set(user_id), agent_rag._caller_auth.set(auth)
+    try:
+        yield
+    finally:
+        agent_rag._caller_auth.reset(caller_auth)
+        agent_rag._caller.reset(caller)
+
+
+def test_a_sign_in_only_resets_the_signing_in_user(agent):
+    agent.setup_agent("token-a", "user-a")
+    session_a = session_of(agent, "user-a")
+    session_a.travel_search_cursor = "cursor-a"
+
+    agent.setup_agent("token-b", "user-b")
+    assert session_of(agent, "user-a") is session_a
+    assert session_a.travel_search_cursor == "cursor-a"
+
+    agent.setup_agent("token-a2", "user-a")
+    assert session_of(agent, "user-a") is not session_a
+    assert session_of(agent, "user-a").auth == "token-a2"
+
+
+def test_cursors_are_bound_to_the_session_owner(agent, monkeypatch):
+    agent.setup_agent("token-c", "user-c")
+    session = session_of(agent, "user-c")
+    monkeypatch.setattr(session, "search_tool", lambda **kwargs: [package(n) for n in range(30)])
+    # Another user signs in after user-c
+    agent.setup_agent("token-d", "user-d")
+
+    with answering("user-c"):
+        agent.search_travel_packages({"location_input": "Bali"}, match_count=2)
+
+    packages, _ = search_cursor_store.page("token-c", session.travel_search_cursor, 2)
+    assert [row["id"] for row in packages] == ["p2", "p3"]
+    with pytest.raises(CursorExpiredError):
+        search_cursor_store.page("token-d", session.travel_search_cursor, 2)
+
+
+def test_a_refreshed_token_keeps_the_preference_profile(agent):
+    agent.setup_agent("token-e", "user-e")
+    session = session_of(agent, "user-e")
+    profile = session.search_tool.profile
+
+    with answering("user-e", "token-e2"):
+        assert agent._session() is session
+
+    assert session.auth == "token-e2"
+    assert session.search_tool.profile is profile
+
+
+def test_package_references_are_kept_per_user(agent, monkeypatch):
+    for user in ("user-f", "user-g"):
+        agent.setup_agent(f"token-{user}", user)
+        monkeypatch.setattr(session_of(agent, user), "search_tool", lambda **kwargs: [package(1)])
+
+    with answering("user-f"):
+        _, first = agent.search_travel_packages({"location_input": "Bali"}, match_count=1)
+    with answering("user-g"):
+        _, other = agent.search_travel_packages({"location_input": "Bali"}, match_count=1)
+    with answering("user-f"):
+        _, repeated = agent.search_travel_packages({"location_input": "Bali"}, match_count=1)
+
+    assert other == first and "already shown" not in other
+    assert repeated == "[P1] Trip 1 (already shown above)"
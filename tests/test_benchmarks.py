@@ -0,0 +1,88 @@
+import json
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from app.services.embeddings import EmbeddingService
+from app.vectorstore.supabase_vectorstore import SupabaseVectorStore
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA, TRAVEL_PACKAGE_WEIGHTS
+from benchmarks import compare
+from benchmarks.catalog import SyntheticCatalog, text_vector
+from benchmarks.fake_upstreams import FakeOpenAIServer, FakeSupabaseServer
+from benchmarks.run import run_load
+
+
+@pytest.fixture
+def openai_server(monkeypatch):
+    server = FakeOpenAIServer(dimensions=16).start()
+    monkeypatch.setenv("OPENAI_BASE_URL", f"{server.url}/v1")
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def catalog():
+    return SyntheticCatalog(300, dimensions=16, seed=3)
+
+
+@pytest.fixture
+def supabase_server(catalog, monkeypatch):
+    server = FakeSupabaseServer(catalog).start()
+    monkeypatch.setenv("VITE_PUBLIC_BASE_URL", server.url)
+    yield server
+    server.stop()
+
+
+def test_fake_openai_serves_deterministic_embeddings_to_the_app_client(openai_server):
+    vectors = EmbeddingService(api_key="sk-test").get_embeddings(["Bali", "5 days"])
+
+    np.testing.assert_allclose(vectors, [text_vector("Bali", 16), text_vector("5 days", 16)], rtol=1e-6)
+    assert openai_server.embedded_texts == 2
+
+
+def test_fake_supabase_ranks_like_the_weighted_catalog_scores(catalog, supabase_server):
+    vectors = [text_vector(criterion, 16) for criterion in TRAVEL_PACKAGE_CRITERIA]
+    store = SupabaseVectorStore(url=supabase_server.url, key="test-anon-key", auth="benchmark-token")
+
+    rows = store.search_travel_packages(*[vector.tolist() for vector in vectors], match_count=5)
+
+    scores = sum(TRAVEL_PACKAGE_WEIGHTS[criterion] * (catalog.matrices[criterion] @ vector)
+                 for criterion, vector in zip(TRAVEL_PACKAGE_CRITERIA, vectors))
+    assert [row["id"] for row in rows] == [catalog.row(int(i))["id"] for i in np.argsort(-scores)[:5]]
+
+
+def test_run_load_counts_failures_separately_from_latencies():
+    calls = iter(range(10))
+
+    def operation():
+        if next(calls) % 5 == 0:
+            raise RuntimeError("upstream error")
+        time.sleep(0.001)
+
+    summary = run_load(operation, requests=10, concurrency=2)
+
+    assert (summary["count"], summary["errors"]) == (8, 2)
+    assert 1.0 <= summary["p50_ms"] <= summary["p95_ms"] <= summary["max_ms"]
+
+
+def write_results(path, p95_ms):
+    metrics = {"p50_ms": 10.0, "p95_ms": p95_ms, "p99_ms": 30.0, "throughput_rps": 100.0}
+    path.write_text(json.dumps({"commit": "abc", "results": {"search_endpoint": metrics}}))
+    return str(path)
+
+
+@pytest.mark.parametrize("head_p95, regressed", [(21.5, False), (23.0, True)])
+def test_compare_fails_only_past_the_p95_threshold(tmp_path, monkeypatch, capsys, head_p95, regressed):
+    base = write_results(tmp_path / "base.json", 20.0)
+    head = write_results(tmp_path / "head.json", head_p95)
+    monkeypatch.setattr(sys, "argv", ["compare", base, head, "--threshold", "10"])
+
+    if regressed:
+        with pytest.raises(SystemExit) as exit_info:
+            compare.main()
+        assert exit_info.value.code == 1
+    else:
+        compare.main()
+    assert "search_endpoint" in capsys.readouterr().out
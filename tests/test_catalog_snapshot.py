@@ -0,0 +1,140 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.vectorstore import catalog
+from app.vectorstore.catalog import CatalogRefresher
+from app.vectorstore.catalog_snapshot import current_snapshot, open_snapshot, prune_snapshots, write_snapshot
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA, TravelPackageIndex, normalize_rows
+
+
+def make_index(version="v1", size=5, dimensions=4):
+    rng = np.random.default_rng(0)
+    packages = [
+        {"id": f"p{row}", "title": f"Package {row}", "price": 100.0 * row,
+         "highlights": ["Beach", f"Tour {row}"], "location_id": f"loc{row % 2}"}
+        for row in range(size)
+    ]
+    # A column missing from some rows
+    packages[0]["image_url"] = "https://example.com/0.jpg"
+    packages[3]["image_url"] = None
+    matrices = {
+        criterion: normalize_rows(rng.standard_normal((size, dimensions)).astype(np.float32))
+        for criterion in TRAVEL_PACKAGE_CRITERIA
+    }
+    return TravelPackageIndex(packages, matrices, version=version)
+
+
+def test_snapshot_round_trip(tmp_path):
+    index = make_index()
+
+    path = write_snapshot(index, str(tmp_path))
+    opened = open_snapshot(str(tmp_path))
+
+    assert opened.snapshot_path == path == current_snapshot(str(tmp_path))
+    assert opened.version == index.version
+    assert (opened.size, opened.dimensions) == (index.size, index.dimensions)
+    # Every row, including row 0 of every column after the first
+    assert list(opened.packages) == index.packages
+    assert opened.packages[-1] == index.packages[-1]
+    assert opened.packages.column("title") == [package["title"] for package in index.packages]
+    assert opened.packages.column("image_url")[:2] == ["https://example.com/0.jpg", None]
+    for criterion in TRAVEL_PACKAGE_CRITERIA:
+        np.testing.assert_array_equal(opened.matrices[criterion], index.matrices[criterion])
+
+
+def test_new_snapshot_becomes_current_and_old_ones_are_pruned(tmp_path):
+    for version in ("v1", "v2", "v3"):
+        write_snapshot(make_index(version), str(tmp_path))
+
+    assert open_snapshot(str(tmp_path)).version == "v3"
+    prune_snapshots(str(tmp_path), keep=2)
+    assert sorted(entry.name for entry in tmp_path.iterdir() if entry.is_dir()) == ["v2", "v3"]
+
+
+def write_version(root, version):
+    """Write a snapshot whose titles name its version, so a reader can tell which index a row came from."""
+    index = make_index(version)
+    for package in index.packages:
+        package["title"] = f"{version} {package['id']}"
+    return write_snapshot(index, str(root))
+
+
+@pytest.fixture
+def refresher(tmp_path, monkeypatch):
+    monkeypatch.setenv("CATALOG_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setenv("CATALOG_REFRESH_SECONDS", "3600")
+    write_version(tmp_path, "v1")
+    refresher = CatalogRefresher()
+    yield refresher
+    refresher.stop()
+
+
+def test_refresh_swaps_only_when_a_new_snapshot_is_current(refresher, tmp_path):
+    assert refresher.get().version == "v1"
+    assert not refresher.refresh()
+
+    write_version(tmp_path, "v2")
+
+    assert refresher.refresh()
+    assert refresher.active_version == "v2"
+    assert (refresher.checks, refresher.swaps) == (2, 1)
+
+
+def test_readers_keep_the_old_index_during_a_slow_load_and_never_see_a_mixed_one(refresher, tmp_path, monkeypatch):
+    refresher.get()
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_open(path):
+        loading.set()
+        release.wait(5)
+        return open_snapshot(path)
+
+    monkeypatch.setattr(catalog, "open_snapshot", slow_open)
+    write_version(tmp_path, "v2")
+    seen, errors, stop = set(), [], threading.Event()
+
+    def read():
+        while not stop.is_set():
+            started = time.perf_counter()
+            index = refresher.get()
+            waited = time.perf_counter() - started
+            rows = [index.packages[row]["title"] for row in range(index.size)]
+            if waited > 0.5 or any(not title.startswith(index.version) for title in rows):
+                errors.append((index.version, waited, rows))
+            seen.add(index.version)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    swap = threading.Thread(target=refresher.refresh)
+    swap.start()
+    assert loading.wait(5)
+    time.sleep(0.05)
+    assert refresher.active_version == "v1"
+    release.set()
+    swap.join(5)
+    time.sleep(0.05)
+    stop.set()
+    for reader in readers:
+        reader.join(5)
+
+    assert errors == []
+    assert seen == {"v1", "v2"}
+    assert refresher.active_version == "v2"
+
+
+def test_a_failed_refresh_keeps_serving_the_active_index(refresher, tmp_path, monkeypatch):
+    refresher.get()
+    write_version(tmp_path, "v2")
+
+    def broken_open(path):
+        raise OSError("snapshot is unreadable")
+
+    monkeypatch.setattr(catalog, "open_snapshot", broken_open)
+    with pytest.raises(OSError):
+        refresher.refresh()
+
+    assert refresher.get().version == "v1"
@@ -0,0 +1,57 @@
+from datetime import date
+
+import pytest
+
+from app.tools.date.date_parser import DateRange, parse_date_range, strip_date_expression
+
+# A Wednesday
+TODAY = date(2025, 5, 14)
+
+
+@pytest.mark.parametrize("text, start, end", [
+    ("meetings today", date(2025, 5, 14), date(2025, 5, 14)),
+    ("what happened yesterday", date(2025, 5, 13), date(2025, 5, 13)),
+    ("notes from last week", date(2025, 5, 5), date(2025, 5, 11)),
+    ("this week", date(2025, 5, 12), date(2025, 5, 18)),
+    ("last month", date(2025, 4, 1), date(2025, 4, 30)),
+    ("next quarter", date(2025, 7, 1), date(2025, 9, 30)),
+    ("last year", date(2024, 1, 1), date(2024, 12, 31)),
+    ("in the past 10 days", date(2025, 5, 4), date(2025, 5, 14)),
+    ("over the last two weeks", date(2025, 4, 30), date(2025, 5, 14)),
+    ("two months ago", date(2025, 3, 1), date(2025, 3, 31)),
+    ("three days ago", date(2025, 5, 11), date(2025, 5, 11)),
+    ("a week ago", date(2025, 5, 5), date(2025, 5, 11)),
+    ("Q1", date(2025, 1, 1), date(2025, 3, 31)),
+    ("Q3", date(2024, 7, 1), date(2024, 9, 30)),
+    ("Q4 2023", date(2023, 10, 1), date(2023, 12, 31)),
+    ("the first quarter of 2024", date(2024, 1, 1), date(2024, 3, 31)),
+    ("meetings in the last quarter of 2023", date(2023, 10, 1), date(2023, 12, 31)),
+    ("the last quarter 2022", date(2022, 10, 1), date(2022, 12, 31)),
+    ("in March", date(2025, 3, 1), date(2025, 3, 31)),
+    ("in December", date(2024, 12, 1), date(2024, 12, 31)),
+    ("since February", date(2025, 2, 1), TODAY),
+    ("in 2023", date(2023, 1, 1), date(2023, 12, 31)),
+    ("from 2025-01-02 to 2025-01-09", date(2025, 1, 2), date(2025, 1, 9)),
+    ("since 2025-04-01", date(2025, 4, 1), TODAY),
+])
+def test_relative_expressions(text, start, end):
+    date_range = parse_date_range(text, today=TODAY)
+
+    assert (date_range.start, date_range.end) == (start, end)
+
+
+@pytest.mark.parametrize("text", ["budget review with Acme", "we may meet again"])
+def test_text_without_a_date_expression(text):
+    assert parse_date_range(text, today=TODAY) is None
+
+
+def test_date_expression_is_stripped_from_the_query():
+    date_range = parse_date_range("budget review last week", today=TODAY)
+
+    assert strip_date_expression("budget review last week", date_range) == "budget review"
+
+
+def test_range_strings_round_trip():
+    date_range = DateRange(date(2025, 1, 1), date(2025, 3, 31))
+
+    assert DateRange.from_string(date_range.to_string())[:2] == date_range[:2]
@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+def test_embed_returns_one_vector_per_text_in_order():
+    batcher = EmbeddingBatcher(lambda texts, model: [[float(len(text))] for text in texts], max_wait_ms=1)
+
+    assert batcher.embed(["a", "bbb", "cc"], "model") == [[1.0], [3.0], [2.0]]
+
+
+def test_identical_texts_share_one_future():
+    batcher = EmbeddingBatcher(lambda texts, model: [[1.0] for _ in texts], max_wait_ms=50)
+
+    first = batcher.submit("same", "model")
+    second = batcher.submit("same", "model")
+
+    assert first is second
+    assert first.result(timeout=5) == [1.0]
+    assert batcher.stats()["coalesced"] == 1
+
+
+def test_short_api_response_fails_every_future_of_the_batch():
+    batcher = EmbeddingBatcher(lambda texts, model: [[1.0]] * (len(texts) - 1), max_wait_ms=50)
+
+    futures = [batcher.submit(text, "model") for text in ("a", "b", "c")]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="returned 2 vectors for 3 texts"):
+            future.result(timeout=5)
+
+
+def test_api_errors_propagate_to_callers():
+    def failing(texts, model):
+        raise ConnectionError("down")
+
+    batcher = EmbeddingBatcher(failing, max_wait_ms=1)
+
+    with pytest.raises(ConnectionError):
+        batcher.embed(["a"], "model")
+
+
+def test_embed_gives_up_after_the_result_timeout():
+    release = threading.Event()
+
+    def stuck(texts, model):
+        release.wait(5)
+        return [[1.0] for _ in texts]
+
+    batcher = EmbeddingBatcher(stuck, max_wait_ms=1, result_timeout_seconds=0.1)
+    try:
+        with pytest.raises(TimeoutError):
+            batcher.embed(["a"], "model")
+    finally:
+        release.set()
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.services import embedding_warmup as warmup_module
+from app.services.embedding_warmup import EmbeddingWarmup, count_preference_texts
+from app.tools.search.search_tools import EMPTY_PREFERENCE_TEXT
+
+
+class FakeEmbeddingService:
+    """Prefills until `release` is set, optionally failing."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.release = threading.Event()
+        self.batches = []
+
+    def prefill(self, texts):
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("embeddings API is down")
+        self.batches.append(list(texts))
+        return len(texts)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = FakeEmbeddingService()
+    monkeypatch.setattr(warmup_module, "get_embedding_service", lambda: service)
+    monkeypatch.setenv("EMBEDDING_WARMUP_QUERY_LOG", "")
+    return service
+
+
+def start(monkeypatch, timeout_seconds=5.0, batch_size=256):
+    warmup = EmbeddingWarmup(timeout_seconds=timeout_seconds, batch_size=batch_size)
+    monkeypatch.setattr(main, "embedding_warmup", warmup)
+    warmup.start()
+    return warmup
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_ready_fails_until_the_warm_up_is_done(service, monkeypatch):
+    client = TestClient(main.app)
+    warmup = start(monkeypatch)
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["state"] == "warming"
+
+    service.release.set()
+    assert wait_for(lambda: warmup.ready)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert (response.json()["state"], response.json()["embedded"]) == ("done", 1)
+
+
+def test_ready_stops_waiting_at_the_time_cap(service, monkeypatch):
+    warmup = start(monkeypatch, timeout_seconds=0.1)
+
+    assert TestClient(main.app).get("/ready").status_code == 503
+    time.sleep(0.15)
+    assert TestClient(main.app).get("/ready").status_code == 200
+    service.release.set()
+
+
+def test_a_failed_warm_up_only_means_a_cold_start(service, monkeypatch):
+    service.fail = True
+    service.release.set()
+    warmup = start(monkeypatch)
+
+    assert wait_for(lambda: warmup.state == "failed")
+    assert TestClient(main.app).get("/ready").status_code == 200
+
+
+def test_ready_is_immediate_when_the_warm_up_is_disabled(service, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_WARMUP_ENABLED", "0")
+    start(monkeypatch)
+
+    assert TestClient(main.app).get("/ready").json()["state"] == "disabled"
+
+
+def test_warm_up_stops_between_batches_once_out_of_time(service, tmp_path):
+    curated = tmp_path / "curated.txt"
+    curated.write_text("\n".join(f"place {i}" for i in range(10)))
+    warmup = EmbeddingWarmup(timeout_seconds=0.0, batch_size=4)
+    service.release.set()
+
+    assert warmup.run(curated_path=str(curated)) == 0
+    assert warmup.state == "timed_out"
+    assert service.batches == []
+
+
+def test_curated_and_empty_texts_outrank_logged_ones(monkeypatch, tmp_path):
+    entries = [
+        {"endpoint": "/search-travel-packages", "request": {"location_input": "Bali", "budget_input": "cheap"}},
+        {"endpoint": "/search-travel-packages", "request": {"location_input": "Bali"}},
+        {"endpoint": "/ask", "request": {"query": "Beach trip to Da Nang for 5 days, budget 800 USD"}},
+    ]
+    monkeypatch.setattr(warmup_module, "read_query_log", lambda path: entries)
+    curated = tmp_path / "curated.txt"
+    curated.write_text("Hoi An\n\n")
+
+    counts = count_preference_texts("queries.jsonl", str(curated))
+
+    assert counts["Bali"] == 2 and counts["cheap"] == 1
+    assert "for 5 days" in counts
+    assert [text for text, _ in counts.most_common(2)] == [EMPTY_PREFERENCE_TEXT, "Hoi An"]
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.embeddings import EmbeddingService
+
+
+class FakeEmbeddingsAPI:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, input, model):
+        self.calls.append(list(input))
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=[0.1 * (i + 1), 0.2, 0.3]) for i in range(len(input))
+        ])
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(EmbeddingService, "_recent", type(EmbeddingService._recent)(10))
+    # A key other than the configured one keeps the test off the shared micro-batcher
+    service = EmbeddingService(api_key="sk-other")
+    service.client = SimpleNamespace(embeddings=FakeEmbeddingsAPI())
+    return service
+
+
+def test_cached_embeddings_are_stored_as_float32_arrays(service):
+    service.get_embeddings(["beach"])
+
+    cached = service._recent.get_many([("text-embedding-3-small", "beach")])
+    vector = cached[("text-embedding-3-small", "beach")]
+    assert isinstance(vector, np.ndarray) and vector.dtype == np.float32
+
+
+def test_hits_and_misses_return_the_same_lists(service):
+    miss = service.get_embeddings(["beach", "city"])
+    hit = service.get_embeddings(["beach", "city"])
+
+    assert hit == miss
+    assert all(isinstance(vector, list) and isinstance(vector[0], float) for vector in hit)
+    assert service.client.embeddings.calls == [["beach", "city"]]
@@ -0,0 +1,182 @@
+import threading
+
+import numpy as np
+import pytest
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, MessageRole
+from llama_index.llms.openai import OpenAI as OpenAI_LLAMA
+
+from app.agent.cached_llm import CachedOpenAI
+from app.services.llm_cache import LLMResponseCache
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def backdate(cache, key, seconds):
+    """Make an entry look like it was written (and last used) seconds ago."""
+    cache._connection().execute(
+        "UPDATE llm_cache SET created_at = created_at - ?, last_used_at = last_used_at - ? WHERE key = ?",
+        (seconds, seconds, key)
+    )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMResponseCache(str(tmp_path / "llm_cache.sqlite3"), ttl_seconds=60)
+
+
+def test_get_returns_stored_response_and_counts_hits_and_misses(cache):
+    assert cache.get("a") is None
+    cache.put("a", "gpt", "answer")
+
+    assert cache.get("a") == "answer"
+    assert cache.stats() == {"hits": 1, "semantic_hits": 0, "misses": 1, "writes": 1, "entries": 1}
+
+
+def test_expired_entries_are_not_served_and_are_evicted(cache):
+    cache.put("old", "gpt", "stale")
+    cache.put("new", "gpt", "fresh")
+    backdate(cache, "old", 61)
+
+    assert cache.get("old") is None
+    assert cache.get("new") == "fresh"
+    cache.evict()
+    assert cache.stats()["entries"] == 1
+
+
+def test_eviction_keeps_the_most_recently_used_entries(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2, evict_every=1000)
+    for key in "abc":
+        cache.put(key, "gpt", key)
+    backdate(cache, "a", 1)
+    backdate(cache, "b", 2)
+    cache.get("b")
+
+    cache.evict()
+
+    assert cache.get("a") is None
+    assert (cache.get("b"), cache.get("c")) == ("b", "c")
+
+
+def test_get_similar_honours_threshold_and_context(cache):
+    cache.put("k1", "gpt", "beach answer", context_key="ctx", embedding=unit(1, 0, 0))
+
+    assert cache.get_similar("ctx", unit(1, 0.1, 0), threshold=0.95) == "beach answer"
+    assert cache.get_similar("ctx", unit(1, 1, 0), threshold=0.95) is None
+    assert cache.get_similar("other-ctx", unit(1, 0, 0), threshold=0.95) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_get_similar_skips_expired_entries(cache):
+    cache.put("k1", "gpt", "answer", context_key="ctx", embedding=unit(1, 0))
+    backdate(cache, "k1", 61)
+
+    assert cache.get_similar("ctx", unit(1, 0), threshold=0.9) is None
+
+
+def test_get_similar_only_scores_recently_used_candidates(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3"), semantic_candidates=2)
+    cache.put("match", "gpt", "match", context_key="ctx", embedding=unit(1, 0, 0))
+    cache.put("x", "gpt", "x", context_key="ctx", embedding=unit(0, 1, 0))
+    cache.put("y", "gpt", "y", context_key="ctx", embedding=unit(0, 0, 1))
+    backdate(cache, "match", 10)
+
+    assert cache.get_similar("ctx", unit(1, 0, 0), threshold=0.9) is None
+
+    cache.get("match")
+    assert cache.get_similar("ctx", unit(1, 0, 0), threshold=0.9) == "match"
+
+
+def test_caches_on_the_same_file_share_entries_under_concurrent_writes(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    workers = [LLMResponseCache(path, evict_every=7) for _ in range(4)]
+    errors = []
+
+    def write(worker, index):
+        try:
+            for i in range(50):
+                worker.put(f"{index}-{i}", "gpt", f"response {index}-{i}")
+                worker.get(f"{index}-{i // 2}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(worker, index)) for index, worker in enumerate(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    reader = LLMResponseCache(path)
+    assert reader._connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert reader.stats()["entries"] == 200
+    assert reader.get("3-49") == "response 3-49"
+
+
+class FakeBackend:
+    """Stands in for the OpenAI API call of the wrapped LLM."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, messages, **kwargs):
+        self.calls += 1
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=f"answer {self.calls}"))
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(OpenAI_LLAMA, "_chat", lambda llm, messages, **kwargs: backend.chat(messages, **kwargs))
+    return backend
+
+
+def make_llm(cache, embed_fn=None, model="gpt-4o-mini"):
+    return CachedOpenAI(cache=cache, embed_fn=embed_fn, semantic_threshold=0.9, model=model, api_key="sk-test")
+
+
+def chat(llm, system, *messages):
+    history = [ChatMessage(role=MessageRole.SYSTEM, content=system)]
+    history += [ChatMessage(role=role, content=content) for role, content in messages]
+    return llm.chat(history).message.content
+
+
+def test_repeated_conversation_is_served_from_cache(cache, backend):
+    llm = make_llm(cache)
+
+    first = chat(llm, "You are a travel agent.", (MessageRole.USER, "Beach trips in May?"))
+    again = chat(llm, "You are a travel agent.", (MessageRole.USER, "  beach trips   in MAY? "))
+
+    assert first == again == "answer 1"
+    assert backend.calls == 1
+
+
+@pytest.mark.parametrize("system, model", [("You are a meeting planner.", "gpt-4o-mini"),
+                                           ("You are a travel agent.", "gpt-4o")])
+def test_keys_are_scoped_by_system_prompt_and_model(cache, backend, system, model):
+    chat(make_llm(cache), "You are a travel agent.", (MessageRole.USER, "Beach trips?"))
+
+    assert chat(make_llm(cache, model=model), system, (MessageRole.USER, "Beach trips?")) == "answer 2"
+
+
+def test_users_with_different_tool_results_do_not_share_answers(cache, backend):
+    llm = make_llm(cache)
+    question = (MessageRole.USER, "Find me something")
+
+    chat(llm, "You are a travel agent.", question, (MessageRole.TOOL, "[1] Rome city break"))
+    reply = chat(llm, "You are a travel agent.", question, (MessageRole.TOOL, "[1] Oslo fjord cruise"))
+
+    assert reply == "answer 2"
+
+
+def test_semantic_hits_only_apply_to_first_turns_above_threshold(cache, backend):
+    vectors = {"beach trips in may?": [1, 0], "seaside trips in may?": [1, 0.1], "ski trips?": [0, 1]}
+    llm = make_llm(cache, embed_fn=lambda text: vectors[text])
+
+    assert chat(llm, "sys", (MessageRole.USER, "Beach trips in May?")) == "answer 1"
+    assert chat(llm, "sys", (MessageRole.USER, "Seaside trips in May?")) == "answer 1"
+    assert chat(llm, "sys", (MessageRole.USER, "Ski trips?")) == "answer 2"
+    assert chat(llm, "other sys", (MessageRole.USER, "Beach trips in May?")) == "answer 3"
+    assert cache.stats()["semantic_hits"] == 1
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.vectorstore import catalog
+from app.vectorstore.location_gazetteer import LocationGazetteer, normalize_place
+from app.vectorstore.supabase_vectorstore import SupabaseVectorStore
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA
+
+ROWS = [
+    {"id": 1, "name": "Da Nang", "country": "Vietnam", "region": "Central Coast"},
+    {"id": 2, "name": "Hội An", "country": "Vietnam", "region": "Central Coast"},
+    {"id": 3, "name": "Ho Chi Minh City", "country": "Vietnam", "region": "Southeast", "aliases": "Saigon, HCMC"},
+    {"id": 4, "name": "Nice", "country": "France", "region": "Provence"},
+    {"id": 5, "name": "Bangkok", "country": "Thailand"},
+]
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return LocationGazetteer.from_rows(ROWS)
+
+
+def test_normalize_place_strips_accents_and_punctuation():
+    assert normalize_place("Hội An, Đà Nẵng!") == ("hoi", "an", "da", "nang")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Nice", {"4"}),
+    ("Da Nang or Hoi An", {"1", "2"}),
+    ("somewhere in Vietnam", {"1", "2", "3"}),
+    ("Saigon", {"3"}),
+    ("the south of France", {"4"}),
+    ("beaches in Nice", {"4"}),
+    ("street food in Bangkok or Saigon", {"3", "5"}),
+    ("a trip to Hoi An with nice food", {"2"}),
+])
+def test_place_names_used_as_places_filter(gazetteer, text, expected):
+    assert gazetteer.resolve(text) == frozenset(expected)
+
+
+@pytest.mark.parametrize("text", [
+    "nice beach",
+    "a nice quiet beach",
+    "anywhere but Vietnam",
+    "not Thailand",
+    "I don't want to go to Bangkok",
+    "mountains",
+    "",
+    None,
+])
+def test_other_texts_do_not_filter(gazetteer, text):
+    assert gazetteer.resolve(text) is None
+
+
+def test_empty_gazetteer_filters_nothing():
+    assert LocationGazetteer.from_rows([]).resolve("Nice") is None
+
+
+class FakeRPC:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return self
+
+    def select(self, columns):
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=[])
+
+
+def test_the_supabase_backend_sends_no_location_filter_to_the_rpc(monkeypatch):
+    monkeypatch.setenv("TRAVEL_SEARCH_BACKEND", "supabase")
+    monkeypatch.setenv("SINGLE_FLIGHT_ENABLED", "0")
+    monkeypatch.setattr(catalog, "get_location_gazetteer",
+                        lambda: pytest.fail("the gazetteer is only used by in-process searches"))
+    calls = []
+    store = SupabaseVectorStore(url="http://127.0.0.1:9", key="anon", auth="token")
+    store.client = FakeRPC(calls)
+
+    vectors = [[0.1, 0.2]] * len(TRAVEL_PACKAGE_CRITERIA)
+    store.search_travel_packages(*vectors, match_count=5, location_input="beaches in Nice")
+
+    [(name, params)] = calls
+    assert name == "search_travel_packages"
+    assert set(params) == {f"{criterion}_vector_input" for criterion in TRAVEL_PACKAGE_CRITERIA} | {"match_count"}
@@ -0,0 +1,83 @@
+import io
+import logging
+import logging.handlers
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+from app.telemetry import log_config
+from app.telemetry.log_config import (
+    sample_debug, setup_logging, strip_vectors, summarize_chat_history, summarize_packages
+)
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    log_config._stop_listener()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def flush():
+    """Stop the listener, which writes out every queued record."""
+    log_config._stop_listener()
+
+
+def test_json_records_include_extra_fields_and_tracebacks(restore_logging):
+    stream = io.StringIO()
+    setup_logging(logging.INFO, "json", stream)
+    logger = logging.getLogger("tests.json")
+
+    logger.info("search done", extra={"user_id": "user-1", "packages": {"count": 2}})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("search failed")
+    logger.debug("not emitted")
+    flush()
+
+    first, second = [orjson.loads(line) for line in stream.getvalue().splitlines()]
+    assert (first["level"], first["logger"], first["message"]) == ("INFO", "tests.json", "search done")
+    assert (first["user_id"], first["packages"]) == ("user-1", {"count": 2})
+    assert second["message"] == "search failed"
+    assert "ValueError: boom" in second["exc_info"]
+
+
+def test_request_threads_only_enqueue_records(restore_logging):
+    stream = io.StringIO()
+    setup_logging(logging.INFO, "text", stream)
+    setup_logging(logging.INFO, "text", stream)
+
+    handlers = logging.getLogger().handlers
+    assert len(handlers) == 1 and isinstance(handlers[0], logging.handlers.QueueHandler)
+    logging.getLogger("tests.text").warning("slow upstream")
+    flush()
+    assert stream.getvalue().count("tests.text - WARNING - slow upstream") == 1
+
+
+@pytest.mark.parametrize("level, rate, expected", [
+    (logging.INFO, "1", False), (logging.DEBUG, "1", True), (logging.DEBUG, "0", False)
+])
+def test_debug_dumps_are_sampled_only_when_debug_is_enabled(monkeypatch, level, rate, expected):
+    monkeypatch.setenv("LOG_DEBUG_SAMPLE_RATE", rate)
+    logger = logging.getLogger(f"tests.sampling.{level}.{rate}")
+    logger.setLevel(level)
+
+    assert sample_debug(logger) is expected
+
+
+def test_payload_summaries_leave_out_package_bodies_and_vectors():
+    packages = [{"id": f"p{i}", "description": "long text", "location_vector": [0.1] * 4} for i in range(12)]
+    messages = [SimpleNamespace(role=SimpleNamespace(value=role)) for role in ["user", "assistant", "tool"]]
+
+    assert summarize_packages(packages, max_ids=3) == {"count": 12, "ids": ["p0", "p1", "p2"]}
+    assert summarize_packages(None) == {"count": 0, "ids": []}
+    assert strip_vectors(packages[:1]) == [{"id": "p0", "description": "long text"}]
+    assert summarize_chat_history(messages) == {"count": 3, "recent_roles": ["user", "assistant", "tool"]}
@@ -0,0 +1,50 @@
+import time
+
+from app.utils.lru import LRUCache, TTLCache
+
+
+def test_lru_cache_evicts_the_least_recently_used_key():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+
+
+def test_ttl_cache_reuses_live_values():
+    cache = TTLCache(10, ttl_seconds=60)
+    created = []
+
+    def factory():
+        created.append(object())
+        return created[-1]
+
+    assert cache.get_or_create("key", factory) is cache.get_or_create("key", factory)
+    assert len(created) == 1
+
+
+def test_ttl_cache_recreates_expired_values():
+    cache = TTLCache(10, ttl_seconds=0.05)
+    first = cache.get_or_create("key", object)
+    time.sleep(0.1)
+
+    assert cache.get_or_create("key", object) is not first
+
+
+def test_sliding_ttl_cache_keeps_values_that_are_in_use():
+    cache = TTLCache(10, ttl_seconds=0.2, sliding=True)
+    first = cache.get_or_create("key", object)
+    for _ in range(4):
+        time.sleep(0.1)
+        assert cache.get_or_create("key", object) is first
+
+
+def test_ttl_cache_is_bounded():
+    cache = TTLCache(2, ttl_seconds=60)
+    for key in "abc":
+        cache.get_or_create(key, object)
+
+    assert len(cache) == 2
+    assert cache.pop("a") is None
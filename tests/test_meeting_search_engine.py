@@ -0,0 +1,115 @@
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.tools.date.date_parser import DateRange
+from app.tools.search.search_tools import SearchMeetingsTool
+from app.vectorstore import catalog
+from app.vectorstore.meeting_search_engine import (
+    BM25Index, LocalMeetingVectorStore, MeetingSearchEngine, reciprocal_rank_fusion, tokenize
+)
+
+
+def meeting(meeting_id, title, content, embedding, organization="Acme", user_id="u1", meeting_date=None):
+    return {"id": meeting_id, "title": title, "content": content, "embedding": embedding,
+            "organization": organization, "user_id": user_id, "meeting_date": meeting_date}
+
+
+@pytest.fixture
+def engine():
+    return MeetingSearchEngine([
+        meeting(1, "Budget review", "quarterly budget and hiring plan", [1.0, 0.0, 0.0], meeting_date="2025-01-15"),
+        meeting(2, "Product launch", "launch timeline for the mobile app", [0.0, 1.0, 0.0], meeting_date="2025-02-03"),
+        meeting(3, "Hiring sync", "hiring pipeline and interviews", [0.0, 0.0, 1.0], organization="Globex"),
+        meeting(4, "Budget follow-up", "budget cuts", [0.9, 0.1, 0.0], user_id="u2", meeting_date="2025-01-20"),
+    ])
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("What is the Budget for Q1?") == ["budget", "q1"]
+
+
+def test_bm25_scores_documents_with_query_terms():
+    index = BM25Index([["budget", "review"], ["launch", "plan"], ["budget", "budget", "cuts"]])
+
+    scores = index.score(["budget"])
+
+    assert scores[1] == 0
+    assert scores[2] > scores[0] > 0
+
+
+def test_bm25_prefers_rare_terms():
+    index = BM25Index([["budget", "launch"], ["budget"], ["budget"]])
+
+    scores = index.score(["budget", "launch"])
+
+    assert scores[0] > scores[1] == scores[2]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([np.array([0, 1, 2]), np.array([1, 0])], k=60)
+
+    assert fused[0] == fused[1] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[2] == pytest.approx(1 / 63)
+
+
+def test_search_combines_keyword_and_vector_rankings(engine):
+    results = engine.search("budget", [1.0, 0.0, 0.0], match_count=2)
+
+    assert [result["id"] for result in results] == [1, 4]
+    assert "embedding" not in results[0]
+
+
+def test_search_is_restricted_to_partitions(engine):
+    assert {r["id"] for r in engine.search("budget", [1.0, 0.0, 0.0], user_id="u1")} == {1, 2, 3}
+    assert [r["id"] for r in engine.search("hiring", [1.0, 0.0, 0.0], organization="globex")] == [3]
+    assert engine.search("budget", [1.0, 0.0, 0.0], user_id="nobody") == []
+
+
+def test_date_range_keeps_dated_matches_and_undated_meetings(engine):
+    january = DateRange(date(2025, 1, 1), date(2025, 1, 31))
+    december = DateRange(date(2024, 12, 1), date(2024, 12, 31))
+
+    assert {r["id"] for r in engine.search("budget", [1.0, 0.0, 0.0], date_range=january)} == {1, 3, 4}
+    assert {r["id"] for r in engine.search("budget", [1.0, 0.0, 0.0], date_range=december)} == {3}
+
+
+def test_meeting_tool_searches_the_local_engine(engine):
+    embedding_service = SimpleNamespace(get_embedding=lambda text: [0.0, 1.0, 0.0])
+    store = LocalMeetingVectorStore(engine_provider=lambda: engine, user=SimpleNamespace(id="u1"))
+
+    output = SearchMeetingsTool(store, embedding_service)(user_input="launch", start_date="", end_date="")
+
+    assert output.index("Product launch") < output.index("Budget review")
+    assert "Budget follow-up" not in output
+
+
+@pytest.mark.parametrize("user_resolver", [None, lambda: None, lambda: SimpleNamespace(id=None)])
+def test_local_store_refuses_to_search_without_a_user(engine, user_resolver):
+    store = LocalMeetingVectorStore(engine_provider=lambda: engine, user_resolver=user_resolver)
+
+    with pytest.raises(PermissionError):
+        store.get_user()
+
+
+def test_a_failed_reload_keeps_serving_the_previous_engine(engine, monkeypatch):
+    loads = iter([engine, RuntimeError("Supabase is down")])
+
+    def load_from_supabase(client, **kwargs):
+        result = next(loads)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(catalog, "get_service_supabase_client", lambda: None)
+    monkeypatch.setattr(MeetingSearchEngine, "load_from_supabase", load_from_supabase)
+    refresher = catalog.MeetingEngineRefresher()
+    monkeypatch.setattr(refresher, "start", lambda: None)
+
+    assert refresher.get() is engine
+    with pytest.raises(RuntimeError):
+        refresher.refresh()
+    assert refresher.get() is engine
+    assert refresher.stats()["meetings"] == 4
@@ -0,0 +1,52 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import main
+from app.telemetry.metrics import observe_stage, span
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_span_records_duration_and_errors_per_stage():
+    count = sample("travel_buddy_stage_duration_seconds_count", stage="test.stage")
+    errors = sample("travel_buddy_stage_errors_total", stage="test.stage")
+
+    with span("test.stage"):
+        pass
+    with pytest.raises(ValueError):
+        with span("test.stage"):
+            raise ValueError("boom")
+
+    assert sample("travel_buddy_stage_duration_seconds_count", stage="test.stage") == count + 2
+    assert sample("travel_buddy_stage_errors_total", stage="test.stage") == errors + 1
+
+
+def test_nothing_is_recorded_when_metrics_are_disabled(monkeypatch):
+    monkeypatch.setenv("METRICS_ENABLED", "0")
+    count = sample("travel_buddy_stage_duration_seconds_count", stage="test.disabled")
+
+    with span("test.disabled"):
+        pass
+    observe_stage("test.disabled", 0.5)
+
+    assert sample("travel_buddy_stage_duration_seconds_count", stage="test.disabled") == count
+
+
+def test_metrics_endpoint_exposes_request_durations_by_route_template():
+    client = TestClient(main.app)
+    client.get("/health")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'travel_buddy_http_request_duration_seconds_count{method="GET",path="/health",status="200"}' in response.text
+
+
+def test_metrics_endpoint_is_hidden_when_disabled(monkeypatch):
+    monkeypatch.setenv("METRICS_ENABLED", "0")
+
+    assert TestClient(main.app).get("/metrics").status_code == 404
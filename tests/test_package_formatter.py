@@ -0,0 +1,44 @@
+from app.agent.package_formatter import TravelPackageFormatter
+
+
+def package(number):
+    return {"id": number, "title": f"Trip {number}", "price": 100}
+
+
+def formatter(**kwargs):
+    return TravelPackageFormatter(fields=["title", "price"], tokenizer=str.split, **kwargs)
+
+
+def test_packages_shown_before_are_only_referenced():
+    packages = formatter()
+    packages.format([package(1), package(2)])
+
+    text, shown = packages.format([package(2), package(3)])
+    assert shown == 2
+    assert text == "[P2] Trip 2 (already shown above)\n\n[P3] Trip 3\n  price: 100"
+
+
+def test_references_outside_the_memory_window_are_forgotten():
+    packages = formatter()
+    packages.format([package(1)], position=0)
+    packages.format([package(2)], position=4)
+
+    packages.retain(3, 6)
+    text, _ = packages.format([package(1), package(2)], position=6)
+    assert text == "[P3] Trip 1\n  price: 100\n\n[P2] Trip 2 (already shown above)"
+
+
+def test_rolled_back_outputs_are_forgotten():
+    packages = formatter()
+    packages.format([package(1)], position=5)
+
+    packages.retain(0, 5)
+    assert packages.format([package(1)])[0].startswith("[P2] Trip 1\n")
+
+
+def test_the_earliest_references_are_dropped_beyond_the_cap():
+    packages = formatter(max_references=2)
+    packages.format([package(1), package(2), package(3)])
+
+    text, _ = packages.format([package(1), package(3)])
+    assert text == "[P4] Trip 1\n  price: 100\n\n[P3] Trip 3 (already shown above)"
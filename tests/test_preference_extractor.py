@@ -0,0 +1,55 @@
+import pytest
+
+from app.agent.preference_extractor import PreferenceExtractor
+
+
+@pytest.fixture
+def extractor():
+    return PreferenceExtractor()
+
+
+def test_structured_request_fills_slots(extractor):
+    structured, slots = extractor.classify("Beach trip to Da Nang for 5 days, budget 800 USD, snorkeling")
+
+    assert structured
+    assert "Da Nang" in slots["location_input"]
+    assert slots["duration_input"] == "for 5 days"
+    assert "800 USD" in slots["budget_input"]
+    assert slots["activities_input"] == "snorkeling"
+
+
+@pytest.mark.parametrize("message", [
+    "Beach trip to Da Nang for 5 days, budget 800 USD, I hate museums",
+    "Trip to Bali for a week, no flights, under $1000",
+    "Anywhere but Vietnam for 5 days, under $500, beach resort",
+    "Trip to Bangkok for 5 days without shopping, budget 600 USD",
+    "Trip to Hoi An for a week, I don't want hostels, under $700",
+    "Visit Thailand except Phuket for 10 days, luxury resort",
+])
+def test_negations_and_exclusions_go_to_the_agent(extractor, message):
+    structured, _ = extractor.classify(message)
+
+    assert not structured
+
+
+@pytest.mark.parametrize("message", [
+    "Trip to Hanoi in March for 5 days",
+    "Trip to Hanoi on Friday for 5 days",
+    "Trip to Hanoi in Sept for 5 days",
+])
+def test_months_and_weekdays_are_not_locations(extractor, message):
+    slots = extractor.extract(message)
+
+    assert slots["location_input"] == "Hanoi"
+
+
+def test_conversational_messages_go_to_the_agent(extractor):
+    structured, _ = extractor.classify("What about the first one? Trip to Bali for 5 days")
+
+    assert not structured
+
+
+def test_messages_without_a_location_go_to_the_agent(extractor):
+    structured, _ = extractor.classify("5 days, under $500, vegetarian food")
+
+    assert not structured
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from app.services import batch_search, process_pool
+from app.services.batch_search import BatchTravelPackageSearch
+from app.services.process_pool import attach_index, release_index, share_index
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA, TravelPackageIndex, normalize_rows
+
+
+def make_index(version, size=6, dimensions=4, seed=0):
+    matrix = normalize_rows(np.random.default_rng(seed).random((size, dimensions), dtype=np.float32))
+    packages = [{"id": f"p{i}"} for i in range(size)]
+    return TravelPackageIndex(packages, {criterion: matrix for criterion in TRAVEL_PACKAGE_CRITERIA}, version=version)
+
+
+class FakeEmbeddingService:
+    def get_embeddings(self, texts):
+        return [np.random.default_rng(len(text)).random(4).tolist() for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def clean_worker_cache():
+    yield
+    process_pool._worker_indexes.clear()
+
+
+def attachable(handle):
+    process_pool._worker_indexes.clear()
+    try:
+        attach_index(handle)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def test_a_replaced_index_stays_attachable_until_released():
+    old_handle = share_index(make_index("v1"))
+    new_handle = share_index(make_index("v2"))
+
+    assert attachable(old_handle)
+    release_index(old_handle)
+    assert not attachable(old_handle)
+    release_index(new_handle)
+    assert attachable(new_handle)
+
+
+def test_an_unused_index_is_unlinked_when_replaced():
+    old_handle = share_index(make_index("v1"))
+    release_index(old_handle)
+    release_index(share_index(make_index("v2")))
+
+    assert not attachable(old_handle)
+
+
+def test_swapping_the_index_during_a_batch_keeps_its_chunks_scorable(monkeypatch):
+    index = make_index("v1", seed=1)
+    profiles = [{"location": f"place {i}"} for i in range(4)]
+
+    def share_then_refresh(shared):
+        handle = share_index(shared)
+        # A catalog refresh shares the new index before the workers attach the old one
+        release_index(share_index(make_index("v2", seed=2)))
+        return handle
+
+    expected = list(BatchTravelPackageSearch(FakeEmbeddingService(), index, chunk_size=1).search(profiles, [3] * 4))
+    monkeypatch.setenv("PROCESS_POOL_WORKERS", "1")
+    monkeypatch.setattr(batch_search, "share_index", share_then_refresh)
+    try:
+        results = list(BatchTravelPackageSearch(FakeEmbeddingService(), index, chunk_size=1).search(profiles, [3] * 4))
+    finally:
+        process_pool.reset_process_pool()
+
+    assert [position for position, _ in results] == [0, 1, 2, 3]
+    assert [[package["id"] for package in packages] for _, packages in results] == \
+        [[package["id"] for package in packages] for _, packages in expected]
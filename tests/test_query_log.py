@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from app.telemetry.query_log import QueryLog, process_log_path, query_log_files, read_query_log
+
+
+def test_capture_requires_a_salt(tmp_path):
+    with pytest.raises(ValueError):
+        QueryLog(path=str(tmp_path / "query_log.jsonl"), sample_rate=1.0, max_bytes=1000, backups=1, salt="")
+
+    assert not QueryLog(path="", sample_rate=1.0, max_bytes=1000, backups=1, salt="").enabled
+
+
+def test_workers_with_the_same_salt_agree_on_pseudonyms():
+    first, second = (QueryLog(path="query_log.jsonl", sample_rate=1.0, max_bytes=1000, backups=1, salt="s")
+                     for _ in range(2))
+
+    assert first.pseudonym("Bearer token") == second.pseudonym("Bearer token")
+
+
+def test_each_process_writes_its_own_file(tmp_path):
+    path = str(tmp_path / "query_log.jsonl")
+    log = QueryLog(path=path, sample_rate=1.0, max_bytes=10_000, backups=1, salt="s")
+    log.capture("/ask", b'{"query": "beaches"}', "Bearer token", 200, 1.0, 5.0)
+    log.close()
+
+    assert query_log_files(path) == [process_log_path(path, os.getpid())]
+    assert [entry["request"] for entry in read_query_log(path)] == [{"query": "beaches"}]
+
+
+def test_log_files_cover_every_process_and_rotation(tmp_path):
+    path = str(tmp_path / "query_log.jsonl")
+    names = ["query_log-7.jsonl", "query_log-7.jsonl.1", "query_log-7.jsonl.2", "query_log-12.jsonl",
+             "query_log.jsonl", "query_log.jsonl.1", "query_log-x.jsonl", "other.jsonl"]
+    for name in names:
+        (tmp_path / name).write_text(f'{{"ts": 1, "file": "{name}"}}\nnot json\n')
+
+    files = [os.path.basename(name) for name in query_log_files(path)]
+    assert files == ["query_log.jsonl.1", "query_log.jsonl", "query_log-7.jsonl.2", "query_log-7.jsonl.1",
+                     "query_log-7.jsonl", "query_log-12.jsonl"]
+    assert [entry["file"] for entry in read_query_log(path)] == files
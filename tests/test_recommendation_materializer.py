@@ -0,0 +1,79 @@
+import pytest
+
+from app.services.recommendation_materializer import RecommendationMaterializer
+from app.services.saved_profiles import SavedProfileStore
+from app.vectorstore.catalog import catalog_refresher
+
+
+@pytest.fixture
+def materializer(monkeypatch):
+    materializer = RecommendationMaterializer(top_n=5)
+    # Keep the background refresh (which needs the catalog) out of the test
+    monkeypatch.setattr(materializer, "start", lambda: None)
+    return materializer
+
+
+def test_lookups_only_match_the_saved_profile_of_the_same_user(materializer):
+    materializer.save_profile("user-1", {"location": "Bali"})
+    entry = materializer._entries["user-1"]
+    entry["packages"], entry["version"] = [{"id": "p1"}], catalog_refresher.active_version
+
+    assert materializer.lookup("user-2", {"location": "Bali"}) is None
+    assert materializer.lookup("user-1", {"location": "Rome"}) is None
+    assert materializer.lookup("user-1", {"location": "Bali"}) == [{"id": "p1"}]
+    assert materializer.lookups == {"unknown_user": 1, "profile_changed": 1, "hit": 1}
+
+
+def test_saving_new_preferences_invalidates_the_list(materializer):
+    materializer.save_profile("user-1", {"location": "Bali"})
+    materializer._entries["user-1"]["packages"] = [{"id": "p1"}]
+    materializer.save_profile("user-1", {"location": "Rome"})
+
+    assert materializer.lookup("user-1", {"location": "Rome"}) is None
+    assert materializer.lookups == {"stale": 1}
+
+
+@pytest.fixture
+def workers(tmp_path, monkeypatch):
+    """Two materializers sharing one profile store, like two worker processes."""
+    path = str(tmp_path / "profiles.sqlite3")
+    workers = [RecommendationMaterializer(top_n=5, store=SavedProfileStore(path)) for _ in range(2)]
+    for worker in workers:
+        monkeypatch.setattr(worker, "start", lambda: None)
+    return workers
+
+
+def test_profiles_saved_through_one_worker_are_picked_up_on_lookup(workers):
+    saving, serving = workers
+    saving.save_profile("user-1", {"location": "Bali"})
+
+    assert serving.lookup("user-1", {"location": "Bali"}) is None
+    assert serving.lookups == {"stale": 1}
+    assert serving._entries["user-1"]["profile"]["location"] == "Bali"
+
+    saving.save_profile("user-1", {"location": "Rome"})
+    assert serving.lookup("user-1", {"location": "Rome"}) is None
+    assert serving._entries["user-1"]["profile"]["location"] == "Rome"
+    assert serving.lookup("user-2", {"location": "Rome"}) is None
+    assert serving.lookups == {"stale": 2, "unknown_user": 1}
+
+
+def test_sync_adopts_only_profiles_saved_since_the_last_sync(workers):
+    saving, serving = workers
+    saving.save_profile("user-1", {"location": "Bali"})
+    saving.save_profile("user-2", {"location": "Rome"})
+
+    assert serving.sync() == 2
+    assert serving.sync() == 0
+    saving.save_profile("user-1", {"location": "Oslo"})
+    assert serving.sync() == 1
+    assert serving._entries["user-1"]["profile"]["location"] == "Oslo"
+    assert list(serving._entries) == ["user-2", "user-1"]
+
+
+def test_saved_profiles_survive_a_restart(workers, tmp_path):
+    workers[0].save_profile("user-1", {"location": "Bali"})
+    restarted = RecommendationMaterializer(top_n=5, store=SavedProfileStore(str(tmp_path / "profiles.sqlite3")))
+
+    assert restarted.sync() == 1
+    assert restarted._entries["user-1"]["packages"] is None
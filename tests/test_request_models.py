@@ -0,0 +1,33 @@
+import pytest
+from pydantic import ValidationError
+
+from app.models.request_models import MAX_MATCH_COUNT, TravelPackageSearchRequest, parse_highlights_value
+
+
+def test_highlights_literals_are_parsed():
+    assert parse_highlights_value("['Beach', 'Old town']") == ["Beach", "Old town"]
+
+
+def test_highlights_that_are_not_literals_are_split_on_commas():
+    assert parse_highlights_value("[Beach, Old town]") == ["Beach", "Old town"]
+
+
+def test_parsed_highlights_are_not_shared_between_rows():
+    first = parse_highlights_value("['Beach', 'Old town']")
+    first.append("Changed")
+
+    assert parse_highlights_value("['Beach', 'Old town']") == ["Beach", "Old town"]
+
+
+@pytest.mark.parametrize("match_count", [-3, 0, MAX_MATCH_COUNT + 1])
+def test_search_requests_reject_out_of_range_match_counts(match_count):
+    with pytest.raises(ValidationError):
+        TravelPackageSearchRequest(match_count=match_count)
+
+
+def test_search_requests_accept_a_missing_match_count():
+    assert TravelPackageSearchRequest(match_count=None).match_count is None
+
+
+def test_missing_preference_inputs_become_empty_strings():
+    assert TravelPackageSearchRequest(location_input=None).location_input == ""
@@ -0,0 +1,127 @@
+import pytest
+from postgrest.exceptions import APIError
+
+from app.services import resilience
+from app.services.resilience import (
+    CircuitBreaker, CircuitOpenError, ResilientCaller, RetryBudget, is_retryable, supabase_calls
+)
+
+
+def elapse(breaker):
+    """Move the breaker's opening time back past its reset period."""
+    breaker._opened_at -= breaker.reset_seconds
+
+
+def test_circuit_opens_after_consecutive_failures_only():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+
+    assert [breaker.record_failure() for _ in range(2)] == [False, False]
+    breaker.record_success()
+    assert [breaker.record_failure() for _ in range(3)] == [False, False, True]
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_circuit_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    elapse(breaker)
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+
+@pytest.mark.parametrize("trial_succeeds, state", [(True, CircuitBreaker.CLOSED), (False, CircuitBreaker.OPEN)])
+def test_trial_outcome_closes_or_reopens_the_circuit(trial_succeeds, state):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    elapse(breaker)
+    breaker.allow()
+
+    if trial_succeeds:
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+
+    assert breaker.state == state
+    assert breaker.allow() == trial_succeeds
+
+
+@pytest.fixture
+def caller():
+    return ResilientCaller("test", timeout_seconds=1, max_retries=0, hedge=False,
+                           retry_budget=RetryBudget(ratio=0.1), breaker=CircuitBreaker(1, reset_seconds=30))
+
+
+def failing_call():
+    raise ConnectionError("upstream down")
+
+
+def invalid_request():
+    raise ValueError("bad request")
+
+
+def test_open_circuit_skips_the_call_and_uses_the_fallback(caller):
+    calls = []
+    assert caller.call(failing_call, fallback=lambda: "cached") == "cached"
+
+    assert caller.call(lambda: calls.append(1), fallback=lambda: "cached") == "cached"
+    assert calls == []
+    with pytest.raises(CircuitOpenError):
+        caller.call(lambda: "fresh")
+    assert caller.stats()["circuit"] == CircuitBreaker.OPEN
+    assert caller.events == {"failure": 1, "fallback": 2, "circuit_open": 2}
+
+
+def test_client_errors_do_not_open_the_circuit(caller):
+    with pytest.raises(ValueError):
+        caller.call(invalid_request)
+
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+    assert caller.call(lambda: "fresh") == "fresh"
+
+
+def postgrest_error(code):
+    return APIError({"message": "error", "code": code, "hint": None, "details": None})
+
+
+@pytest.mark.parametrize("code, retryable", [
+    ("PGRST003", True),
+    ("57014", True),
+    ("08006", True),
+    ("40P01", True),
+    (502, True),
+    ("503", True),
+    ("PGRST202", False),
+    ("42501", False),
+    ("22P02", False),
+    (404, False),
+    (None, False),
+])
+def test_postgrest_errors_are_classified_by_code(code, retryable):
+    assert is_retryable(postgrest_error(code)) == retryable
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    monkeypatch.setattr(supabase_calls, "breaker", CircuitBreaker(2, reset_seconds=30))
+    monkeypatch.setattr(supabase_calls, "max_retries", 1)
+    monkeypatch.setattr(supabase_calls, "events", {})
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    return supabase_calls
+
+
+def test_supabase_server_errors_are_retried_and_open_the_circuit(supabase):
+    attempts = []
+
+    def failing_rpc():
+        attempts.append(1)
+        raise postgrest_error("PGRST003")
+
+    for _ in range(2):
+        assert supabase.call(failing_rpc, fallback=lambda: "index") == "index"
+
+    assert len(attempts) == 4
+    assert supabase.breaker.state == CircuitBreaker.OPEN
+    assert supabase.events == {"retry": 2, "failure": 2, "fallback": 2}
@@ -0,0 +1,29 @@
+import pytest
+
+from app.models.request_models import TravelPackage
+from app.utils.response_utils import project_travel_package
+
+
+def row(**overrides):
+    return dict({"id": "7", "title": "Bali retreat", "provider_id": "3", "location_id": "12", "price": "799.5",
+                 "duration_days": "5", "highlights": "['Beach', 'Spa']", "description": "Five days.",
+                 "image_url": None, "combined_score": 0.91, "location_vector": [0.1, 0.2]}, **overrides)
+
+
+@pytest.mark.parametrize("overrides", [{}, {"image_url": "https://img/1.jpg"}, {"highlights": ["Beach"]},
+                                       {"highlights": "[Beach, Old town]"}, {"price": 100}])
+def test_projection_matches_the_pydantic_model(overrides):
+    source = row(**overrides)
+
+    assert project_travel_package(source) == TravelPackage(**source).model_dump()
+
+
+@pytest.mark.parametrize("field", ["id", "title", "price", "highlights", "description"])
+def test_rows_missing_a_required_field_are_skipped(field):
+    assert project_travel_package(row(**{field: None})) is None
+
+
+def test_numeric_ids_are_returned_as_strings():
+    projected = project_travel_package(row(id=7, provider_id=3, location_id=12))
+
+    assert (projected["id"], projected["provider_id"], projected["location_id"]) == ("7", "3", "12")
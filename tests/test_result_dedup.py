@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from app.services.process_pool import score_chunk
+from app.services.result_dedup import (
+    NearDuplicateCollapser,
+    distinct_positions,
+    package_vectors_from_index,
+    similarity_vectors,
+)
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA, TravelPackageIndex, normalize_rows
+
+
+def make_index(vectors, location_ids):
+    """Index whose packages all have the same vector on every criterion."""
+    matrix = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    packages = [{"id": f"p{i}", "location_id": location} for i, location in enumerate(location_ids)]
+    return TravelPackageIndex(packages, {criterion: matrix for criterion in TRAVEL_PACKAGE_CRITERIA})
+
+
+def test_similarity_vectors_dot_products_are_mean_cosine_similarities():
+    vectors = similarity_vectors({criterion: np.asarray([[1.0, 0.0], [0.0, 2.0]]) for criterion in TRAVEL_PACKAGE_CRITERIA})
+
+    assert vectors @ vectors.T == pytest.approx(np.eye(2))
+
+
+def test_distinct_positions_keeps_the_best_ranked_member_of_each_group():
+    vectors = normalize_rows(np.asarray([[1, 0], [1, 0.01], [0, 1], [0.01, 1], [1, 1]], dtype=np.float32))
+
+    kept, examined, owners = distinct_positions(vectors, threshold=0.99, limit=10, block_size=2)
+
+    assert kept == [0, 2, 4]
+    assert examined == 5
+    assert owners == [(1, 0), (3, 1)]
+
+
+def test_distinct_positions_stops_at_the_limit():
+    vectors = np.eye(4, dtype=np.float32)
+
+    kept, examined, owners = distinct_positions(vectors, threshold=0.99, limit=2)
+
+    assert (kept, examined, owners) == ([0, 1], 2, [])
+
+
+def test_collapse_lists_duplicates_under_their_representative():
+    collapser = NearDuplicateCollapser(threshold=0.99, max_overfetch=2.0)
+    packages = [{"id": "a"}, {"id": "a-copy"}, {"id": "b"}]
+    vectors = normalize_rows(np.asarray([[1, 0], [1, 0], [0, 1]], dtype=np.float32))
+
+    assert collapser.collapse(packages, vectors, match_count=2) == [
+        {"id": "a", "duplicate_ids": ["a-copy"]},
+        {"id": "b", "duplicate_ids": []},
+    ]
+    assert collapser.collapsed == 1 and collapser.duplicate_rate > 0
+
+
+def test_fetch_count_grows_with_the_duplicate_rate_up_to_the_cap():
+    collapser = NearDuplicateCollapser(threshold=0.99, max_overfetch=2.0)
+
+    assert collapser.fetch_count(10) == 12
+    collapser.duplicate_rate = 0.9
+    assert collapser.fetch_count(10) == collapser.max_fetch_count(10) == 20
+
+
+def test_package_vectors_from_index_are_zero_for_unknown_ids():
+    index = make_index([[1, 0], [0, 1]], ["l1", "l2"])
+
+    vectors = package_vectors_from_index(index, [{"id": "p1"}, {"id": "missing"}])
+
+    assert vectors[1] == pytest.approx(np.zeros(vectors.shape[1]))
+    assert vectors[0] @ vectors[0] == pytest.approx(1.0)
+    assert package_vectors_from_index(index, [{"id": "missing"}]) is None
+
+
+@pytest.mark.parametrize("dedup_threshold", [None, 0.99])
+def test_batch_scoring_never_fills_up_with_rows_outside_the_location_filter(dedup_threshold):
+    index = make_index([[1, 0], [1, 0.1], [0.9, 0.2], [0, 1]], ["l1", "l2", "l2", "l3"])
+    query = normalize_rows(np.asarray([[1, 0]], dtype=np.float32))
+    text_ids = {criterion: np.zeros(1, dtype=np.int64) for criterion in TRAVEL_PACKAGE_CRITERIA}
+
+    [(rows, scores, dedup)] = score_chunk(index, query, text_ids, fetch_counts=[4], match_counts=[2],
+                                          candidate_rows=[np.asarray([1, 2])], dedup_threshold=dedup_threshold)
+
+    assert sorted(rows.tolist()) == [1, 2]
+    assert np.isfinite(scores).all()
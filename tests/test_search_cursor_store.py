@@ -0,0 +1,55 @@
+import pytest
+
+from app.services.search_cursor_store import CursorExpiredError, SearchCursorStore
+
+
+def packages(count):
+    return [{"id": str(index), "title": f"Package {index}"} for index in range(count)]
+
+
+def test_pages_follow_the_stored_ranking():
+    store = SearchCursorStore()
+    cursor = store.create("owner", packages(5), page_size=2)
+
+    page, cursor = store.page("owner", cursor, 2)
+    assert [package["id"] for package in page] == ["2", "3"]
+    page, cursor = store.page("owner", cursor, 2)
+    assert [package["id"] for package in page] == ["4"]
+    assert cursor is None
+
+
+def test_no_cursor_when_everything_fits_on_the_first_page():
+    assert SearchCursorStore().create("owner", packages(3), page_size=3) is None
+
+
+def test_cursor_is_bound_to_its_owner():
+    store = SearchCursorStore()
+    cursor = store.create("owner", packages(5), page_size=2)
+
+    with pytest.raises(CursorExpiredError):
+        store.page("someone else", cursor, 2)
+
+
+def test_expired_cursor_is_rejected():
+    store = SearchCursorStore(ttl_seconds=-1)
+    cursor = store.create("owner", packages(5), page_size=2)
+
+    with pytest.raises(CursorExpiredError):
+        store.page("owner", cursor, 2)
+
+
+def test_returned_rows_are_copies():
+    store = SearchCursorStore()
+    cursor = store.create("owner", packages(5), page_size=2)
+
+    page, _ = store.page("owner", cursor, 2)
+    page[0]["title"] = "changed"
+    page, _ = store.page("owner", cursor, 2)
+    assert page[0]["title"] == "Package 2"
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", SearchCursorStore.encode_cursor("search", -2),
+                                    SearchCursorStore.encode_cursor("search", "x")])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(CursorExpiredError, match="Malformed"):
+        SearchCursorStore.decode_cursor(cursor)
@@ -0,0 +1,124 @@
+import numpy as np
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.services.admission_control import search_admission
+from app.services.batch_search import BatchTravelPackageSearch
+from app.services.search_cursor_store import search_cursor_store
+from app.utils.lru import TTLCache
+from app.vectorstore.travel_package_index import TRAVEL_PACKAGE_CRITERIA, TravelPackageIndex, normalize_rows
+
+TOKEN = "token-1"
+
+
+def package(number):
+    return {"id": f"p{number}", "title": f"Trip {number}", "provider_id": "1", "location_id": "1",
+            "price": 100.0, "duration_days": 3, "highlights": [], "description": "A trip.", "image_url": None}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def resolve_user_id(token):
+        if token != TOKEN:
+            raise PermissionError("invalid token")
+        return "user-1"
+
+    monkeypatch.setattr(main, "resolve_user_id", resolve_user_id)
+    return TestClient(main.app)
+
+
+def search(client, token=TOKEN, **payload):
+    return client.post("/search-travel-packages", params={"authorization": f"Bearer {token}"}, json=payload)
+
+
+@pytest.mark.parametrize("match_count", [-3, 0, 101])
+def test_out_of_range_match_counts_are_rejected(client, match_count):
+    assert search(client, match_count=match_count).status_code == 422
+
+
+def test_cursor_pages_are_served_to_their_verified_owner(client):
+    cursor = search_cursor_store.create(TOKEN, [package(n) for n in range(5)], page_size=2)
+
+    response = search(client, cursor=cursor, match_count=2)
+    assert response.status_code == 200
+    assert [row["id"] for row in response.json()["packages"]] == ["p2", "p3"]
+
+
+def test_cursor_pages_require_a_valid_token(client):
+    cursor = search_cursor_store.create("expired-token", [package(n) for n in range(5)], page_size=2)
+
+    assert search(client, token="expired-token", cursor=cursor).status_code == 401
+
+
+class FakeEmbeddingService:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def get_embeddings(self, texts):
+        if self.fail:
+            raise RuntimeError("embeddings API is down")
+        return [np.random.default_rng(len(text)).random(4).tolist() for text in texts]
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    matrix = normalize_rows(np.random.default_rng(0).random((8, 4), dtype=np.float32))
+    index = TravelPackageIndex([package(n) for n in range(8)],
+                               {criterion: matrix for criterion in TRAVEL_PACKAGE_CRITERIA}, version="v1")
+    monkeypatch.setenv("BATCH_SEARCH_CHUNK_SIZE", "2")
+    monkeypatch.setenv("LOCATION_PREFILTER_ENABLED", "0")
+    monkeypatch.setattr(main, "get_travel_package_index", lambda: index)
+    monkeypatch.setattr(main, "get_embedding_service", lambda: FakeEmbeddingService())
+    return index
+
+
+def batch_search(client, requests, token=TOKEN):
+    return client.post("/search-travel-packages/batch", params={"authorization": f"Bearer {token}"},
+                       json={"requests": requests})
+
+
+def test_batch_streams_one_line_per_request_in_request_order(client, catalog):
+    requests = [{"location_input": "x" * n, "match_count": n % 3 + 1} for n in range(1, 6)]
+    profiles = [{"location": request["location_input"]} for request in requests]
+    expected = list(BatchTravelPackageSearch(FakeEmbeddingService(), catalog).search(
+        profiles, [request["match_count"] for request in requests]))
+
+    response = batch_search(client, requests)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [orjson.loads(line) for line in response.content.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2, 3, 4]
+    for line, request, (_, packages) in zip(lines, requests, expected):
+        assert line["total_count"] == len(line["packages"]) == request["match_count"]
+        assert [row["id"] for row in line["packages"]] == [row["id"] for row in packages]
+
+
+def test_batch_rejects_oversized_batches_and_missing_tokens(client, catalog, monkeypatch):
+    monkeypatch.setenv("BATCH_SEARCH_MAX_PROFILES", "2")
+
+    assert batch_search(client, [{}] * 3).status_code == 413
+    assert client.post("/search-travel-packages/batch", params={"authorization": "token-1"},
+                       json={"requests": [{}]}).status_code == 401
+
+
+def test_a_failing_batch_releases_its_admission_slot(client, catalog, monkeypatch):
+    monkeypatch.setattr(main, "get_embedding_service", lambda: FakeEmbeddingService(fail=True))
+
+    with pytest.raises(RuntimeError, match="embeddings API is down"):
+        batch_search(client, [{"location_input": "Bali"}])
+    assert search_admission.stats()["pending"] == 0
+
+
+def test_search_tools_are_reused_per_token_and_profiles_per_user(monkeypatch):
+    monkeypatch.setattr(main, "travel_search_tools", TTLCache(10, 300))
+    monkeypatch.setattr(main, "preference_profiles", TTLCache(10, 300, sliding=True))
+
+    tool = main.get_travel_search_tool("token-a", "user-1")
+    refreshed = main.get_travel_search_tool("token-b", "user-1")
+
+    assert main.get_travel_search_tool("token-a", "user-1") is tool
+    assert refreshed is not tool and refreshed.profile is tool.profile
+    assert main.get_travel_search_tool("token-c", "user-2").profile is not tool.profile
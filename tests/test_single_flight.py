@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from app.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_with_the_same_key_execute_once():
+    group = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    executions = []
+
+    def slow(value):
+        executions.append(value)
+        started.set()
+        release.wait(5)
+        return value * 2
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(group.do("key", slow, 21)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(group.do("key", slow, 21))) for _ in range(4)]
+    for follower in followers:
+        follower.start()
+    # Followers register before the leader finishes
+    deadline = time.monotonic() + 5
+    while group.stats()["coalesced"] < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert results == [42] * 5
+    assert executions == [21]
+    assert group.stats() == {"calls": 5, "executions": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_results_are_not_cached_after_the_call():
+    group = SingleFlight("test")
+    assert group.do("key", lambda: 1) == 1
+    assert group.do("key", lambda: 2) == 2
+    assert group.stats()["executions"] == 2
+
+
+def test_exceptions_propagate_and_release_the_key():
+    group = SingleFlight("test")
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        group.do("key", fail)
+    assert group.do("key", lambda: "ok") == "ok"
@@ -0,0 +1,129 @@
+import threading
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.agent.query_router import QueryRouter
+from app.agent.speculative_search import SpeculativeSearch
+from app.tools.search.search_tools import PreferenceProfile
+
+
+class FakeSearchTool:
+    """Records the search stages; embedding blocks until `proceed` is set."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.embedding = threading.Event()
+        self.proceed = threading.Event()
+        self.proceed.set()
+        self.searched = threading.Event()
+
+    def embed_preferences(self, inputs):
+        self.embedding.set()
+        self.proceed.wait(5)
+        return [[1.0]] * len(inputs)
+
+    def search_with_embeddings(self, embeddings, match_count, location_input=None):
+        self.searched.set()
+        if self.fail:
+            raise RuntimeError("vector store is down")
+        return [{"id": f"p{i}", "location": location_input} for i in range(match_count)]
+
+
+@pytest.fixture
+def speculative():
+    speculative = SpeculativeSearch(max_workers=1)
+    yield speculative
+    speculative.executor.shutdown(wait=True)
+
+
+def sample(outcome):
+    return REGISTRY.get_sample_value("travel_buddy_speculative_search_total", {"outcome": outcome}) or 0.0
+
+
+def test_matching_tool_call_reuses_the_speculative_results(speculative):
+    tool = FakeSearchTool()
+    speculation = speculative.start(tool, {"location_input": "Da Nang", "duration_input": "5 days"}, 10)
+
+    results = speculative.claim(speculation, {"location_input": "  da nang", "duration_input": "5  DAYS"}, 5)
+
+    assert [row["id"] for row in results] == [f"p{i}" for i in range(10)]
+    results[0]["id"] = "changed"
+    assert speculation.future.result()[0]["id"] == "p0"
+    assert speculative.claim(speculation, {"location_input": "Da Nang", "duration_input": "5 days"}, 5) is None
+    assert speculative.stats()["hit"] == 1
+
+
+@pytest.mark.parametrize("preferences, fetch_count", [({"location_input": "Bali"}, 5),
+                                                      ({"location_input": "Da Nang"}, 20)])
+def test_mismatching_tool_call_cancels_before_the_vector_search(speculative, preferences, fetch_count):
+    tool = FakeSearchTool()
+    tool.proceed.clear()
+    speculation = speculative.start(tool, {"location_input": "Da Nang"}, 10)
+    assert tool.embedding.wait(5)
+
+    assert speculative.claim(speculation, preferences, fetch_count) is None
+    tool.proceed.set()
+    speculative.executor.submit(lambda: None).result(5)
+
+    assert speculation.cancelled.is_set()
+    assert not tool.searched.is_set()
+    assert speculative.stats()["mismatch"] == 1
+
+
+def test_unclaimed_speculation_is_released_and_counted_unused(speculative):
+    speculation = speculative.start(FakeSearchTool(), {"location_input": "Da Nang"}, 10)
+
+    speculative.release(speculation)
+    speculative.release(speculation)
+
+    assert speculation.cancelled.is_set()
+    assert speculative.claim(speculation, {"location_input": "Da Nang"}, 5) is None
+    assert speculative.stats() == {"hit": 0, "mismatch": 0, "unused": 1, "hit_rate": 0.0}
+
+
+def test_failed_speculation_falls_back_to_a_normal_search(speculative):
+    speculation = speculative.start(FakeSearchTool(fail=True), {"location_input": "Da Nang"}, 10)
+
+    assert speculative.claim(speculation, {"location_input": "Da Nang"}, 5) is None
+    assert speculative.stats()["mismatch"] == 1
+
+
+def test_outcomes_are_only_exported_when_metrics_are_enabled(speculative, monkeypatch):
+    monkeypatch.setenv("METRICS_ENABLED", "0")
+    before = sample("unused")
+
+    speculative.release(speculative.start(FakeSearchTool(), {"location_input": "Da Nang"}, 10))
+
+    assert sample("unused") == before
+    assert speculative.stats()["unused"] == 1
+
+
+def test_router_decisions_are_only_exported_when_metrics_are_enabled(monkeypatch):
+    router = QueryRouter()
+    before = REGISTRY.get_sample_value("travel_buddy_router_decisions_total", {"route": "agent"}) or 0.0
+
+    monkeypatch.setenv("METRICS_ENABLED", "0")
+    router.route("What should I pack for Bali?")
+    monkeypatch.setenv("METRICS_ENABLED", "1")
+    router.route("What should I pack for Bali?")
+
+    assert REGISTRY.get_sample_value("travel_buddy_router_decisions_total", {"route": "agent"}) == before + 1
+    assert router.stats()["agent"] == 2
+
+
+def test_profile_counts_every_field_under_concurrent_searches():
+    profile = PreferenceProfile()
+    texts = [f"field {i}" for i in range(8)]
+
+    def search():
+        for _ in range(200):
+            profile.embed(texts, lambda batch: [[0.0]] * len(batch))
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert profile.embedded + profile.reused == 4 * 200 * 8